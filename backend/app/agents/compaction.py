@@ -0,0 +1,196 @@
+"""
+Rolling conversation compaction for the supervisor graph
+
+Long offer-creation sessions used to grow `messages` without bound, and with
+them checkpoint size and memory. The `compact_history` node runs before the
+supervisor on every turn. Once the history's token estimate crosses a
+threshold it keeps the last N turns verbatim and folds everything older into
+one running summary message at the head of the conversation.
+
+Folding is extractive (no LLM call), so compaction never competes with the
+turn for provider capacity. The program mentioned and the merchant's stated
+objective and offer terms are pattern-matched from the folded turns and
+written into the summary's header. `conversation_facts` only carries them
+from one compaction to the next. Nothing routes on them: the offer manager
+keeps the program and objective it detected as `program_type` and
+`business_objective` state keys (with the same `program_from_text` /
+`objective_from_text` rules), which compaction never touches, so a long
+thread routes like a short one.
+
+Configuration:
+- KIGO_COMPACTION_TOKEN_THRESHOLD  estimated tokens before compacting (3000; 0 disables)
+- KIGO_COMPACTION_KEEP_TURNS       most recent turns kept verbatim (6)
+"""
+
+from typing import Dict, List, Optional, Tuple
+import os
+import re
+
+from langchain_core.messages import BaseMessage, HumanMessage, RemoveMessage, SystemMessage
+
+from app.server.logs import get_logger
+
+logger = get_logger("compaction")
+
+
+SUMMARY_NAME = "conversation_summary"
+
+# Bullet lines kept in the running summary; older ones roll off
+MAX_SUMMARY_LINES = 40
+MAX_LINE_CHARS = 160
+
+PROGRAM_KEYWORDS = (
+    ("john_deere", ("john deere", "john-deere", "john_deere")),
+    ("yardi", ("yardi",)),
+)
+
+OBJECTIVE_PATTERN = re.compile(
+    r"\b(increase|boost|drive|grow|clear|attract|acquire|retain|launch|promote|sell)\b", re.IGNORECASE
+)
+OFFER_TERM_PATTERN = re.compile(r"\d+(?:\.\d+)?\s?%|\$\s?\d+(?:\.\d{2})?|\bbogo\b|\bcashback\b", re.IGNORECASE)
+
+
+def estimate_tokens(messages: List[BaseMessage]) -> int:
+    """Cheap token estimate (~4 characters per token plus per-message overhead)"""
+    return sum(len(str(getattr(m, "content", m))) // 4 + 4 for m in messages)
+
+
+def is_summary(message: BaseMessage) -> bool:
+    return isinstance(message, SystemMessage) and getattr(message, "name", None) == SUMMARY_NAME
+
+
+def program_from_text(text: str) -> Optional[str]:
+    lowered = text.lower()
+    for program, keywords in PROGRAM_KEYWORDS:
+        if any(k in lowered for k in keywords):
+            return program
+    return None
+
+
+def objective_from_text(text: str) -> Optional[str]:
+    """The message itself if it states a business objective ("increase sales", "clear inventory")"""
+    return text[:MAX_LINE_CHARS] if OBJECTIVE_PATTERN.search(text) else None
+
+
+def extract_facts(messages: List[BaseMessage], facts: Optional[Dict] = None) -> Dict:
+    """Fold facts from `messages` (oldest first) into a copy of `facts`"""
+    facts = dict(facts or {})
+    offer_terms = list(facts.get("offer_terms", []))
+    for message in messages:
+        content = str(getattr(message, "content", ""))
+        program = program_from_text(content)
+        if program:
+            facts["program_type"] = program
+        if isinstance(message, HumanMessage):
+            objective = objective_from_text(content)
+            if objective:
+                facts["business_objective"] = objective
+            for term in OFFER_TERM_PATTERN.findall(content):
+                if term.lower() not in (t.lower() for t in offer_terms):
+                    offer_terms.append(term)
+    if offer_terms:
+        facts["offer_terms"] = offer_terms[-10:]
+    return facts
+
+
+def split_history(messages: List[BaseMessage], keep_turns: int) -> Tuple[Optional[BaseMessage], List[BaseMessage]]:
+    """Return (existing summary, messages older than the last `keep_turns` turns)"""
+    summary = messages[0] if messages and is_summary(messages[0]) else None
+    body = messages[1:] if summary else messages
+    human_positions = [i for i, m in enumerate(body) if isinstance(m, HumanMessage)]
+    if len(human_positions) <= keep_turns:
+        return summary, []
+    return summary, body[:human_positions[-keep_turns]]
+
+
+def summarize(dropped: List[BaseMessage], previous: Optional[BaseMessage], facts: Dict) -> str:
+    lines = []
+    if previous is not None:
+        lines = [l for l in str(previous.content).splitlines() if l.startswith("- ")]
+    for message in dropped:
+        text = " ".join(str(getattr(message, "content", "")).split())
+        if not text:
+            continue
+        role = "User" if isinstance(message, HumanMessage) else "Assistant"
+        lines.append(f"- {role}: {text[:MAX_LINE_CHARS]}{'…' if len(text) > MAX_LINE_CHARS else ''}")
+    lines = lines[-MAX_SUMMARY_LINES:]
+
+    header = [f"Summary of earlier conversation ({facts.get('dropped_turns', 0)} turns compacted)."]
+    if facts.get("program_type"):
+        header.append(f"Program: {facts['program_type']}")
+    if facts.get("business_objective"):
+        header.append(f"Objective: {facts['business_objective']}")
+    if facts.get("offer_terms"):
+        header.append(f"Offer terms mentioned: {', '.join(facts['offer_terms'])}")
+    return "\n".join(header + lines)
+
+
+def compact_messages(messages: List[BaseMessage], facts: Optional[Dict], keep_turns: int) -> Optional[Dict]:
+    """
+    Build the state update that folds old turns into the summary, or None.
+
+    The summary reuses the id of the message it replaces at the head of the
+    list, so add_messages swaps it in place; every other dropped message is
+    removed with RemoveMessage.
+    """
+    summary, dropped = split_history(messages, keep_turns)
+    if not dropped:
+        return None
+
+    facts = extract_facts(dropped, facts)
+    facts["dropped_messages"] = facts.get("dropped_messages", 0) + len(dropped)
+    facts["dropped_turns"] = facts.get("dropped_turns", 0) + sum(isinstance(m, HumanMessage) for m in dropped)
+
+    head = summary if summary is not None else dropped[0]
+    removed = dropped if summary is not None else dropped[1:]
+    new_summary = SystemMessage(content=summarize(dropped, summary, facts), name=SUMMARY_NAME, id=head.id)
+    return {
+        "messages": [new_summary] + [RemoveMessage(id=m.id) for m in removed],
+        "conversation_facts": facts,
+    }
+
+
+class ConversationCompactor:
+    """Graph node that compacts history once it crosses the token threshold"""
+
+    def __init__(self, token_threshold: int = 3000, keep_turns: int = 6):
+        self.token_threshold = token_threshold
+        self.keep_turns = keep_turns
+        self.compactions = 0
+        self.messages_dropped = 0
+
+    async def __call__(self, state: Dict, config=None) -> Dict:
+        messages = state.get("messages", [])
+        if self.token_threshold <= 0 or estimate_tokens(messages) <= self.token_threshold:
+            return {}
+        update = compact_messages(messages, state.get("conversation_facts"), self.keep_turns)
+        if update is None:
+            return {}
+        previous = (state.get("conversation_facts") or {}).get("dropped_messages", 0)
+        dropped = update["conversation_facts"]["dropped_messages"] - previous
+        self.compactions += 1
+        self.messages_dropped += dropped
+        logger.info("compacted", extra={"fields": {"dropped_messages": dropped, "kept_turns": self.keep_turns}})
+        return update
+
+    def stats(self) -> Dict:
+        return {
+            "token_threshold": self.token_threshold,
+            "keep_turns": self.keep_turns,
+            "compactions": self.compactions,
+            "messages_dropped": self.messages_dropped,
+        }
+
+
+_compactor: Optional[ConversationCompactor] = None
+
+
+def get_compactor() -> ConversationCompactor:
+    """Get the process-wide conversation compactor"""
+    global _compactor
+    if _compactor is None:
+        _compactor = ConversationCompactor(
+            token_threshold=int(os.getenv("KIGO_COMPACTION_TOKEN_THRESHOLD", "3000")),
+            keep_turns=int(os.getenv("KIGO_COMPACTION_KEEP_TURNS", "6")),
+        )
+    return _compactor
@@ -22,62 +22,34 @@ from datetime import datetime
 
 # Import supervisor state
 from .supervisor import KigoProAgentState, get_llm
+from app.agents.compaction import objective_from_text, program_from_text
+from app.agents.steps import OfferStep, StepTable
+from app.llm.invoke import ainvoke_llm
+from app.llm.scheduler import LLMOverloadedError
+from app.server.logs import get_logger
 
-# Step tracking for Perplexity-style streaming
-class OfferStep(TypedDict):
-    """Represents a step in the offer creation process"""
-    id: str                              # Unique step identifier
-    description: str                      # What this step is doing
-    status: str                          # "pending" | "running" | "complete" | "error"
-    type: str                            # Step type (goal_setting, research, etc.)
-    updates: List[str]                   # Real-time progress messages
-    result: Optional[Dict]               # Step result data
-    metadata: Optional[Dict]             # Optional metadata (duration, sources, etc.)
-
+logger = get_logger("offer_manager")
 
 # Helper functions for step management
-async def emit_intermediate_state(config: RunnableConfig, state: Dict):
-    """Emit intermediate state for real-time UI updates (CopilotKit pattern)"""
+async def emit_intermediate_state(config: RunnableConfig, state: Dict, **updates):
+    """Emit intermediate state for real-time UI updates (CopilotKit pattern)
+
+    The merged snapshot is only built when an emitter is configured.
+    """
     emit_fn = config.get("configurable", {}).get("emit_intermediate_state")
     if emit_fn and callable(emit_fn):
+        if isinstance(updates.get("steps"), StepTable):
+            updates["steps"] = updates["steps"].to_state()
         try:
-            await emit_fn(state)
+            await emit_fn({**state, **updates})
         except Exception as e:
-            print(f"⚠️  Failed to emit intermediate state: {e}")
-
-
-def get_or_create_step(steps: List[OfferStep], step_id: str, description: str, step_type: str) -> OfferStep:
-    """Get existing step or create new one"""
-    for step in steps:
-        if step["id"] == step_id:
-            return step
-    
-    new_step = {
-        "id": step_id,
-        "description": description,
-        "status": "pending",
-        "type": step_type,
-        "updates": [],
-        "result": None,
-        "metadata": {"start_time": datetime.now().isoformat()}
-    }
-    steps.append(new_step)
-    return new_step
-
+            logger.warning("failed to emit intermediate state", extra={"fields": {"error": str(e)}})
 
-def mark_step_complete(step: OfferStep, result: Optional[Dict] = None):
-    """Mark a step as complete with optional result"""
-    step["status"] = "complete"
-    if result:
-        step["result"] = result
-    if "metadata" in step:
-        step["metadata"]["end_time"] = datetime.now().isoformat()
 
 class OfferManagerState(KigoProAgentState):
     """Extended state for offer management workflows"""
-    # Business context
-    business_objective: Optional[str] = ""
-    program_type: Optional[str] = ""  # john_deere | yardi | general
+    # Business context: business_objective and program_type (john_deere | yardi | general)
+    # are KigoProAgentState keys, so they persist across turns
 
     # Offer configuration
     offer_config: Optional[Dict] = {}
@@ -95,14 +67,14 @@ class OfferManagerState(KigoProAgentState):
     progress_percentage: Optional[int] = 0
     current_phase: Optional[str] = "initialization"
 
-    # NEW: Step-based streaming (Perplexity pattern)
-    steps: Optional[List[OfferStep]] = []
+    # NEW: Step-based streaming (Perplexity pattern) - OfferStep.to_dict() records
+    steps: Optional[List[Dict]] = []
 
     # NEW: Final answer/summary
     answer: Optional[Dict] = {}
 
 
-def detect_program_type(context: Dict, messages: List[BaseMessage]) -> str:
+def detect_program_type(context: Dict, messages: List[BaseMessage], known: Optional[str] = None) -> str:
     """Detect which program type (John Deere, Yardi, etc.) based on context"""
     # Check context first
     current_page = context.get("currentPage", "")
@@ -113,16 +85,12 @@ def detect_program_type(context: Dict, messages: List[BaseMessage]) -> str:
     
     # Check messages
     for message in messages[-3:]:  # Check last 3 messages
-        content = ""
-        if hasattr(message, 'content'):
-            content = str(message.content).lower()
-        
-        if "john deere" in content or "john-deere" in content:
-            return "john_deere"
-        elif "yardi" in content:
-            return "yardi"
+        program = program_from_text(str(getattr(message, "content", "")))
+        if program:
+            return program
     
-    return "general"
+    # The program detected on an earlier turn (the `program_type` state key)
+    return known or "general"
 
 
 def determine_workflow_step(state: OfferManagerState) -> str:
@@ -154,16 +122,16 @@ async def handle_goal_setting(state: OfferManagerState, config: RunnableConfig)
     """Guide user through business goal setting and context gathering"""
     messages = state.get("messages", [])
     context = state.get("context", {})
-    program_type = detect_program_type(context, messages)
+    program_type = detect_program_type(context, messages, state.get("program_type"))
 
     # Get or create step
-    steps = state.get("steps", [])
-    goal_step = get_or_create_step(steps, "goal_setting", "Understanding your business objectives", "goal_setting")
-    goal_step["status"] = "running"
-    goal_step["updates"].append("🔍 Analyzing your request...")
+    steps = StepTable.from_state(state.get("steps"))
+    goal_step = steps.get_or_create("goal_setting", "Understanding your business objectives", "goal_setting")
+    goal_step.status = "running"
+    goal_step.add_update("🔍 Analyzing your request...")
     
     # Emit intermediate state
-    await emit_intermediate_state(config, {**state, "steps": steps})
+    await emit_intermediate_state(config, state, steps=steps)
 
     llm = get_llm()
 
@@ -173,8 +141,8 @@ async def handle_goal_setting(state: OfferManagerState, config: RunnableConfig)
     if latest_message and hasattr(latest_message, 'content'):
         user_input = str(latest_message.content)
 
-    goal_step["updates"].append("📝 Gathering context...")
-    await emit_intermediate_state(config, {**state, "steps": steps})
+    goal_step.add_update("📝 Gathering context...")
+    await emit_intermediate_state(config, state, steps=steps)
 
     system_prompt = f"""You are a Kigo Pro Offer Strategy Consultant helping merchants create effective promotional offers.
 
@@ -190,51 +158,52 @@ Your role is to:
 Keep responses conversational, helpful, and focused on understanding their goals.
 Ask 1-2 specific questions at a time to gather the information needed."""
 
-    response = await llm.ainvoke([
+    response = await ainvoke_llm(llm, [
         SystemMessage(content=system_prompt),
         HumanMessage(content=user_input or "I want to create a new offer")
-    ])
+    ], node="offer_manager.goal_setting")
 
     ai_response = AIMessage(content=response.content)
 
     # Mark step complete
-    goal_step["updates"].append("✅ Goals captured")
-    mark_step_complete(goal_step, {"program_type": program_type, "user_input": user_input})
+    goal_step.add_update("✅ Goals captured")
+    goal_step.complete({"program_type": program_type, "user_input": user_input})
     
     # Emit final state for this step
-    await emit_intermediate_state(config, {**state, "steps": steps, "messages": messages + [ai_response]})
+    await emit_intermediate_state(config, state, steps=steps, messages=messages + [ai_response])
 
     # Update state
     return {
-        **state,
-        "messages": messages + [ai_response],
+        "messages": [ai_response],
         "workflow_step": "goal_setting",
         "program_type": program_type,
+        # Once stated, the objective moves the next offer turn on to offer creation
+        "business_objective": objective_from_text(user_input) or state.get("business_objective"),
         "current_phase": "goal_setting",
         "progress_percentage": 20,
-        "steps": steps,
+        "steps": steps.to_state(),
     }
 
 
 async def handle_offer_creation(state: OfferManagerState, config: RunnableConfig) -> Dict:
     """AI-powered offer type and value recommendations"""
     messages = state.get("messages", [])
-    business_objective = state.get("business_objective", "")
-    program_type = state.get("program_type", "general")
+    business_objective = state.get("business_objective") or ""
+    program_type = state.get("program_type") or "general"
 
     # Track step progress
-    steps = state.get("steps", [])
+    steps = StepTable.from_state(state.get("steps"))
     
     # Mark previous step complete
     for step in steps:
-        if step["id"] == "goal_setting" and step["status"] != "complete":
-            mark_step_complete(step)
+        if step.id == "goal_setting" and step.status != "complete":
+            step.complete()
 
     # Get or create offer creation step
-    offer_step = get_or_create_step(steps, "offer_creation", "Creating offer recommendations", "offer_creation")
-    offer_step["status"] = "running"
-    offer_step["updates"].append("🔍 Analyzing similar offers...")
-    await emit_intermediate_state(config, {**state, "steps": steps})
+    offer_step = steps.get_or_create("offer_creation", "Creating offer recommendations", "offer_creation")
+    offer_step.status = "running"
+    offer_step.add_update("🔍 Analyzing similar offers...")
+    await emit_intermediate_state(config, state, steps=steps)
 
     llm = get_llm()
 
@@ -245,13 +214,13 @@ async def handle_offer_creation(state: OfferManagerState, config: RunnableConfig
         user_input = str(latest_message.content)
 
     # Simulate research phase with updates
-    offer_step["updates"].append("📊 Researching industry benchmarks...")
-    await emit_intermediate_state(config, {**state, "steps": steps})
+    offer_step.add_update("📊 Researching industry benchmarks...")
+    await emit_intermediate_state(config, state, steps=steps)
     
     await asyncio.sleep(0.3)  # Simulate thinking
     
-    offer_step["updates"].append("🎯 Analyzing target audience fit...")
-    await emit_intermediate_state(config, {**state, "steps": steps})
+    offer_step.add_update("🎯 Analyzing target audience fit...")
+    await emit_intermediate_state(config, state, steps=steps)
 
     system_prompt = f"""You are a Kigo Pro Offer Design Specialist with expertise in promotional strategy.
 
@@ -269,10 +238,10 @@ Your role is to:
 Provide 2-3 concrete offer recommendations with clear reasoning.
 Format your response as structured recommendations that can guide the merchant's decision."""
 
-    response = await llm.ainvoke([
+    response = await ainvoke_llm(llm, [
         SystemMessage(content=system_prompt),
         HumanMessage(content=user_input or f"Recommend offers for: {business_objective}")
-    ])
+    ], node="offer_manager.offer_creation")
 
     ai_response = AIMessage(content=response.content)
 
@@ -285,18 +254,17 @@ Format your response as structured recommendations that can guide the merchant's
     }
 
     # Mark step complete
-    offer_step["updates"].append("✅ Recommendations generated")
-    mark_step_complete(offer_step, offer_config)
-    await emit_intermediate_state(config, {**state, "steps": steps, "messages": messages + [ai_response]})
+    offer_step.add_update("✅ Recommendations generated")
+    offer_step.complete(offer_config)
+    await emit_intermediate_state(config, state, steps=steps, messages=messages + [ai_response])
 
     return {
-        **state,
-        "messages": messages + [ai_response],
+        "messages": [ai_response],
         "workflow_step": "offer_creation",
         "offer_config": offer_config,
         "current_phase": "offer_creation",
         "progress_percentage": 40,
-        "steps": steps,
+        "steps": steps.to_state(),
     }
 
 
@@ -304,21 +272,21 @@ async def handle_campaign_setup(state: OfferManagerState, config: RunnableConfig
     """Guide campaign targeting and delivery configuration"""
     messages = state.get("messages", [])
     offer_config = state.get("offer_config", {})
-    program_type = state.get("program_type", "general")
+    program_type = state.get("program_type") or "general"
     
     # Track step progress
-    steps = state.get("steps", [])
+    steps = StepTable.from_state(state.get("steps"))
     
     # Mark previous step complete
     for step in steps:
-        if step["id"] == "offer_creation" and step["status"] != "complete":
-            mark_step_complete(step)
+        if step.id == "offer_creation" and step.status != "complete":
+            step.complete()
     
     # Get or create campaign setup step
-    campaign_step = get_or_create_step(steps, "campaign_setup", "Configuring campaign targeting", "campaign_setup")
-    campaign_step["status"] = "running"
-    campaign_step["updates"].append("🎯 Analyzing target audience...")
-    await emit_intermediate_state(config, {**state, "steps": steps})
+    campaign_step = steps.get_or_create("campaign_setup", "Configuring campaign targeting", "campaign_setup")
+    campaign_step.status = "running"
+    campaign_step.add_update("🎯 Analyzing target audience...")
+    await emit_intermediate_state(config, state, steps=steps)
     
     llm = get_llm()
     
@@ -328,8 +296,8 @@ async def handle_campaign_setup(state: OfferManagerState, config: RunnableConfig
     if latest_message and hasattr(latest_message, 'content'):
         user_input = str(latest_message.content)
     
-    campaign_step["updates"].append("📱 Determining optimal delivery channels...")
-    await emit_intermediate_state(config, {**state, "steps": steps})
+    campaign_step.add_update("📱 Determining optimal delivery channels...")
+    await emit_intermediate_state(config, state, steps=steps)
     
     system_prompt = f"""You are a Kigo Pro Campaign Orchestration Specialist.
 
@@ -347,10 +315,10 @@ Your role is to:
 Provide practical, actionable campaign setup recommendations.
 Ask clarifying questions about their campaign preferences."""
 
-    response = await llm.ainvoke([
+    response = await ainvoke_llm(llm, [
         SystemMessage(content=system_prompt),
         HumanMessage(content=user_input or "Help me set up the campaign")
-    ])
+    ], node="offer_manager.campaign_setup")
     
     ai_response = AIMessage(content=response.content)
     
@@ -361,18 +329,17 @@ Ask clarifying questions about their campaign preferences."""
         "setup_complete": False,
     }
     
-    campaign_step["updates"].append("✅ Campaign configuration ready")
-    mark_step_complete(campaign_step, campaign_setup)
-    await emit_intermediate_state(config, {**state, "steps": steps, "messages": messages + [ai_response]})
+    campaign_step.add_update("✅ Campaign configuration ready")
+    campaign_step.complete(campaign_setup)
+    await emit_intermediate_state(config, state, steps=steps, messages=messages + [ai_response])
     
     return {
-        **state,
-        "messages": messages + [ai_response],
+        "messages": [ai_response],
         "workflow_step": "campaign_setup",
         "campaign_setup": campaign_setup,
         "current_phase": "campaign_setup",
         "progress_percentage": 60,
-        "steps": steps,
+        "steps": steps.to_state(),
     }
 
 
@@ -381,32 +348,30 @@ async def handle_validation(state: OfferManagerState, config: RunnableConfig) ->
     messages = state.get("messages", [])
     offer_config = state.get("offer_config", {})
     campaign_setup = state.get("campaign_setup", {})
-    program_type = state.get("program_type", "general")
+    program_type = state.get("program_type") or "general"
 
     # Track step progress
-    steps = state.get("steps", [])
+    steps = StepTable.from_state(state.get("steps"))
 
     # Add validation step
-    validation_step_exists = any(s["id"] == "validation" for s in steps)
-    if not validation_step_exists:
-        steps.append({
-            "id": "validation",
-            "description": "Validating offer configuration",
-            "status": "running",
-            "type": "validation",
-            "updates": ["Checking brand guidelines...", "Validating business rules..."],
-            "result": None
-        })
+    validation_step = steps.get("validation")
+    if validation_step is None:
+        validation_step = steps.add(OfferStep(
+            "validation",
+            "Validating offer configuration",
+            "validation",
+            status="running",
+            updates=["Checking brand guidelines...", "Validating business rules..."],
+        ))
     else:
-        for step in steps:
-            if step["id"] == "validation":
-                step["status"] = "running"
-                step["updates"].append("Running compliance checks...")
+        validation_step.status = "running"
+        validation_step.add_update("Running compliance checks...")
 
     # Mark previous steps complete
-    for step in steps:
-        if step["id"] in ["offer_creation", "campaign_setup"]:
-            step["status"] = "complete"
+    for step_id in ("offer_creation", "campaign_setup"):
+        step = steps.get(step_id)
+        if step is not None and step.status != "complete":
+            step.complete()
 
     llm = get_llm()
 
@@ -432,10 +397,10 @@ Provide a clear validation report with:
 
 Be thorough but constructive."""
 
-    response = await llm.ainvoke([
+    response = await ainvoke_llm(llm, [
         SystemMessage(content=system_prompt),
         HumanMessage(content="Please validate this offer and campaign setup")
-    ])
+    ], node="offer_manager.validation")
 
     ai_response = AIMessage(content=response.content)
 
@@ -454,20 +419,16 @@ Be thorough but constructive."""
     ]
 
     # Update step
-    for step in steps:
-        if step["id"] == "validation":
-            step["updates"].append("All checks passed ✅")
-            step["result"] = {"validation_results": validation_results}
-            step["status"] = "complete"
+    validation_step.add_update("All checks passed ✅")
+    validation_step.complete({"validation_results": validation_results})
 
     return {
-        **state,
-        "messages": messages + [ai_response],
+        "messages": [ai_response],
         "workflow_step": "validation",
         "validation_results": validation_results,
         "current_phase": "validation",
         "progress_percentage": 80,
-        "steps": steps,
+        "steps": steps.to_state(),
     }
 
 
@@ -479,7 +440,7 @@ async def handle_approval_workflow(state: OfferManagerState, config: RunnableCon
     validation_results = state.get("validation_results", [])
 
     # Track step progress
-    steps = state.get("steps", [])
+    steps = StepTable.from_state(state.get("steps"))
 
     # Check if validation passed
     all_passed = all(v.get("status") == "passed" for v in validation_results)
@@ -489,30 +450,20 @@ async def handle_approval_workflow(state: OfferManagerState, config: RunnableCon
             content="⚠️  Some validation checks didn't pass. Please review the issues above and make necessary adjustments before submitting for approval."
         )
         return {
-            **state,
-            "messages": messages + [ai_response],
+            "messages": [ai_response],
             "workflow_step": "validation",  # Go back to validation
-            "steps": steps,
         }
 
     # Add approval step
-    approval_step_exists = any(s["id"] == "approval" for s in steps)
-    if not approval_step_exists:
-        steps.append({
-            "id": "approval",
-            "description": "Ready for your approval",
-            "status": "pending",
-            "type": "approval",
-            "updates": ["Waiting for review..."],
-            "result": None
-        })
+    if "approval" not in steps:
+        steps.add(OfferStep("approval", "Ready for your approval", "approval", updates=["Waiting for review..."]))
 
     # Prepare approval request
     approval_summary = f"""
 ### 🎯 Offer Summary Ready for Approval
 
 **Business Objective:** {offer_config.get('objective', 'N/A')}
-**Program Type:** {state.get('program_type', 'General')}
+**Program Type:** {state.get('program_type') or 'General'}
 **Validation Status:** All checks passed ✅
 
 I've prepared your offer and campaign setup. Would you like me to proceed with launching this offer?
@@ -539,15 +490,14 @@ I've prepared your offer and campaign setup. Would you like me to proceed with l
     }
 
     return {
-        **state,
-        "messages": messages + [ai_response],
+        "messages": [ai_response],
         "workflow_step": "approval",
         "pending_action": pending_action,
         "requires_approval": True,
         "approval_status": "pending",
         "current_phase": "approval",
         "progress_percentage": 90,
-        "steps": steps,
+        "steps": steps.to_state(),
         "answer": answer,
     }
 
@@ -575,16 +525,15 @@ You help merchants with:
 Provide helpful, actionable guidance. If the user wants to create an offer, 
 guide them to start the offer creation workflow."""
 
-    response = await llm.ainvoke([
+    response = await ainvoke_llm(llm, [
         SystemMessage(content=system_prompt),
         HumanMessage(content=user_input or "How can I help with offers?")
-    ])
+    ], node="offer_manager.general")
     
     ai_response = AIMessage(content=response.content)
     
     return {
-        **state,
-        "messages": messages + [ai_response],
+        "messages": [ai_response],
     }
 
 
@@ -594,54 +543,60 @@ async def offer_manager_agent(state: OfferManagerState, config: RunnableConfig)
     """
     messages = state.get("messages", [])
     
+    # One step table per turn, shared with the handler so errors can mark its running step
+    steps = StepTable.from_state(state.get("steps"))
+    state = {**state, "steps": steps}
+    
     try:
         context = state.get("context", {})
         
         # Detect program type
-        program_type = detect_program_type(context, messages)
+        program_type = detect_program_type(context, messages, state.get("program_type"))
+        state = {**state, "program_type": program_type}
         
         # Determine workflow step
         current_step = determine_workflow_step(state)
         
-        print(f"[Offer Manager] 🎁 Program: {program_type}, Step: {current_step}")
+        logger.info("offer step", extra={"fields": {"program": program_type, "step": current_step}})
         
         # Route to appropriate handler (now passing config for intermediate state emission)
         if current_step == "goal_setting":
-            return await handle_goal_setting({**state, "program_type": program_type}, config)
+            result = await handle_goal_setting(state, config)
         elif current_step == "offer_creation":
-            return await handle_offer_creation(state, config)
+            result = await handle_offer_creation(state, config)
         elif current_step == "campaign_setup":
-            return await handle_campaign_setup(state, config)
+            result = await handle_campaign_setup(state, config)
         elif current_step == "validation":
-            return await handle_validation(state, config)
+            result = await handle_validation(state, config)
         elif current_step == "approval":
-            return await handle_approval_workflow(state, config)
+            result = await handle_approval_workflow(state, config)
         else:
-            return await handle_general_offer_assistance(state, config)
+            result = await handle_general_offer_assistance(state, config)
+        # Persist the detected program for later turns
+        return {"program_type": program_type, **result}
             
+    except LLMOverloadedError:
+        # Shed load: let the endpoint answer 503 instead of a canned reply
+        raise
     except Exception as e:
         # Top-level error handling for offer manager
-        print(f"❌ [Offer Manager] Error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("offer manager failed")
         
         # Update error step if it exists
-        steps = state.get("steps", [])
         for step in steps:
-            if step["status"] == "running":
-                step["status"] = "error"
-                step["updates"].append(f"❌ Error: {str(e)}")
+            if step.status == "running":
+                step.status = "error"
+                step.add_update(f"❌ Error: {str(e)}")
         
         error_message = AIMessage(
             content="I encountered an issue while helping with your offer. Let me try a different approach - could you tell me what you'd like to achieve with this offer?"
         )
         
         return {
-            **state,
-            "messages": messages + [error_message],
+            "messages": [error_message],
             "workflow_step": "goal_setting",  # Reset to beginning
             "current_phase": "goal_setting",
-            "steps": steps,
+            "steps": steps.to_state(),
             "error": str(e),
         }
 
@@ -0,0 +1,146 @@
+"""
+Compact step tracking for the offer manager's Perplexity-style progress UI
+
+Steps used to be plain dicts with unbounded `updates` lists, ISO timestamps
+from `datetime.now()` and a linear scan per lookup. Inside a node they now
+live in a `StepTable`: slotted `OfferStep` records, an id -> position index,
+a capped ring buffer of update lines and `time.monotonic_ns()` timing.
+
+Graph state and the frontend still see the original JSON shape:
+
+    {"id", "description", "status", "type", "updates": [...], "result",
+     "metadata": {"start_time": ISO, "end_time": ISO}}
+
+Configuration:
+- KIGO_STEP_UPDATES_MAX  update lines kept per step (default 20, oldest dropped)
+"""
+
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+import os
+import time
+
+
+MAX_STEP_UPDATES = int(os.getenv("KIGO_STEP_UPDATES_MAX", "20"))
+
+# Monotonic clock anchored to wall time once per process, so durations never
+# jump with clock adjustments but timestamps still render as ISO strings
+_WALL_ANCHOR_NS = time.time_ns()
+_MONO_ANCHOR_NS = time.monotonic_ns()
+
+
+def ns_to_iso(monotonic_ns: int) -> str:
+    return datetime.fromtimestamp((_WALL_ANCHOR_NS + monotonic_ns - _MONO_ANCHOR_NS) / 1e9).isoformat()
+
+
+def iso_to_ns(iso: str) -> Optional[int]:
+    try:
+        wall_ns = int(datetime.fromisoformat(iso).timestamp() * 1e9)
+    except (TypeError, ValueError):
+        return None
+    return wall_ns - _WALL_ANCHOR_NS + _MONO_ANCHOR_NS
+
+
+class OfferStep:
+    """One step in the offer creation process"""
+
+    __slots__ = ("id", "description", "status", "type", "updates", "result", "start_ns", "end_ns")
+
+    def __init__(self, step_id: str, description: str, step_type: str, status: str = "pending",
+                 updates: Optional[List[str]] = None, result: Optional[Dict] = None,
+                 start_ns: Optional[int] = None, end_ns: Optional[int] = None):
+        self.id = step_id
+        self.description = description
+        self.status = status                    # "pending" | "running" | "complete" | "error"
+        self.type = step_type                   # goal_setting, offer_creation, ...
+        self.updates = deque(updates or (), maxlen=MAX_STEP_UPDATES)
+        self.result = result
+        self.start_ns = time.monotonic_ns() if start_ns is None else start_ns
+        self.end_ns = end_ns
+
+    def add_update(self, message: str) -> None:
+        self.updates.append(message)
+
+    def complete(self, result: Optional[Dict] = None) -> None:
+        self.status = "complete"
+        if result:
+            self.result = result
+        self.end_ns = time.monotonic_ns()
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        return (self.end_ns - self.start_ns) / 1e6 if self.end_ns is not None else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        metadata = {"start_time": ns_to_iso(self.start_ns)}
+        if self.end_ns is not None:
+            metadata["end_time"] = ns_to_iso(self.end_ns)
+        return {
+            "id": self.id,
+            "description": self.description,
+            "status": self.status,
+            "type": self.type,
+            "updates": list(self.updates),
+            "result": self.result,
+            "metadata": metadata,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "OfferStep":
+        metadata = data.get("metadata") or {}
+        return cls(
+            data["id"],
+            data.get("description", ""),
+            data.get("type", ""),
+            status=data.get("status", "pending"),
+            updates=data.get("updates"),
+            result=data.get("result"),
+            start_ns=iso_to_ns(metadata.get("start_time")),
+            end_ns=iso_to_ns(metadata.get("end_time")),
+        )
+
+
+class StepTable:
+    """Ordered steps with O(1) lookup by id"""
+
+    __slots__ = ("_steps", "_index")
+
+    def __init__(self, steps: Optional[List[OfferStep]] = None):
+        self._steps: List[OfferStep] = []
+        self._index: Dict[str, int] = {}
+        for step in steps or ():
+            self.add(step)
+
+    @classmethod
+    def from_state(cls, steps: Optional[List[Any]]) -> "StepTable":
+        if isinstance(steps, StepTable):
+            return steps
+        return cls([s if isinstance(s, OfferStep) else OfferStep.from_dict(s) for s in steps or ()])
+
+    def to_state(self) -> List[Dict[str, Any]]:
+        return [step.to_dict() for step in self._steps]
+
+    def add(self, step: OfferStep) -> OfferStep:
+        if step.id in self._index:
+            self._steps[self._index[step.id]] = step
+        else:
+            self._index[step.id] = len(self._steps)
+            self._steps.append(step)
+        return step
+
+    def get(self, step_id: str) -> Optional[OfferStep]:
+        position = self._index.get(step_id)
+        return self._steps[position] if position is not None else None
+
+    def get_or_create(self, step_id: str, description: str, step_type: str, status: str = "pending") -> OfferStep:
+        return self.get(step_id) or self.add(OfferStep(step_id, description, step_type, status=status))
+
+    def __contains__(self, step_id: str) -> bool:
+        return step_id in self._index
+
+    def __iter__(self) -> Iterator[OfferStep]:
+        return iter(self._steps)
+
+    def __len__(self) -> int:
+        return len(self._steps)
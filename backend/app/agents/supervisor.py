@@ -2,7 +2,7 @@
 Kigo Pro Supervisor Agent - Simplified & Scalable LangGraph Implementation
 
 Architecture:
-- Smart LLM-based intent detection with few-shot prompting
+- Tiered intent detection: cache, local TF-IDF classifier, then few-shot LLM
 - Simplified routing to specialist agents
 - Graceful error handling at every level
 - Extensible design for adding new agents
@@ -10,12 +10,24 @@ Architecture:
 
 from typing import Annotated, List, Any, Optional, Dict
 from langgraph.graph import StateGraph, START, END
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage
-from langchain_anthropic import ChatAnthropic
 from langchain_core.runnables import RunnableConfig
+import json
 import os
 from datetime import datetime
 
+from app.agents.compaction import get_compactor
+from app.intent.batcher import IntentBatcher
+from app.intent.cache import get_intent_cache
+from app.intent.classifier import FEW_SHOT_EXAMPLES, INTENT_LABELS, get_local_classifier
+from app.llm.invoke import ainvoke_llm
+from app.llm.registry import DEFAULT_MODEL, get_llm_registry
+from app.llm.scheduler import LLMOverloadedError
+from app.server.logs import get_logger
+
+logger = get_logger("supervisor")
+
 # Import CopilotKit state
 try:
     from copilotkit import CopilotKitState
@@ -31,12 +43,11 @@ except ImportError:
 
 
 def get_llm():
-    """Get ChatAnthropic instance"""
-    return ChatAnthropic(
-        model="claude-3-5-sonnet-20241022",
+    """Get the shared, pooled ChatAnthropic instance from the process-wide registry"""
+    return get_llm_registry().get(
+        model=DEFAULT_MODEL,
         temperature=0.3,  # Lower temperature for more consistent intent detection
         max_tokens=100,   # Short responses for intent
-        api_key=os.getenv("ANTHROPIC_API_KEY")
     )
 
 
@@ -53,18 +64,24 @@ class KigoProAgentState(CopilotKitState):
     pending_action: Optional[Dict] = None
     approval_status: Optional[str] = None
     requires_approval: Optional[bool] = None
+    
+    # Offer context detected by the offer manager. State keys rather than
+    # message history, so they survive compact_history folding the turn away
+    program_type: Optional[str] = None
+    business_objective: Optional[str] = None
+
+    # Facts recorded from turns folded away by compact_history
+    conversation_facts: Optional[Dict] = None
 
 
 # ==================== INTENT DETECTION ====================
 
-async def detect_intent(user_input: str, context: Dict) -> str:
-    """
-    Smart LLM-based intent detection with few-shot prompting
-    """
-    llm = get_llm()
-    
-    # Few-shot prompt with clear examples
-    system_prompt = """You are an intent classifier for the Kigo Pro marketing platform.
+def _build_intent_prompt() -> str:
+    examples = "\n".join(
+        f'"{text}" → {label}' + (f" ({note})" if note else "")
+        for text, label, note in FEW_SHOT_EXAMPLES
+    )
+    return f"""You are an intent classifier for the Kigo Pro marketing platform.
 
 Available intents:
 1. offer_management - Creating/managing promotional offers, deals, discounts, coupons
@@ -73,59 +90,129 @@ Available intents:
 4. general - General questions, greetings, or unclear requests
 
 Examples:
-"I need help creating an offer" → offer_management
-"create a promotion for Q4" → offer_management
-"help with ofer setup" → offer_management (typo tolerance)
-"Create a new ad campaign" → ad_creation
-"Show me analytics" → analytics
-"Hello, how are you?" → general
+{examples}
 
 Respond with ONLY the intent name (offer_management, ad_creation, analytics, or general)."""
 
+
+# Few-shot prompt with clear examples
+INTENT_SYSTEM_PROMPT = _build_intent_prompt()
+
+
+def parse_intent_label(text: str) -> str:
+    """Validate and normalize an LLM label (first matching intent wins)"""
+    intent = text.strip().lower()
+    return next((i for i in INTENT_LABELS if i in intent), "general")
+
+
+def keyword_intent(user_input: str) -> str:
+    """Simple keyword fallback used when the LLM is unavailable"""
+    user_lower = user_input.lower()
+    if any(word in user_lower for word in ["offer", "ofer", "promotion", "deal", "discount"]):
+        return "offer_management"
+    elif any(word in user_lower for word in ["ad", "campaign", "advertisement"]):
+        return "ad_creation"
+    elif any(word in user_lower for word in ["analytics", "performance", "metrics"]):
+        return "analytics"
+    return "general"
+
+
+async def llm_classify_intent(user_input: str) -> str:
+    """Classify with the LLM only (raises on provider errors)"""
+    llm = get_llm()
+    response = await ainvoke_llm(llm, [
+        SystemMessage(content=INTENT_SYSTEM_PROMPT),
+        HumanMessage(content=f"Classify this: {user_input}")
+    ], node="detect_intent")
+    return parse_intent_label(response.content)
+
+
+# Same classifier, but for a numbered batch of messages
+INTENT_BATCH_SYSTEM_PROMPT = INTENT_SYSTEM_PROMPT.rsplit("\n\n", 1)[0] + """
+
+You will receive several numbered messages. Respond with ONLY a JSON array of intent names, one per message, in the same order (e.g. ["offer_management", "general"])."""
+
+
+async def llm_classify_intents(user_inputs: List[str]) -> List[str]:
+    """Classify several messages with one LLM call (raises if the reply is not a matching JSON array)"""
+    llm = get_llm_registry().get(model=DEFAULT_MODEL, temperature=0.3, max_tokens=512)
+    numbered = "\n".join(f"{i}. {text}" for i, text in enumerate(user_inputs, 1))
+    response = await ainvoke_llm(llm, [
+        SystemMessage(content=INTENT_BATCH_SYSTEM_PROMPT),
+        HumanMessage(content=f"Classify these:\n{numbered}")
+    ], node="detect_intent")
+
+    content = str(response.content)
+    labels = json.loads(content[content.index("["):content.rindex("]") + 1])
+    if not isinstance(labels, list) or len(labels) != len(user_inputs):
+        raise ValueError(f"expected {len(user_inputs)} labels, got {labels!r}")
+    return [parse_intent_label(str(label)) for label in labels]
+
+
+_intent_batcher = IntentBatcher(
+    classify_one=llm_classify_intent,
+    classify_many=llm_classify_intents,
+    window_ms=float(os.getenv("KIGO_INTENT_BATCH_WINDOW_MS", "5")),
+    max_batch=int(os.getenv("KIGO_INTENT_BATCH_MAX", "16")),
+)
+
+
+def get_intent_batcher() -> IntentBatcher:
+    return _intent_batcher
+
+
+async def detect_intent(user_input: str, context: Dict) -> str:
+    """
+    Tiered intent detection: cache → local classifier → LLM → keyword fallback
+
+    Repeated phrasings are answered from the normalized intent cache without
+    calling the LLM; set `skipIntentCache` in the context to bypass it.
+    Confident local classifications also skip the network; only ambiguous
+    inputs are escalated to the few-shot LLM classifier, micro-batched with
+    other concurrent escalations.
+    """
+    context = context or {}
+    use_cache = not context.get("skipIntentCache")
+    intent_cache = get_intent_cache()
+    if use_cache:
+        cached_intent = intent_cache.get(user_input, context)
+        if cached_intent:
+            return cached_intent
+
+    local_intent = get_local_classifier().classify(user_input)
+    if local_intent:
+        return local_intent
+
     try:
-        response = await llm.ainvoke([
-            SystemMessage(content=system_prompt),
-            HumanMessage(content=f"Classify this: {user_input}")
-        ])
-        
-        intent = response.content.strip().lower()
-        
-        # Validate and normalize
-        valid_intents = ["offer_management", "ad_creation", "analytics", "general"]
-        if any(i in intent for i in valid_intents):
-            # Return the first matching intent
-            for i in valid_intents:
-                if i in intent:
-                    return i
-        
-        return "general"
+        detected = await _intent_batcher.classify(user_input)
+        if use_cache:
+            intent_cache.put(user_input, context, detected)
+        return detected
         
+    except LLMOverloadedError:
+        raise
     except Exception as e:
-        print(f"⚠️  [Intent Detection] LLM error, using fallback: {e}")
-        # Simple fallback
-        user_lower = user_input.lower()
-        if any(word in user_lower for word in ["offer", "ofer", "promotion", "deal", "discount"]):
-            return "offer_management"
-        elif any(word in user_lower for word in ["ad", "campaign", "advertisement"]):
-            return "ad_creation"
-        elif any(word in user_lower for word in ["analytics", "performance", "metrics"]):
-            return "analytics"
-        return "general"
+        logger.warning("intent LLM failed, using keyword fallback", extra={"fields": {"error": str(e)}})
+        return keyword_intent(user_input)
 
 
 # ==================== SUPERVISOR AGENT ====================
 
-async def supervisor_agent(state: KigoProAgentState, config: RunnableConfig) -> KigoProAgentState:
+async def supervisor_agent(state: KigoProAgentState, config: RunnableConfig) -> Dict:
     """
     Supervisor: Detects intent and routes to appropriate specialist agent
+
+    Runs once per new human turn (resumes after approval skip it), so it also
+    drops the previous turn's approval fields.
     """
+    reset = clear_approval(state)
     try:
         messages = state.get("messages", [])
         context = state.get("context", {})
         
         # Extract user input
         if not messages:
-            return {**state, "agent_decision": "general_agent", "user_intent": "general"}
+            return {**reset, "agent_decision": "general_agent", "user_intent": "general"}
         
         latest_message = messages[-1]
         user_input = str(getattr(latest_message, 'content', latest_message))
@@ -143,22 +230,22 @@ async def supervisor_agent(state: KigoProAgentState, config: RunnableConfig) ->
         
         decision = agent_routing.get(intent, "general_agent")
         
-        print(f"[Supervisor] 📝 '{user_input[:60]}...' → Intent: {intent} → Agent: {decision}")
+        logger.info("routed", extra={"fields": {"intent": intent, "agent": decision}})
         
         return {
-            **state,
+            **reset,
             "user_intent": intent,
             "agent_decision": decision,
             "context": {**context, "currentPage": context.get("currentPage", "/")},
         }
         
+    except LLMOverloadedError:
+        raise
     except Exception as error:
-        print(f"❌ [Supervisor] Error: {error}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("supervisor failed")
         
         return {
-            **state,
+            **reset,
             "agent_decision": "general_agent",
             "user_intent": "general",
             "error": str(error),
@@ -172,7 +259,7 @@ def route_to_agent(state: KigoProAgentState) -> str:
 
 # ==================== GENERAL ASSISTANT AGENT ====================
 
-async def general_agent(state: KigoProAgentState, config: RunnableConfig) -> KigoProAgentState:
+async def general_agent(state: KigoProAgentState, config: RunnableConfig) -> Dict:
     """General assistant for unclear requests or greetings"""
     messages = state.get("messages", [])
     
@@ -192,76 +279,86 @@ Be friendly, concise, and helpful. If the user wants to do something specific, g
         latest_message = messages[-1] if messages else None
         user_input = str(getattr(latest_message, 'content', "Hello"))
         
-        response = await llm.ainvoke([
+        response = await ainvoke_llm(llm, [
             SystemMessage(content=system_prompt),
             HumanMessage(content=user_input)
-        ])
+        ], node="general_agent")
         
-        return {
-            **state,
-            "messages": messages + [AIMessage(content=response.content)],
-        }
+        return {"messages": [AIMessage(content=response.content)]}
         
+    except LLMOverloadedError:
+        raise
     except Exception as e:
-        print(f"❌ [General Agent] Error: {e}")
-        return {
-            **state,
-            "messages": messages + [AIMessage(content="Hi! I'm here to help you with the Kigo Pro platform. What would you like to do today?")],
-        }
+        logger.warning("general agent failed", extra={"fields": {"error": str(e)}})
+        return {"messages": [AIMessage(content="Hi! I'm here to help you with the Kigo Pro platform. What would you like to do today?")]}
 
 
 # ==================== CAMPAIGN AGENT (STUB) ====================
 
-async def campaign_agent(state: KigoProAgentState, config: RunnableConfig) -> KigoProAgentState:
+async def campaign_agent(state: KigoProAgentState, config: RunnableConfig) -> Dict:
     """Campaign/Ad creation agent"""
-    messages = state.get("messages", [])
-    
     response = AIMessage(
         content="I can help you create advertising campaigns! Let me guide you through setting up your ad. What type of campaign would you like to create?"
     )
     
-    return {**state, "messages": messages + [response]}
+    return {"messages": [response]}
 
 
 # ==================== ANALYTICS AGENT (STUB) ====================
 
-async def analytics_agent(state: KigoProAgentState, config: RunnableConfig) -> KigoProAgentState:
+async def analytics_agent(state: KigoProAgentState, config: RunnableConfig) -> Dict:
     """Analytics and reporting agent"""
-    messages = state.get("messages", [])
-    
     response = AIMessage(
         content="I'll help you view your campaign analytics. What metrics would you like to see?"
     )
     
-    return {**state, "messages": messages + [response]}
+    return {"messages": [response]}
 
 
 # ==================== APPROVAL WORKFLOW ====================
 
-async def approval_node(state: KigoProAgentState, config: RunnableConfig) -> KigoProAgentState:
+def clear_approval(state: KigoProAgentState) -> Dict:
+    """
+    Reset the turn-scoped approval fields.
+
+    The checkpointer carries state from turn to turn, so a decided (or
+    abandoned) approval would otherwise be offered again on the next turn.
+    The offer workflow step is not a graph channel - it is re-derived from
+    the conversation each turn - so there is nothing to rewind here.
+    """
+    return {"requires_approval": False, "pending_action": None, "approval_status": None}
+
+
+async def approval_node(state: KigoProAgentState, config: RunnableConfig) -> Dict:
     """Human-in-the-loop approval node"""
-    print(f"[Approval] Waiting for approval: {state.get('pending_action', {}).get('description', 'Unknown')}")
-    return {**state, "approval_status": "pending"}
+    logger.info("waiting for approval", extra={"fields": {"action": (state.get("pending_action") or {}).get("description", "Unknown")}})
+    return {"approval_status": "pending"}
 
 
-async def execute_approved_action(state: KigoProAgentState, config: RunnableConfig) -> KigoProAgentState:
+async def execute_approved_action(state: KigoProAgentState, config: RunnableConfig) -> Dict:
     """Execute action after approval"""
     if state.get("approval_status") == "approved":
-        print(f"[Execute] Executing approved action")
-        return {**state, "requires_approval": False, "pending_action": None}
-    
-    return {**state, "requires_approval": False, "pending_action": None}
+        logger.info("executing approved action")
+    return clear_approval(state)
+
+
+async def reject_action(state: KigoProAgentState, config: RunnableConfig) -> Dict:
+    """Drop a rejected action so the next turn does not offer it again"""
+    return clear_approval(state)
 
 
 # ==================== WORKFLOW CREATION ====================
 
-def create_supervisor_workflow():
+def create_supervisor_workflow(checkpointer: Optional[BaseCheckpointSaver] = None):
     """
     Create simplified, scalable supervisor workflow
     
     Architecture:
-    START → supervisor → [route to specialist] → specialist_agent → END
-                                                → approval_node (if needed) → execute → END
+    START → compact_history → supervisor → [route to specialist] → specialist_agent → END
+                                                                   → approval_node (if needed) → execute | reject → END
+    
+    Pass a checkpointer (see app.persistence.checkpointer) so threads paused
+    before approval_node can be resumed. LangGraph Studio supplies its own.
     """
     
     # Import offer manager agent
@@ -274,6 +371,7 @@ def create_supervisor_workflow():
     workflow = StateGraph(KigoProAgentState)
     
     # Add nodes
+    workflow.add_node("compact_history", get_compactor())
     workflow.add_node("supervisor", supervisor_agent)
     workflow.add_node("general_agent", general_agent)
     workflow.add_node("campaign_agent", campaign_agent)
@@ -283,9 +381,11 @@ def create_supervisor_workflow():
     # Add approval workflow nodes
     workflow.add_node("approval_node", approval_node)
     workflow.add_node("execute_action", execute_approved_action)
+    workflow.add_node("reject_action", reject_action)
     
-    # Set entry point
-    workflow.set_entry_point("supervisor")
+    # Set entry point (bounded history first, then routing)
+    workflow.set_entry_point("compact_history")
+    workflow.add_edge("compact_history", "supervisor")
     
     # Supervisor routes to agents
     workflow.add_conditional_edges(
@@ -305,22 +405,23 @@ def create_supervisor_workflow():
     
     # Helper: Check if approved
     def is_approved(state: KigoProAgentState) -> str:
-        return "execute" if state.get("approval_status") == "approved" else "end"
+        return "execute" if state.get("approval_status") == "approved" else "reject"
     
     # Agents that might need approval
     workflow.add_conditional_edges("campaign_agent", needs_approval, {"approval": "approval_node", "end": END})
     workflow.add_conditional_edges("offer_manager_agent", needs_approval, {"approval": "approval_node", "end": END})
     
     # Approval flow
-    workflow.add_conditional_edges("approval_node", is_approved, {"execute": "execute_action", "end": END})
+    workflow.add_conditional_edges("approval_node", is_approved, {"execute": "execute_action", "reject": "reject_action"})
     workflow.add_edge("execute_action", END)
+    workflow.add_edge("reject_action", END)
     
     # Simple agents end directly
     workflow.add_edge("general_agent", END)
     workflow.add_edge("analytics_agent", END)
     
     # Compile with interrupt for approval
-    compiled = workflow.compile(interrupt_before=["approval_node"])
+    compiled = workflow.compile(checkpointer=checkpointer, interrupt_before=["approval_node"])
     
-    print("✅ Kigo Pro Supervisor Workflow compiled successfully!")
+    logger.info("supervisor workflow compiled")
     return compiled
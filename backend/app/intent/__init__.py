@@ -0,0 +1 @@
+# Kigo Pro intent detection helpers
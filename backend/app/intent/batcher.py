@@ -0,0 +1,136 @@
+"""
+Micro-batched intent classification
+
+Under heavy load detect_intent would issue one short LLM call per message.
+The batcher holds classification requests for a few milliseconds, sends the
+distinct messages as one structured prompt, and hands each waiting caller its
+own label from the returned JSON array. A batch of one uses the regular
+single-message prompt. If the batch call fails or its output cannot be
+parsed, every item is retried with a per-item call.
+
+Configuration:
+- KIGO_INTENT_BATCH_WINDOW_MS (default 5; 0 disables batching)
+- KIGO_INTENT_BATCH_MAX       (default 16 messages per batch)
+"""
+
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+import asyncio
+
+from app.llm.breaker import CircuitOpenError
+from app.llm.hedging import LLMTimeoutError
+from app.llm.scheduler import LLMOverloadedError
+from app.server.logs import get_logger
+
+
+logger = get_logger("intent.batcher")
+
+ClassifyOne = Callable[[str], Awaitable[str]]
+ClassifyMany = Callable[[List[str]], Awaitable[List[str]]]
+
+
+class IntentBatcher:
+    """Collects concurrent classification requests into micro-batches"""
+
+    def __init__(self, classify_one: ClassifyOne, classify_many: ClassifyMany,
+                 window_ms: float = 5.0, max_batch: int = 16):
+        self.classify_one = classify_one
+        self.classify_many = classify_many
+        self.window_ms = window_ms
+        self.max_batch = max_batch
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # Running batches; the loop only keeps weak references to tasks
+        self._tasks: Set[asyncio.Task] = set()
+        self.requests = 0
+        self.batches = 0
+        self.batched_items = 0
+        self.single_calls = 0
+        self.fallbacks = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.window_ms > 0 and self.max_batch > 1
+
+    async def classify(self, text: str) -> str:
+        if not self.enabled:
+            return await self.classify_one(text)
+
+        self.requests += 1
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_ms / 1000, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(lambda done: self._settle(batch, done))
+
+    def _settle(self, batch: List[Tuple[str, asyncio.Future]], task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        # Cancelled mid-batch, or before it even started: never leave a caller waiting
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(RuntimeError("intent batch ended without a label"))
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        try:
+            if len(texts) == 1:
+                self.single_calls += 1
+                labels = {texts[0]: await self.classify_one(texts[0])}
+            else:
+                self.batches += 1
+                self.batched_items += len(texts)
+                labels = await self._classify_batch(texts)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for text, future in batch:
+            if future.done():
+                continue
+            outcome = labels.get(text)
+            if outcome is None:
+                future.set_exception(RuntimeError("intent batch reply had no label for this message"))
+            elif isinstance(outcome, BaseException):
+                future.set_exception(outcome)
+            else:
+                future.set_result(outcome)
+
+    async def _classify_batch(self, texts: List[str]) -> Dict[str, object]:
+        try:
+            results = await self.classify_many(texts)
+            return dict(zip(texts, results))
+        except (LLMOverloadedError, LLMTimeoutError, CircuitOpenError):
+            # Provider is saturated, slow or down - per-item retries would only add load
+            raise
+        except Exception as e:
+            logger.warning("batch failed, falling back to per-item calls", extra={"fields": {"size": len(texts), "error": str(e)}})
+            self.fallbacks += 1
+            outcomes = await asyncio.gather(*(self.classify_one(t) for t in texts), return_exceptions=True)
+            return dict(zip(texts, outcomes))
+
+    def stats(self) -> Dict:
+        return {
+            "window_ms": self.window_ms,
+            "max_batch": self.max_batch,
+            "requests": self.requests,
+            "batches": self.batches,
+            "batched_items": self.batched_items,
+            "avg_batch_size": round(self.batched_items / self.batches, 2) if self.batches else 0.0,
+            "single_calls": self.single_calls,
+            "fallbacks": self.fallbacks,
+            "in_flight_batches": len(self._tasks),
+        }
@@ -0,0 +1,129 @@
+"""
+Kigo Pro Intent Cache - normalized LRU + TTL cache in front of detect_intent
+
+Chat traffic is dominated by a handful of phrasings ("create an offer",
+"show analytics", greetings), so we remember the label the LLM gave for a
+normalized form of the message and skip the Anthropic call on repeats.
+
+Configuration:
+- KIGO_INTENT_CACHE_SIZE  (entries, default 1024)
+- KIGO_INTENT_CACHE_TTL   (seconds, default 600)
+
+Callers opt out per request by setting `skipIntentCache` in the context.
+"""
+
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+import os
+import re
+import threading
+import time
+
+
+# Context fields that can change the meaning of the same words
+CONTEXT_KEY_FIELDS = ("currentPage",)
+
+# Common misspellings seen in merchant chats
+TYPO_CORRECTIONS = {
+    "ofer": "offer",
+    "offr": "offer",
+    "oferr": "offer",
+    "ofers": "offers",
+    "promtion": "promotion",
+    "promotoin": "promotion",
+    "discout": "discount",
+    "campain": "campaign",
+    "campaing": "campaign",
+    "analitics": "analytics",
+    "anaytics": "analytics",
+    "analytcs": "analytics",
+    "metrcs": "metrics",
+    "helo": "hello",
+}
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, drop punctuation, collapse whitespace and fix common typos"""
+    text = _PUNCTUATION.sub(" ", (text or "").lower())
+    words = _WHITESPACE.split(text.strip())
+    return " ".join(TYPO_CORRECTIONS.get(word, word) for word in words if word)
+
+
+class IntentCache:
+    """Bounded LRU cache with per-entry TTL and hit/miss counters"""
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 600.0):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def make_key(user_input: str, context: Optional[Dict]) -> Tuple:
+        context = context or {}
+        return (normalize_text(user_input),) + tuple(str(context.get(f, "")) for f in CONTEXT_KEY_FIELDS)
+
+    def get(self, user_input: str, context: Optional[Dict] = None) -> Optional[str]:
+        key = self.make_key(user_input, context)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            intent, expires_at = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return intent
+
+    def put(self, user_input: str, context: Optional[Dict], intent: str) -> None:
+        key = self.make_key(user_input, context)
+        with self._lock:
+            self._entries[key] = (intent, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+_intent_cache: Optional[IntentCache] = None
+
+
+def get_intent_cache() -> IntentCache:
+    """Get the process-wide intent cache"""
+    global _intent_cache
+    if _intent_cache is None:
+        _intent_cache = IntentCache(
+            max_size=int(os.getenv("KIGO_INTENT_CACHE_SIZE", "1024")),
+            ttl_seconds=float(os.getenv("KIGO_INTENT_CACHE_TTL", "600")),
+        )
+    return _intent_cache
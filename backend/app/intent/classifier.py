@@ -0,0 +1,163 @@
+"""
+Kigo Pro Local Intent Classifier - first tier in front of the LLM
+
+A tiny TF-IDF nearest-centroid scorer trained from the supervisor's few-shot
+examples plus the labelled corpus in `intent_corpus.jsonl`. Features are word
+unigrams, word bigrams and character trigrams (for typo tolerance), so an
+answer takes microseconds and needs no network.
+
+The scorer only answers when it is confident: the best class must clear a
+minimum similarity and beat the runner-up by a relative margin of at least
+KIGO_INTENT_LOCAL_THRESHOLD (default 0.35). Everything else escalates to the
+LLM. Set KIGO_INTENT_LOCAL_THRESHOLD to a value above 1 to disable the tier.
+"""
+
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+import json
+import math
+import os
+
+from app.intent.cache import normalize_text
+
+
+INTENT_LABELS = ["offer_management", "ad_creation", "analytics", "general"]
+
+# Few-shot examples shown to the LLM classifier: (text, label, note)
+FEW_SHOT_EXAMPLES = [
+    ("I need help creating an offer", "offer_management", None),
+    ("create a promotion for Q4", "offer_management", None),
+    ("help with ofer setup", "offer_management", "typo tolerance"),
+    ("Create a new ad campaign", "ad_creation", None),
+    ("Show me analytics", "analytics", None),
+    ("Hello, how are you?", "general", None),
+]
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "intent_corpus.jsonl")
+
+MIN_SIMILARITY = 0.2
+
+
+def load_corpus(path: str = CORPUS_PATH) -> List[Tuple[str, str]]:
+    """Load (text, label) pairs from a JSONL corpus file"""
+    examples = []
+    if not os.path.exists(path):
+        return examples
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                record = json.loads(line)
+                examples.append((record["text"], record["label"]))
+    return examples
+
+
+def extract_features(text: str) -> Counter:
+    """Word unigrams, word bigrams and boundary-marked character trigrams"""
+    words = normalize_text(text).split()
+    features = Counter()
+    for word in words:
+        features["w:" + word] += 1
+        padded = f"#{word}#"
+        for i in range(len(padded) - 2):
+            features["c:" + padded[i:i + 3]] += 1
+    for first, second in zip(words, words[1:]):
+        features[f"b:{first} {second}"] += 1
+    return features
+
+
+def _normalize_vector(vector: Dict[str, float]) -> Dict[str, float]:
+    norm = math.sqrt(sum(v * v for v in vector.values()))
+    if not norm:
+        return {}
+    return {k: v / norm for k, v in vector.items()}
+
+
+class LocalIntentClassifier:
+    """TF-IDF nearest-centroid intent scorer"""
+
+    def __init__(self, threshold: float = 0.35, min_similarity: float = MIN_SIMILARITY):
+        self.threshold = threshold
+        self.min_similarity = min_similarity
+        self.idf: Dict[str, float] = {}
+        self.centroids: Dict[str, Dict[str, float]] = {}
+        self.answered = 0
+        self.escalated = 0
+
+    def fit(self, examples: Iterable[Tuple[str, str]]) -> "LocalIntentClassifier":
+        examples = list(examples)
+        docs = [(extract_features(text), label) for text, label in examples]
+        doc_freq = Counter()
+        for features, _ in docs:
+            doc_freq.update(features.keys())
+        total = len(docs)
+        self.idf = {f: math.log((1 + total) / (1 + df)) + 1 for f, df in doc_freq.items()}
+
+        sums: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        counts = Counter()
+        for features, label in docs:
+            for f, v in self._vectorize(features).items():
+                sums[label][f] += v
+            counts[label] += 1
+        self.centroids = {
+            label: _normalize_vector({f: v / counts[label] for f, v in vector.items()})
+            for label, vector in sums.items()
+        }
+        return self
+
+    def _vectorize(self, features: Counter) -> Dict[str, float]:
+        return _normalize_vector({
+            f: (1 + math.log(tf)) * self.idf[f] for f, tf in features.items() if f in self.idf
+        })
+
+    def scores(self, text: str) -> Dict[str, float]:
+        """Cosine similarity of the text to every intent centroid"""
+        vector = self._vectorize(extract_features(text))
+        return {
+            label: sum(weight * centroid.get(f, 0.0) for f, weight in vector.items())
+            for label, centroid in self.centroids.items()
+        }
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """Return (best intent, confidence) where confidence is the relative margin over the runner-up"""
+        ranked = sorted(self.scores(text).items(), key=lambda item: item[1], reverse=True)
+        if not ranked or ranked[0][1] < self.min_similarity:
+            return "general", 0.0
+        best_label, best = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        return best_label, (best - runner_up) / best
+
+    def classify(self, text: str) -> Optional[str]:
+        """Return the intent when confident, or None to escalate to the LLM"""
+        label, confidence = self.predict(text)
+        if confidence >= self.threshold:
+            self.answered += 1
+            return label
+        self.escalated += 1
+        return None
+
+    def stats(self) -> Dict:
+        total = self.answered + self.escalated
+        return {
+            "threshold": self.threshold,
+            "answered_locally": self.answered,
+            "escalated_to_llm": self.escalated,
+            "local_rate": round(self.answered / total, 4) if total else 0.0,
+        }
+
+
+def training_examples() -> List[Tuple[str, str]]:
+    """Few-shot examples plus the labelled corpus"""
+    return [(text, label) for text, label, _ in FEW_SHOT_EXAMPLES] + load_corpus()
+
+
+_classifier: Optional[LocalIntentClassifier] = None
+
+
+def get_local_classifier() -> LocalIntentClassifier:
+    """Get the process-wide local classifier, training it on first use"""
+    global _classifier
+    if _classifier is None:
+        threshold = float(os.getenv("KIGO_INTENT_LOCAL_THRESHOLD", "0.35"))
+        _classifier = LocalIntentClassifier(threshold=threshold).fit(training_examples())
+    return _classifier
@@ -0,0 +1 @@
+# Kigo Pro LLM infrastructure (shared clients, call policies)
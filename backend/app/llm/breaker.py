@@ -0,0 +1,146 @@
+"""
+Circuit breaker around the LLM provider
+
+When the provider is degraded, every detect_intent call used to wait for a
+timeout or error before dropping to the keyword fallback, and every
+general_agent call did the same before its canned greeting. The breaker is
+shared across nodes and watches the recent error and slow-call rates:
+
+- closed     calls go through; outcomes are recorded
+- open       calls fail instantly with CircuitOpenError, so nodes go straight
+             to their local fallbacks with no network wait
+- half_open  after KIGO_LLM_BREAKER_OPEN_SECONDS a single probe call is let
+             through; success closes the breaker, failure re-opens it
+
+Configuration:
+- KIGO_LLM_BREAKER_WINDOW             seconds of history considered (30)
+- KIGO_LLM_BREAKER_MIN_CALLS          calls needed before tripping (10)
+- KIGO_LLM_BREAKER_ERROR_RATE         error fraction that trips it (0.5)
+- KIGO_LLM_BREAKER_SLOW_CALL_SECONDS  a call slower than this counts as slow (10)
+- KIGO_LLM_BREAKER_SLOW_RATE          slow fraction that trips it (0.8)
+- KIGO_LLM_BREAKER_OPEN_SECONDS       how long to stay open before probing (15)
+"""
+
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+import os
+import time
+
+from app.server.logs import get_logger
+
+
+logger = get_logger("llm.breaker")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the provider while the breaker is open"""
+
+
+class CircuitBreaker:
+    """Error/latency-rate circuit breaker with half-open probing"""
+
+    def __init__(self, window_seconds: float = 30.0, min_calls: int = 10, error_rate: float = 0.5,
+                 slow_call_seconds: float = 10.0, slow_rate: float = 0.8, open_seconds: float = 15.0):
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self._outcomes: Deque[Tuple[float, bool, float]] = deque()
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.short_circuited = 0
+        self.times_opened = 0
+        self.last_opened_reason: Optional[str] = None
+
+    def _prune(self, now: float) -> None:
+        while self._outcomes and self._outcomes[0][0] < now - self.window_seconds:
+            self._outcomes.popleft()
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError unless a call may go to the provider now"""
+        now = time.monotonic()
+        if self.state == OPEN and now - self._opened_at >= self.open_seconds:
+            self.state = HALF_OPEN
+            self._probe_in_flight = False
+        if self.state == OPEN or (self.state == HALF_OPEN and self._probe_in_flight):
+            self.short_circuited += 1
+            raise CircuitOpenError(f"LLM provider circuit is {self.state}")
+        if self.state == HALF_OPEN:
+            self._probe_in_flight = True
+
+    def abandon(self) -> None:
+        """A permitted call never reached the provider - free the probe slot"""
+        if self.state == HALF_OPEN:
+            self._probe_in_flight = False
+
+    def record(self, ok: bool, seconds: float) -> None:
+        now = time.monotonic()
+        if self.state == HALF_OPEN:
+            self._probe_in_flight = False
+            if ok and seconds < self.slow_call_seconds:
+                self.state = CLOSED
+                self._outcomes.clear()
+                logger.info("circuit closed after probe")
+            else:
+                self._trip(now, "half-open probe failed")
+            return
+
+        self._outcomes.append((now, ok, seconds))
+        self._prune(now)
+        if self.state != CLOSED or len(self._outcomes) < self.min_calls:
+            return
+        total = len(self._outcomes)
+        errors = sum(1 for _, success, _ in self._outcomes if not success)
+        slow = sum(1 for _, _, latency in self._outcomes if latency >= self.slow_call_seconds)
+        if errors / total >= self.error_rate:
+            self._trip(now, f"error rate {errors}/{total}")
+        elif slow / total >= self.slow_rate:
+            self._trip(now, f"slow-call rate {slow}/{total}")
+
+    def _trip(self, now: float, reason: str) -> None:
+        self.state = OPEN
+        self._opened_at = now
+        self.times_opened += 1
+        self.last_opened_reason = reason
+        logger.warning("circuit opened", extra={"fields": {"reason": reason}})
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        self._prune(now)
+        total = len(self._outcomes)
+        errors = sum(1 for _, success, _ in self._outcomes if not success)
+        return {
+            "state": self.state,
+            "recent_calls": total,
+            "recent_error_rate": round(errors / total, 4) if total else 0.0,
+            "times_opened": self.times_opened,
+            "last_opened_reason": self.last_opened_reason,
+            "short_circuited": self.short_circuited,
+            "seconds_until_probe": max(0.0, round(self._opened_at + self.open_seconds - now, 1))
+            if self.state == OPEN else 0.0,
+        }
+
+
+_breaker: Optional[CircuitBreaker] = None
+
+
+def get_llm_breaker() -> CircuitBreaker:
+    """Get the process-wide LLM provider circuit breaker"""
+    global _breaker
+    if _breaker is None:
+        _breaker = CircuitBreaker(
+            window_seconds=float(os.getenv("KIGO_LLM_BREAKER_WINDOW", "30")),
+            min_calls=int(os.getenv("KIGO_LLM_BREAKER_MIN_CALLS", "10")),
+            error_rate=float(os.getenv("KIGO_LLM_BREAKER_ERROR_RATE", "0.5")),
+            slow_call_seconds=float(os.getenv("KIGO_LLM_BREAKER_SLOW_CALL_SECONDS", "10")),
+            slow_rate=float(os.getenv("KIGO_LLM_BREAKER_SLOW_RATE", "0.8")),
+            open_seconds=float(os.getenv("KIGO_LLM_BREAKER_OPEN_SECONDS", "15")),
+        )
+    return _breaker
@@ -0,0 +1,166 @@
+"""
+Offline fake chat model for benchmarks and load tests
+
+A drop-in stand-in for ChatAnthropic that never touches the network. Enable it
+with KIGO_LLM_BACKEND=fake and shape its behaviour with:
+
+- KIGO_FAKE_LLM_LATENCY         time to first token, e.g. "fixed:200",
+                                "uniform:50:400", "normal:200:50",
+                                "lognormal:200:0.6" (median ms, sigma)
+- KIGO_FAKE_LLM_TOKENS_PER_SEC  generation speed after the first token (0 = instant)
+- KIGO_FAKE_LLM_OUTPUT_TOKENS   length of free-text replies (default 40)
+- KIGO_FAKE_LLM_FAILURE_RATE    probability a call raises FakeLLMError (0-1)
+- KIGO_FAKE_LLM_SEED            seed for reproducible runs
+
+Intent-classifier prompts get a plausible label (from the local classifier)
+so the supervisor graph routes the same way it would in production.
+"""
+
+from typing import Any, AsyncIterator, Callable, Iterator, List, Optional
+import asyncio
+import json
+import math
+import os
+import random
+import time
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+
+class FakeLLMError(RuntimeError):
+    """Injected provider failure"""
+
+
+FILLER_WORDS = (
+    "Great question! Let's build an offer that drives repeat visits. "
+    "I recommend a limited-time discount paired with a loyalty bonus, "
+    "targeted at nearby customers who have not visited in thirty days. "
+    "What budget and timeline do you have in mind for this campaign?"
+).split()
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """Turn a latency spec into a sampler returning milliseconds"""
+    kind, _, rest = (spec or "fixed:0").partition(":")
+    args = [float(a) for a in rest.split(":") if a]
+    if kind == "fixed":
+        return lambda rng: args[0] if args else 0.0
+    if kind == "uniform":
+        return lambda rng: rng.uniform(args[0], args[1])
+    if kind == "normal":
+        return lambda rng: max(0.0, rng.gauss(args[0], args[1]))
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(math.log(args[0]), args[1])
+    raise ValueError(f"Unknown latency distribution: {spec!r}")
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model with configurable latency, token rate and failure injection"""
+
+    model: str = "fake-claude"
+    temperature: float = 0.0
+    max_tokens: int = 100
+    latency: str = "fixed:0"
+    tokens_per_second: float = 0.0
+    output_tokens: int = 40
+    failure_rate: float = 0.0
+    seed: Optional[int] = None
+
+    _rng: Optional[random.Random] = PrivateAttr(default=None)
+    _sampler: Optional[Callable[[random.Random], float]] = PrivateAttr(default=None)
+
+    @classmethod
+    def from_env(cls, **overrides: Any) -> "FakeChatModel":
+        seed = os.getenv("KIGO_FAKE_LLM_SEED")
+        params = {
+            "latency": os.getenv("KIGO_FAKE_LLM_LATENCY", "fixed:0"),
+            "tokens_per_second": float(os.getenv("KIGO_FAKE_LLM_TOKENS_PER_SEC", "0")),
+            "output_tokens": int(os.getenv("KIGO_FAKE_LLM_OUTPUT_TOKENS", "40")),
+            "failure_rate": float(os.getenv("KIGO_FAKE_LLM_FAILURE_RATE", "0")),
+            "seed": int(seed) if seed else None,
+        }
+        params.update(overrides)
+        return cls(**params)
+
+    @property
+    def _llm_type(self) -> str:
+        return "kigo-fake-chat"
+
+    # ---------- Behaviour ----------
+
+    @property
+    def rng(self) -> random.Random:
+        if self._rng is None:
+            self._rng = random.Random(self.seed)
+        return self._rng
+
+    def _first_token_delay(self) -> float:
+        if self._sampler is None:
+            self._sampler = parse_latency(self.latency)
+        return self._sampler(self.rng) / 1000
+
+    def _maybe_fail(self) -> None:
+        if self.failure_rate and self.rng.random() < self.failure_rate:
+            raise FakeLLMError("Injected fake LLM failure")
+
+    def _reply(self, messages: List[BaseMessage]) -> List[str]:
+        """Reply tokens (whitespace-delimited pieces) for a prompt"""
+        system = " ".join(str(m.content) for m in messages if m.type == "system")
+        human = str(messages[-1].content) if messages else ""
+        if "intent classifier" in system:
+            from app.intent.classifier import get_local_classifier
+
+            classifier = get_local_classifier()
+            if "JSON array" in system:
+                lines = [line.split(". ", 1)[-1] for line in human.splitlines()[1:]]
+                return [json.dumps([classifier.predict(line)[0] for line in lines])]
+            return [classifier.predict(human.replace("Classify this: ", ""))[0]]
+        count = max(1, min(self.output_tokens, self.max_tokens))
+        return [FILLER_WORDS[i % len(FILLER_WORDS)] + " " for i in range(count)]
+
+    def _token_delay(self) -> float:
+        return 1 / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    # ---------- BaseChatModel hooks ----------
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        tokens = self._reply(messages)
+        time.sleep(self._first_token_delay() + self._token_delay() * (len(tokens) - 1))
+        self._maybe_fail()
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(tokens).strip()))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        tokens = self._reply(messages)
+        await asyncio.sleep(self._first_token_delay() + self._token_delay() * (len(tokens) - 1))
+        self._maybe_fail()
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(tokens).strip()))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self._first_token_delay())
+        self._maybe_fail()
+        for i, token in enumerate(self._reply(messages)):
+            if i:
+                time.sleep(self._token_delay())
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self._first_token_delay())
+        self._maybe_fail()
+        for i, token in enumerate(self._reply(messages)):
+            if i:
+                await asyncio.sleep(self._token_delay())
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
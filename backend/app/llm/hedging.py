@@ -0,0 +1,181 @@
+"""
+Per-node timeout budgets and hedged LLM requests
+
+The slowest LLM call in a turn sets our p99, and a hung provider call used to
+hang the whole request. Every call now runs under a per-node timeout budget,
+and can optionally be hedged: if the primary call has not returned after the
+node's observed latency percentile, a duplicate is fired and whichever
+answers first wins; the loser is cancelled. Calls whose tokens are streamed
+to a client are never hedged - both attempts would emit tokens into the same
+callbacks.
+
+Hedges are capped so they can never double provider spend: at most
+KIGO_LLM_HEDGE_MAX_RATE of the last 200 calls may be hedged, counted over
+the full window even before 200 calls have been made, and a hedge is only
+sent when the scheduler has a spare slot. Timed-out and failed calls feed
+the latency percentile along with successes.
+
+Configuration:
+- KIGO_LLM_CALL_TIMEOUT      default budget per call in seconds (45)
+- KIGO_LLM_NODE_TIMEOUTS     overrides, e.g. "detect_intent=5,general_agent=15"
+- KIGO_LLM_HEDGING           "1" enables hedging (off by default)
+- KIGO_LLM_HEDGE_PERCENTILE  latency percentile that triggers a hedge (95)
+- KIGO_LLM_HEDGE_MAX_RATE    max fraction of the last 200 calls hedged (0.05)
+"""
+
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+import asyncio
+import os
+
+
+DEFAULT_NODE_TIMEOUTS = {
+    "detect_intent": 8.0,
+    "general_agent": 20.0,
+}
+
+# Hedge only once a node has this many latency samples
+MIN_SAMPLES = 20
+# Calls per node kept for the percentile, and calls the hedge cap is counted over
+WINDOW = 200
+
+
+class LLMTimeoutError(TimeoutError):
+    """Raised when an LLM call exceeds its node's timeout budget"""
+
+
+def _parse_node_timeouts(spec: str) -> Dict[str, float]:
+    timeouts = {}
+    for item in (spec or "").split(","):
+        node, _, seconds = item.partition("=")
+        if node.strip() and seconds.strip():
+            timeouts[node.strip()] = float(seconds)
+    return timeouts
+
+
+class HedgingPolicy:
+    """Applies timeout budgets and percentile-delayed hedges to LLM calls"""
+
+    def __init__(self, default_timeout: float = 45.0, node_timeouts: Optional[Dict[str, float]] = None,
+                 hedging: bool = False, percentile: float = 95.0, max_hedge_rate: float = 0.05):
+        self.default_timeout = default_timeout
+        self.node_timeouts = {**DEFAULT_NODE_TIMEOUTS, **(node_timeouts or {})}
+        self.hedging = hedging
+        self.percentile = percentile
+        self.max_hedge_rate = max_hedge_rate
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._recent_hedges: Deque[bool] = deque(maxlen=WINDOW)
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.timeouts = 0
+
+    def timeout_for(self, node: Optional[str]) -> float:
+        return self.node_timeouts.get(node or "", self.default_timeout)
+
+    def hedge_delay(self, node: Optional[str]) -> Optional[float]:
+        """Observed latency percentile for the node, or None if hedging does not apply"""
+        samples = self._latencies.get(node or "")
+        if not self.hedging or not samples or len(samples) < MIN_SAMPLES:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(self.percentile / 100 * len(ordered)))]
+
+    def _may_hedge(self) -> bool:
+        # Against the full window, not the calls seen so far: one hedge in the
+        # first few calls would otherwise already be far above the cap
+        return sum(self._recent_hedges) + 1 <= self.max_hedge_rate * WINDOW
+
+    def _record(self, node: Optional[str], seconds: float) -> None:
+        self._latencies.setdefault(node or "", deque(maxlen=WINDOW)).append(seconds)
+
+    async def call(self, fn: Callable[[], Awaitable[Any]], node: Optional[str] = None,
+                   reserve: Optional[Callable[[], bool]] = None,
+                   release: Optional[Callable[[], None]] = None, hedge: bool = True) -> Any:
+        """
+        Run `fn` under the node's budget, hedging if it is slow.
+
+        `reserve`/`release` claim and return extra capacity for the hedge; if
+        `reserve()` is False the call simply keeps waiting on the primary.
+        `hedge=False` keeps the budget but never sends a duplicate.
+        """
+        loop = asyncio.get_running_loop()
+        self.calls += 1
+        budget = self.timeout_for(node)
+        start = loop.time()
+        deadline = start + budget
+        primary = asyncio.ensure_future(fn())
+        tasks = [primary]
+        hedged = False
+        last_error: Optional[BaseException] = None
+
+        try:
+            delay = self.hedge_delay(node) if hedge else None
+            if delay is not None and delay < budget:
+                done, _ = await asyncio.wait({primary}, timeout=delay)
+                if not done and self._may_hedge() and (reserve is None or reserve()):
+                    duplicate = asyncio.ensure_future(fn())
+                    if release is not None:
+                        duplicate.add_done_callback(lambda _: release())
+                    tasks.append(duplicate)
+                    hedged = True
+                    self.hedged += 1
+
+            while tasks:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                done, _ = await asyncio.wait(tasks, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    break
+                for task in done:
+                    tasks.remove(task)
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.hedge_wins += 1
+                        self._record(node, loop.time() - start)
+                        return task.result()
+                    last_error = task.exception()
+
+            self._record(node, loop.time() - start)
+            if last_error is not None and not tasks:
+                raise last_error
+            self.timeouts += 1
+            raise LLMTimeoutError(f"LLM call for {node or 'unknown node'} exceeded its {budget:.1f}s budget")
+        finally:
+            self._recent_hedges.append(hedged)
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hedging": self.hedging,
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "hedge_rate": round(self.hedged / self.calls, 4) if self.calls else 0.0,
+            "timeouts": self.timeouts,
+            "hedge_delay_seconds": {
+                node: round(delay, 3)
+                for node in self._latencies
+                if (delay := self.hedge_delay(node)) is not None
+            },
+        }
+
+
+_policy: Optional[HedgingPolicy] = None
+
+
+def get_hedging_policy() -> HedgingPolicy:
+    """Get the process-wide timeout/hedging policy"""
+    global _policy
+    if _policy is None:
+        _policy = HedgingPolicy(
+            default_timeout=float(os.getenv("KIGO_LLM_CALL_TIMEOUT", "45")),
+            node_timeouts=_parse_node_timeouts(os.getenv("KIGO_LLM_NODE_TIMEOUTS", "")),
+            hedging=os.getenv("KIGO_LLM_HEDGING", "0") == "1",
+            percentile=float(os.getenv("KIGO_LLM_HEDGE_PERCENTILE", "95")),
+            max_hedge_rate=float(os.getenv("KIGO_LLM_HEDGE_MAX_RATE", "0.05")),
+        )
+    return _policy
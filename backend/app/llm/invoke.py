@@ -0,0 +1,117 @@
+"""
+Kigo Pro LLM call path - the one place graph nodes invoke the model
+
+Every `llm.ainvoke` in supervisor.py and offer_manager.py goes through
+`ainvoke_llm`, so call policies apply uniformly:
+
+1. single-flight coalescing of identical concurrent prompts
+   (KIGO_LLM_SINGLEFLIGHT=0 disables it). Calls whose tokens are being
+   streamed to a client (astream_events, stream_mode="messages") are never
+   coalesced: only the leader's callbacks would see the tokens.
+2. the provider circuit breaker, which fails fast while open (see breaker.py)
+3. a slot from the global priority scheduler (see scheduler.py)
+4. a per-node timeout budget, with optional hedging (see hedging.py);
+   streamed calls are not hedged either
+"""
+
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+import asyncio
+import hashlib
+import json
+import os
+import time
+
+from app.llm.breaker import get_llm_breaker
+from app.llm.hedging import get_hedging_policy
+from app.llm.scheduler import LLMOverloadedError, get_llm_scheduler, priority_for
+from app.llm.singleflight import SingleFlight
+
+if TYPE_CHECKING:  # langchain_core is loaded with the graph, not at import time
+    from langchain_core.messages import BaseMessage
+
+
+_singleflight = SingleFlight()
+
+
+def get_singleflight() -> SingleFlight:
+    return _singleflight
+
+
+def prompt_key(llm: Any, messages: List["BaseMessage"]) -> str:
+    """Stable key for a model configuration plus the exact prompt"""
+    payload = {
+        "model": getattr(llm, "model", type(llm).__name__),
+        "temperature": getattr(llm, "temperature", None),
+        "max_tokens": getattr(llm, "max_tokens", None),
+        "messages": [(m.type, m.content) for m in messages],
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def streams_tokens() -> bool:
+    """Whether the current run has a callback forwarding model tokens to a client"""
+    try:
+        from langchain_core.runnables.config import var_child_runnable_config
+        from langchain_core.tracers._streaming import _StreamingCallbackHandler
+    except ImportError:
+        return False
+    callbacks = (var_child_runnable_config.get() or {}).get("callbacks")
+    handlers = callbacks if isinstance(callbacks, list) else getattr(callbacks, "handlers", None) or []
+    return any(isinstance(handler, _StreamingCallbackHandler) for handler in handlers)
+
+
+async def ainvoke_llm(llm: Any, messages: List["BaseMessage"], node: Optional[str] = None) -> Any:
+    """
+    Invoke the model for a graph node.
+
+    Concurrent byte-identical prompts that are not being streamed to a client
+    share one in-flight provider call (cancelled once no caller waits on it), and
+    that call waits for a scheduler slot at the node's priority. Raises
+    LLMOverloadedError when the scheduler sheds load, LLMTimeoutError when
+    the node's budget runs out and CircuitOpenError (instantly) while the
+    provider circuit breaker is open.
+    """
+    scheduler = get_llm_scheduler()
+    hedging = get_hedging_policy()
+    breaker = get_llm_breaker()
+    priority = priority_for(node)
+    streamed = streams_tokens()
+
+    async def hedged_call():
+        start = time.monotonic()
+        try:
+            result = await hedging.call(
+                lambda: llm.ainvoke(messages),
+                node=node,
+                reserve=lambda: scheduler.try_acquire(priority),
+                release=scheduler.release,
+                hedge=not streamed,
+            )
+        except Exception:
+            breaker.record(False, time.monotonic() - start)
+            raise
+        breaker.record(True, time.monotonic() - start)
+        return result
+
+    async def call():
+        breaker.before_call()
+        try:
+            return await scheduler.run(hedged_call, priority=priority)
+        except (asyncio.CancelledError, LLMOverloadedError):
+            # Never reached the provider (or was abandoned) - not a health signal
+            breaker.abandon()
+            raise
+
+    if os.getenv("KIGO_LLM_SINGLEFLIGHT", "1") == "0" or streamed:
+        return await call()
+    return await _singleflight.do(prompt_key(llm, messages), call, node=node)
+
+
+def llm_call_stats() -> Dict[str, Any]:
+    """Metrics for /health"""
+    return {
+        "singleflight": _singleflight.stats(),
+        "scheduler": get_llm_scheduler().stats(),
+        "hedging": get_hedging_policy().stats(),
+        "breaker": get_llm_breaker().stats(),
+    }
@@ -0,0 +1,222 @@
+"""
+Kigo Pro LLM Client Registry - process-wide pooled ChatAnthropic instances
+
+Every graph node used to build a fresh ChatAnthropic (and with it a fresh
+HTTP client) per call, paying a new TLS handshake and connection pool each
+time. The registry keeps one model instance per configuration and binds all
+of them to a single keep-alive httpx pool whose limits come from the
+environment:
+
+- KIGO_LLM_MAX_CONNECTIONS           (default 100)
+- KIGO_LLM_MAX_KEEPALIVE_CONNECTIONS (default 20)
+- KIGO_LLM_KEEPALIVE_EXPIRY          (seconds, default 30)
+- KIGO_LLM_TIMEOUT                   (seconds, default 60)
+- KIGO_LLM_POOLING                   ("0" disables pooling, for benchmarks)
+- KIGO_LLM_BACKEND                   ("anthropic" or "fake" for the offline
+                                      model in fake.py)
+
+The FastAPI app calls `startup()` / `shutdown()` from its lifespan so the
+pool is created before the first request and closed cleanly on exit.
+"""
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+import os
+import threading
+
+import httpx
+
+from app.server.logs import get_logger
+
+if TYPE_CHECKING:  # langchain_anthropic is imported when the first model is built
+    from langchain_anthropic import ChatAnthropic
+
+
+DEFAULT_MODEL = "claude-3-5-sonnet-20241022"
+
+logger = get_logger("llm.registry")
+
+
+@dataclass(frozen=True)
+class PoolLimits:
+    """Connection pool limits for the shared upstream HTTP client"""
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    timeout: float = 60.0
+
+    @classmethod
+    def from_env(cls) -> "PoolLimits":
+        return cls(
+            max_connections=int(os.getenv("KIGO_LLM_MAX_CONNECTIONS", cls.max_connections)),
+            max_keepalive_connections=int(os.getenv("KIGO_LLM_MAX_KEEPALIVE_CONNECTIONS", cls.max_keepalive_connections)),
+            keepalive_expiry=float(os.getenv("KIGO_LLM_KEEPALIVE_EXPIRY", cls.keepalive_expiry)),
+            timeout=float(os.getenv("KIGO_LLM_TIMEOUT", cls.timeout)),
+        )
+
+
+class LLMClientRegistry:
+    """
+    Caches ChatAnthropic instances keyed by their configuration and shares
+    one pooled async HTTP client between them.
+
+    With `pooled=False` every `get()` builds a brand-new model and HTTP client,
+    which reproduces the old per-call behaviour for benchmarking.
+    """
+
+    def __init__(self, limits: Optional[PoolLimits] = None, pooled: bool = True,
+                 base_url: Optional[str] = None, backend: Optional[str] = None):
+        self.limits = limits or PoolLimits.from_env()
+        self.pooled = pooled
+        self.backend = backend or os.getenv("KIGO_LLM_BACKEND", "anthropic")
+        self.base_url = base_url or os.getenv("ANTHROPIC_BASE_URL")
+        self._models: Dict[Tuple, "ChatAnthropic"] = {}
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._unpooled_clients: list = []
+        self._lock = threading.Lock()
+        self._created = 0
+
+    # ---------- HTTP pool ----------
+
+    def _new_http_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=self.limits.max_connections,
+                max_keepalive_connections=self.limits.max_keepalive_connections,
+                keepalive_expiry=self.limits.keepalive_expiry,
+            ),
+            timeout=self.limits.timeout,
+        )
+
+    def _shared_http_client(self) -> httpx.AsyncClient:
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = self._new_http_client()
+        return self._http_client
+
+    def _bind_http_client(self, llm: "ChatAnthropic", http_client: httpx.AsyncClient) -> None:
+        """
+        Point the model's async Anthropic client at our pool.
+
+        ChatAnthropic exposes its SDK client as a lazily-built cached property,
+        so we pre-populate it. If the installed langchain_anthropic does not
+        support this, the model keeps its own client - still reused, because
+        the model instance itself is cached.
+        """
+        from langchain_anthropic import ChatAnthropic
+
+        if not isinstance(llm, ChatAnthropic):
+            return
+        try:
+            import anthropic
+
+            api_key = llm.anthropic_api_key.get_secret_value() if llm.anthropic_api_key else None
+            llm.__dict__["_async_client"] = anthropic.AsyncAnthropic(
+                api_key=api_key,
+                base_url=self.base_url or llm.anthropic_api_url,
+                max_retries=llm.max_retries,
+                http_client=http_client,
+            )
+        except Exception as e:
+            logger.warning("could not bind pooled HTTP client", extra={"fields": {"error": str(e)}})
+
+    # ---------- Models ----------
+
+    def _build(self, model: str, temperature: float, max_tokens: int, **kwargs: Any) -> "ChatAnthropic":
+        if self.backend == "fake":
+            from app.llm.fake import FakeChatModel
+
+            self._created += 1
+            return FakeChatModel.from_env(model=model, temperature=temperature, max_tokens=max_tokens)
+
+        params: Dict[str, Any] = {
+            "model": model,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "api_key": os.getenv("ANTHROPIC_API_KEY"),
+            "default_request_timeout": self.limits.timeout,
+            **kwargs,
+        }
+        if self.base_url:
+            params["base_url"] = self.base_url
+        from langchain_anthropic import ChatAnthropic
+
+        self._created += 1
+        return ChatAnthropic(**params)
+
+    def get(self, model: str = DEFAULT_MODEL, temperature: float = 0.3,
+            max_tokens: int = 100, **kwargs: Any) -> "ChatAnthropic":
+        """Return a (shared) ChatAnthropic instance for this configuration"""
+        if not self.pooled:
+            llm = self._build(model, temperature, max_tokens, **kwargs)
+            http_client = self._new_http_client()
+            self._unpooled_clients.append(http_client)
+            self._bind_http_client(llm, http_client)
+            return llm
+
+        key = (model, temperature, max_tokens, tuple(sorted(kwargs.items())))
+        llm = self._models.get(key)
+        if llm is not None:
+            return llm
+
+        with self._lock:
+            llm = self._models.get(key)
+            if llm is None:
+                llm = self._build(model, temperature, max_tokens, **kwargs)
+                self._bind_http_client(llm, self._shared_http_client())
+                self._models[key] = llm
+        return llm
+
+    # ---------- Lifecycle ----------
+
+    async def startup(self) -> None:
+        """Create the pool eagerly and build the default model"""
+        if self.pooled:
+            self._shared_http_client()
+            self.get()
+        logger.info("LLM registry ready", extra={"fields": {"backend": self.backend, "pooled": self.pooled, "limits": str(self.limits)}})
+
+    async def shutdown(self) -> None:
+        """Close every HTTP client owned by the registry"""
+        clients = list(self._unpooled_clients)
+        if self._http_client is not None:
+            clients.append(self._http_client)
+        for client in clients:
+            if not client.is_closed:
+                await client.aclose()
+        self._unpooled_clients.clear()
+        self._http_client = None
+        self._models.clear()
+        logger.info("LLM HTTP clients closed")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "pooled": self.pooled,
+            "cached_models": len(self._models),
+            "models_created": self._created,
+            "http_clients_open": len([c for c in self._unpooled_clients if not c.is_closed])
+            + (1 if self._http_client is not None and not self._http_client.is_closed else 0),
+        }
+
+
+# ==================== PROCESS-WIDE REGISTRY ====================
+
+_registry: Optional[LLMClientRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_llm_registry() -> LLMClientRegistry:
+    """Get the process-wide LLM client registry"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = LLMClientRegistry(pooled=os.getenv("KIGO_LLM_POOLING", "1") != "0")
+    return _registry
+
+
+def set_llm_registry(registry: Optional[LLMClientRegistry]) -> None:
+    """Replace the process-wide registry (benchmarks, alternative backends)"""
+    global _registry
+    with _registry_lock:
+        _registry = registry
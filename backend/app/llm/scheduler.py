@@ -0,0 +1,169 @@
+"""
+Global LLM concurrency scheduler with priorities and backpressure
+
+Every LLM call in the graph takes a slot from one process-wide scheduler
+before it reaches the provider. When all slots are busy, callers wait in a
+priority queue; when the queue itself is full (or a caller waits too long)
+the call fails fast with `LLMOverloadedError`, which the FastAPI endpoints
+turn into HTTP 503 + Retry-After instead of letting every request hang.
+
+Priority classes (lower runs first):
+- INTENT     intent classification - short, gates everything else
+- APPROVAL   any generation while resuming an approval
+- CHAT       generations for new chat turns
+
+Configuration:
+- KIGO_LLM_MAX_CONCURRENCY (default 16)
+- KIGO_LLM_MAX_QUEUE       (default 64 waiting calls)
+- KIGO_LLM_QUEUE_TIMEOUT   (seconds a call may wait for a slot, default 10)
+"""
+
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+import asyncio
+import heapq
+import itertools
+import os
+
+
+PRIORITY_INTENT = 0
+PRIORITY_APPROVAL = 1
+PRIORITY_CHAT = 2
+
+PRIORITY_NAMES = {PRIORITY_INTENT: "intent", PRIORITY_APPROVAL: "approval", PRIORITY_CHAT: "chat"}
+
+INTENT_NODES = {"detect_intent"}
+
+# Request class of the turn being processed ("chat" or "approval")
+_request_class: ContextVar[str] = ContextVar("kigo_llm_request_class", default="chat")
+
+
+class LLMOverloadedError(Exception):
+    """Raised when the scheduler sheds load instead of queueing a call"""
+
+    def __init__(self, reason: str, retry_after: int = 1):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+@contextmanager
+def llm_request_class(name: str) -> Iterator[None]:
+    """Mark LLM calls made inside this block as belonging to `name` requests"""
+    token = _request_class.set(name)
+    try:
+        yield
+    finally:
+        _request_class.reset(token)
+
+
+def priority_for(node: Optional[str]) -> int:
+    """Priority class for a call from `node` in the current request"""
+    if node in INTENT_NODES:
+        return PRIORITY_INTENT
+    if _request_class.get() == "approval":
+        return PRIORITY_APPROVAL
+    return PRIORITY_CHAT
+
+
+class LLMScheduler:
+    """Bounded-concurrency, priority-ordered admission for LLM calls"""
+
+    def __init__(self, max_concurrency: int = 16, max_queue: int = 64, queue_timeout: float = 10.0):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._active = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self.admitted: Counter = Counter()
+        self.rejected: Counter = Counter()
+        self.timed_out: Counter = Counter()
+        self.peak_queue_depth = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for _, _, f in self._waiters if not f.done())
+
+    def try_acquire(self, priority: int = PRIORITY_CHAT) -> bool:
+        """Take a slot only if one is free right now and nobody is queued"""
+        if self._active < self.max_concurrency and not self.queue_depth:
+            self._active += 1
+            self.admitted[priority] += 1
+            return True
+        return False
+
+    async def acquire(self, priority: int = PRIORITY_CHAT) -> None:
+        if self.try_acquire(priority):
+            return
+
+        if self.queue_depth >= self.max_queue:
+            self.rejected[priority] += 1
+            raise LLMOverloadedError("LLM queue is full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), waiter))
+        self.peak_queue_depth = max(self.peak_queue_depth, self.queue_depth)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            if not waiter.done():
+                waiter.cancel()
+                self.timed_out[priority] += 1
+                raise LLMOverloadedError("Timed out waiting for an LLM slot")
+            # Slot was handed over just as we timed out - keep it
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                waiter.cancel()
+            raise
+        self.admitted[priority] += 1
+
+    def release(self) -> None:
+        # Hand the slot straight to the best live waiter, if any
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    async def run(self, fn: Callable[[], Awaitable[Any]], priority: int = PRIORITY_CHAT) -> Any:
+        await self.acquire(priority)
+        try:
+            return await fn()
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        def named(counter: Counter) -> Dict[str, int]:
+            return {PRIORITY_NAMES.get(p, str(p)): n for p, n in counter.items()}
+
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "active": self._active,
+            "queue_depth": self.queue_depth,
+            "peak_queue_depth": self.peak_queue_depth,
+            "admitted": named(self.admitted),
+            "rejected": named(self.rejected),
+            "timed_out": named(self.timed_out),
+        }
+
+
+_scheduler: Optional[LLMScheduler] = None
+
+
+def get_llm_scheduler() -> LLMScheduler:
+    """Get the process-wide LLM scheduler"""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = LLMScheduler(
+            max_concurrency=int(os.getenv("KIGO_LLM_MAX_CONCURRENCY", "16")),
+            max_queue=int(os.getenv("KIGO_LLM_MAX_QUEUE", "64")),
+            queue_timeout=float(os.getenv("KIGO_LLM_QUEUE_TIMEOUT", "10")),
+        )
+    return _scheduler
@@ -0,0 +1,77 @@
+"""
+Single-flight coalescing for identical concurrent LLM prompts
+
+When many merchants load the dashboard at once we see bursts of byte-identical
+prompts (same system prompt + "I want to create a new offer", same greeting).
+`SingleFlight.do(key, fn)` lets the first caller for a key run `fn` while every
+concurrent caller with the same key awaits that one call and receives its
+result (or its exception). Nothing is cached once the call finishes.
+
+The in-flight call is shielded: a follower (or the leader) being cancelled
+does not cancel the shared call for everyone else. Once every caller waiting
+on it has gone, the call is cancelled, so an abandoned prompt stops running
+(and billing).
+"""
+
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+import asyncio
+
+
+class SingleFlight:
+    """Deduplicates concurrent async calls that share a key"""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._waiters: Dict[asyncio.Task, int] = {}
+        self.calls = 0
+        self.executed = 0
+        self.coalesced = 0
+        self.abandoned = 0
+        self.coalesced_by_node: Counter = Counter()
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]], node: Optional[str] = None) -> Any:
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            if node:
+                self.coalesced_by_node[node] += 1
+        else:
+            self.executed += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        return await self._wait(task)
+
+    async def _wait(self, task: asyncio.Task) -> Any:
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+                if not task.done():
+                    # Every caller gave up on it
+                    self.abandoned += 1
+                    task.cancel()
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._inflight)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "coalesced_rate": round(self.coalesced / self.calls, 4) if self.calls else 0.0,
+            "abandoned": self.abandoned,
+            "in_flight": self.in_flight,
+            "coalesced_by_node": dict(self.coalesced_by_node),
+        }
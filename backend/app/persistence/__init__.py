@@ -0,0 +1 @@
+# Kigo Pro persistence (graph checkpoints, thread state)
@@ -0,0 +1,552 @@
+"""
+Pluggable LangGraph checkpointers for the supervisor workflow
+
+The supervisor compiles with `interrupt_before=["approval_node"]`, which only
+means something if a checkpointer remembers where each thread stopped. Two
+implementations share one storage layout:
+
+- InMemoryCheckpointSaver  process-local dicts (dev, tests, single worker);
+                           keeps only each thread's latest checkpoint
+- SqliteCheckpointSaver    write-behind to SQLite in WAL mode; `aput` only
+                           touches memory and a queue, a background thread
+                           commits batches, and reads of a thread's latest
+                           checkpoint are served from memory or a single
+                           indexed row lookup
+
+Both keep per-thread state in a bounded ThreadStore (app.persistence.thread_store):
+the memory backend spills cold threads to disk, the SQLite one drops them
+once persisted.
+
+Pick one with KIGO_CHECKPOINTER ("memory" default, "sqlite", "none"):
+- KIGO_CHECKPOINT_DB              SQLite file (default .kigo_checkpoints.sqlite)
+- KIGO_CHECKPOINT_FLUSH_MS        max delay before a batch is committed (50)
+- KIGO_CHECKPOINT_BATCH_SIZE      rows per commit (256)
+- KIGO_CHECKPOINT_RESIDENT_THREADS  threads kept hot in memory by SQLite (1000)
+"""
+
+from collections import Counter
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+import asyncio
+import os
+import queue
+import sqlite3
+import threading
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+)
+
+from app.persistence.thread_store import ENTRY_OVERHEAD_BYTES, ThreadRecord, ThreadStore
+from app.server.logs import get_logger
+
+try:
+    from langgraph.checkpoint.base import WRITES_IDX_MAP
+except ImportError:  # older langgraph-checkpoint
+    WRITES_IDX_MAP = {}
+
+try:
+    from langgraph.checkpoint.base import get_checkpoint_metadata
+except ImportError:  # older langgraph-checkpoint
+    def get_checkpoint_metadata(config: RunnableConfig, metadata: CheckpointMetadata) -> CheckpointMetadata:
+        return metadata
+
+
+logger = get_logger("checkpointer")
+
+Typed = Tuple[str, bytes]
+# (serialized checkpoint, serialized metadata, parent checkpoint id)
+CheckpointEntry = Tuple[Typed, Typed, Optional[str]]
+# (task_id, idx) -> (channel, serialized value, task_path)
+WritesEntry = Dict[Tuple[str, int], Tuple[str, Typed, str]]
+
+
+def _thread_keys(config: RunnableConfig) -> Tuple[str, str]:
+    configurable = config["configurable"]
+    return configurable["thread_id"], configurable.get("checkpoint_ns", "")
+
+
+def _entry_bytes(entry: CheckpointEntry) -> int:
+    (_, checkpoint), (_, metadata), _ = entry
+    return len(checkpoint) + len(metadata) + ENTRY_OVERHEAD_BYTES
+
+
+def _write_bytes(row: Tuple[str, Typed, str]) -> int:
+    return len(row[1][1]) + ENTRY_OVERHEAD_BYTES
+
+
+class InMemoryCheckpointSaver(BaseCheckpointSaver):
+    """Process-local checkpointer over a bounded ThreadStore; also the hot tier of SqliteCheckpointSaver"""
+
+    # Resumes only ever load a thread's latest checkpoint, so older ones are
+    # dropped on put. The SQLite tier keeps them until they are persisted.
+    keep_history = False
+
+    def __init__(self, *, store: Optional[ThreadStore] = None, serde: Any = None):
+        super().__init__(serde=serde)
+        self.store = store or ThreadStore()
+        self.lock = self.store.lock
+
+    # ---------- Storage hooks (overridden by the SQLite tier) ----------
+    # put/put_writes call these with self.lock held, so the store cannot evict
+    # the thread between the in-memory write and the row being queued
+
+    def _store_lookup(self, thread_id: str, ns: str, checkpoint_id: Optional[str]) -> Optional[Tuple[str, CheckpointEntry, WritesEntry]]:
+        return None
+
+    def _on_put(self, thread_id: str, ns: str, checkpoint_id: str, entry: CheckpointEntry) -> None:
+        pass
+
+    def _on_put_writes(self, thread_id: str, ns: str, checkpoint_id: str, rows: List[Tuple[Tuple[str, int], Tuple[str, Typed, str]]]) -> None:
+        pass
+
+    # ---------- Reads ----------
+
+    def _memory_lookup(self, thread_id: str, ns: str, checkpoint_id: Optional[str]) -> Optional[Tuple[str, CheckpointEntry, WritesEntry]]:
+        with self.lock:
+            record = self.store.get(thread_id)
+            if record is None:
+                return None
+            if checkpoint_id is None:
+                checkpoint_id = record.latest.get(ns)
+                if checkpoint_id is None:
+                    return None
+            entry = record.checkpoints.get(ns, {}).get(checkpoint_id)
+            if entry is None:
+                return None
+            return checkpoint_id, entry, dict(record.writes.get((ns, checkpoint_id), {}))
+
+    def _lookup(self, thread_id: str, ns: str, checkpoint_id: Optional[str]) -> Optional[Tuple[str, CheckpointEntry, WritesEntry]]:
+        found = self._memory_lookup(thread_id, ns, checkpoint_id)
+        if found is not None:
+            return found
+        found = self._store_lookup(thread_id, ns, checkpoint_id)
+        if found is not None:
+            # Writes recorded in memory against a cold checkpoint may not be persisted yet
+            with self.lock:
+                record = self.store.peek(thread_id)
+                if record is not None:
+                    found[2].update(record.writes.get((ns, found[0]), {}))
+        return found
+
+    def _to_tuple(self, thread_id: str, ns: str, found: Tuple[str, CheckpointEntry, WritesEntry]) -> CheckpointTuple:
+        checkpoint_id, (checkpoint, metadata, parent_id), writes = found
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": checkpoint_id}},
+            checkpoint=self.serde.loads_typed(checkpoint),
+            metadata=self.serde.loads_typed(metadata),
+            parent_config={"configurable": {"thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": parent_id}}
+            if parent_id else None,
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed(value))
+                for (task_id, _), (channel, value, _) in sorted(writes.items())
+            ],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id, ns = _thread_keys(config)
+        found = self._lookup(thread_id, ns, get_checkpoint_id(config))
+        return self._to_tuple(thread_id, ns, found) if found else None
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id, ns = _thread_keys(config)
+        checkpoint_id = get_checkpoint_id(config)
+        found = self._memory_lookup(thread_id, ns, checkpoint_id) if self.store.is_resident(thread_id) else None
+        if found is None:
+            # Cold thread: rehydrate from spill or read the database off the event loop
+            await self._ensure_loaded(thread_id)
+            found = await asyncio.to_thread(self._lookup, thread_id, ns, checkpoint_id)
+        return self._to_tuple(thread_id, ns, found) if found else None
+
+    def list(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+             before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        configurable = (config or {}).get("configurable", {})
+        thread_filter = configurable.get("thread_id")
+        ns_filter = configurable.get("checkpoint_ns")
+        before_id = get_checkpoint_id(before) if before else None
+        keys = []
+        with self.lock:
+            for thread_id in ([thread_filter] if thread_filter else self.store.thread_ids()):
+                record = self.store.get(thread_id)
+                if record is None:
+                    continue
+                for ns, checkpoints in record.checkpoints.items():
+                    if ns_filter is None or ns == ns_filter:
+                        keys.extend((thread_id, ns, cid) for cid in checkpoints)
+        keys.sort(key=lambda k: k[2], reverse=True)
+
+        count = 0
+        for thread_id, ns, checkpoint_id in keys:
+            if before_id and checkpoint_id >= before_id:
+                continue
+            found = self._memory_lookup(thread_id, ns, checkpoint_id)
+            if found is None:
+                continue
+            result = self._to_tuple(thread_id, ns, found)
+            if filter and any(result.metadata.get(k) != v for k, v in filter.items()):
+                continue
+            yield result
+            count += 1
+            if limit is not None and count >= limit:
+                return
+
+    async def alist(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+                    before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> AsyncIterator[CheckpointTuple]:
+        results = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for result in results:
+            yield result
+
+    # ---------- Writes ----------
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        thread_id, ns = _thread_keys(config)
+        parent_id = config["configurable"].get("checkpoint_id")
+        entry = (
+            self.serde.dumps_typed(checkpoint),
+            self.serde.dumps_typed(get_checkpoint_metadata(config, metadata)),
+            parent_id,
+        )
+        checkpoint_id = checkpoint["id"]
+        with self.lock:
+            record = self.store.get(thread_id, create=True)
+            checkpoints = record.checkpoints.setdefault(ns, {})
+            previous = checkpoints.get(checkpoint_id)
+            checkpoints[checkpoint_id] = entry
+            latest = record.latest.get(ns)
+            if latest is None or checkpoint_id > latest:
+                record.latest[ns] = checkpoint_id
+            self.store.charge(record, _entry_bytes(entry) - (_entry_bytes(previous) if previous else 0))
+            if not self.keep_history:
+                self._drop_superseded(record, ns)
+            self._on_put(thread_id, ns, checkpoint_id, entry)
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": checkpoint_id}}
+
+    async def _ensure_loaded(self, thread_id: str) -> None:
+        """Bring a spilled thread back into memory off the event loop, so the put below does no disk I/O"""
+        if self.store.is_spilled(thread_id):
+            await asyncio.to_thread(self.store.load, thread_id)
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+                   new_versions: ChannelVersions) -> RunnableConfig:
+        await self._ensure_loaded(_thread_keys(config)[0])
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                   task_path: str = "") -> None:
+        thread_id, ns = _thread_keys(config)
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows = []
+        with self.lock:
+            record = self.store.get(thread_id, create=True)
+            existing = record.writes.setdefault((ns, checkpoint_id), {})
+            delta = 0
+            for idx, (channel, value) in enumerate(writes):
+                key = (task_id, WRITES_IDX_MAP.get(channel, idx))
+                # Regular writes are insert-once; special channels (errors, interrupts) overwrite
+                if key[1] >= 0 and key in existing:
+                    continue
+                row = (channel, self.serde.dumps_typed(value), task_path)
+                delta += _write_bytes(row) - (_write_bytes(existing[key]) if key in existing else 0)
+                existing[key] = row
+                rows.append((key, row))
+            if delta:
+                self.store.charge(record, delta)
+            if rows:
+                self._on_put_writes(thread_id, ns, checkpoint_id, rows)
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                          task_path: str = "") -> None:
+        await self._ensure_loaded(_thread_keys(config)[0])
+        self.put_writes(config, writes, task_id, task_path)
+
+    def _drop_checkpoint(self, record: ThreadRecord, ns: str, checkpoint_id: str) -> None:
+        entry = record.checkpoints.get(ns, {}).pop(checkpoint_id, None)
+        writes = record.writes.pop((ns, checkpoint_id), {})
+        freed = (_entry_bytes(entry) if entry else 0) + sum(_write_bytes(row) for row in writes.values())
+        if freed:
+            self.store.charge(record, -freed)
+
+    def _drop_superseded(self, record: ThreadRecord, ns: str) -> None:
+        """Keep only the namespace's latest checkpoint and its pending writes"""
+        latest = record.latest.get(ns)
+        stale = {cid for cid in record.checkpoints.get(ns, {}) if cid != latest}
+        stale.update(cid for write_ns, cid in record.writes if write_ns == ns and cid != latest)
+        for checkpoint_id in stale:
+            self._drop_checkpoint(record, ns, checkpoint_id)
+
+    def delete_thread(self, thread_id: str) -> None:
+        self.store.remove(thread_id)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        self.delete_thread(thread_id)
+
+    def close(self) -> None:
+        self.store.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "memory", **self.store.stats()}
+
+
+class SqliteCheckpointSaver(InMemoryCheckpointSaver):
+    """Write-behind SQLite (WAL) checkpointer with a hot in-memory tier"""
+
+    # Superseded checkpoints stay in memory until committed, then _evict_persisted drops them
+    keep_history = True
+
+    def __init__(self, path: str, *, flush_interval: float = 0.05, batch_size: int = 256,
+                 store: Optional[ThreadStore] = None, serde: Any = None):
+        # The database is this tier's spill: cold threads are simply dropped from
+        # memory, but never while they still have rows waiting in the queue
+        self._unflushed: Counter = Counter()
+        super().__init__(store=store or ThreadStore(max_threads=1000), serde=serde)
+        self.store.spill_dir = None
+        self.store.can_evict = lambda thread_id: thread_id not in self._unflushed
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._queue: "queue.Queue" = queue.Queue()
+        self._read_lock = threading.Lock()
+        self._reader = self._connect()
+        self._init_schema(self._reader)
+        self.rows_written = 0
+        self.commits = 0
+        self.store_reads = 0
+        self._writer_thread = threading.Thread(target=self._writer_loop, name="kigo-checkpoint-writer", daemon=True)
+        self._writer_thread.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @staticmethod
+    def _init_schema(conn: sqlite3.Connection) -> None:
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL DEFAULT '',
+                checkpoint_id TEXT NOT NULL,
+                parent_checkpoint_id TEXT,
+                type TEXT,
+                checkpoint BLOB,
+                metadata_type TEXT,
+                metadata BLOB,
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+            );
+            CREATE TABLE IF NOT EXISTS writes (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL DEFAULT '',
+                checkpoint_id TEXT NOT NULL,
+                task_id TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                channel TEXT NOT NULL,
+                type TEXT,
+                value BLOB,
+                task_path TEXT NOT NULL DEFAULT '',
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+            );
+        """)
+        conn.commit()
+
+    # ---------- Write-behind ----------
+
+    def _enqueue(self, kind: str, row: tuple) -> None:
+        # Caller holds self.lock: the thread is pinned before anyone can sweep it
+        self._unflushed[row[0]] += 1
+        self._queue.put((kind, row))
+
+    def _on_put(self, thread_id: str, ns: str, checkpoint_id: str, entry: CheckpointEntry) -> None:
+        (ctype, cblob), (mtype, mblob), parent_id = entry
+        self._enqueue("checkpoint", (thread_id, ns, checkpoint_id, parent_id, ctype, cblob, mtype, mblob))
+
+    def _on_put_writes(self, thread_id: str, ns: str, checkpoint_id: str, rows) -> None:
+        for (task_id, idx), (channel, (vtype, vblob), task_path) in rows:
+            self._enqueue("write", (thread_id, ns, checkpoint_id, task_id, idx, channel, vtype, vblob, task_path))
+
+    def _writer_loop(self) -> None:
+        conn = self._connect()
+        stopping = False
+        while not stopping:
+            batch = []
+            try:
+                batch.append(self._queue.get(timeout=self.flush_interval))
+                while len(batch) < self.batch_size:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            if not batch:
+                continue
+            stopping = any(item is None for item in batch)
+            items = [item for item in batch if item is not None]
+            try:
+                if items:
+                    self._commit(conn, items)
+            except Exception:
+                logger.exception("checkpoint batch not persisted", extra={"fields": {"rows": len(items)}})
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+        conn.close()
+
+    def _commit(self, conn: sqlite3.Connection, items: List[Tuple[str, tuple]]) -> None:
+        checkpoints = [row for kind, row in items if kind == "checkpoint"]
+        writes = [row for kind, row in items if kind == "write"]
+        with conn:
+            if checkpoints:
+                conn.executemany("INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)", checkpoints)
+            if writes:
+                conn.executemany("INSERT OR REPLACE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", writes)
+        self.rows_written += len(items)
+        self.commits += 1
+        self._evict_persisted(checkpoints, [row for _, row in items])
+
+    def _evict_persisted(self, checkpoints: List[tuple], rows: List[tuple]) -> None:
+        """Drop persisted history from memory, keeping only hot threads' latest checkpoints"""
+        with self.lock:
+            for row in rows:
+                self._unflushed[row[0]] -= 1
+                if self._unflushed[row[0]] <= 0:
+                    del self._unflushed[row[0]]
+            for thread_id, ns, checkpoint_id, *_ in checkpoints:
+                record = self.store.peek(thread_id)
+                if record is not None and record.latest.get(ns) != checkpoint_id:
+                    self._drop_checkpoint(record, ns, checkpoint_id)
+            # Threads held back by queued rows can go cold now
+            self.store.sweep()
+
+    def flush(self) -> None:
+        """Block until every queued row is committed"""
+        self._queue.join()
+
+    # ---------- Cold reads ----------
+
+    def _store_lookup(self, thread_id: str, ns: str, checkpoint_id: Optional[str]) -> Optional[Tuple[str, CheckpointEntry, WritesEntry]]:
+        with self._read_lock:
+            self.store_reads += 1
+            if checkpoint_id:
+                row = self._reader.execute(
+                    "SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata "
+                    "FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, ns, checkpoint_id),
+                ).fetchone()
+            else:
+                # Latest checkpoint only - never replays the thread's history
+                row = self._reader.execute(
+                    "SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata "
+                    "FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, ns),
+                ).fetchone()
+            if row is None:
+                return None
+            found_id, parent_id, ctype, cblob, mtype, mblob = row
+            writes = {
+                (task_id, idx): (channel, (vtype, vblob), task_path)
+                for task_id, idx, channel, vtype, vblob, task_path in self._reader.execute(
+                    "SELECT task_id, idx, channel, type, value, task_path FROM writes "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, ns, found_id),
+                )
+            }
+        return found_id, ((ctype, cblob), (mtype, mblob), parent_id), writes
+
+    def list(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+             before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        self.flush()
+        configurable = (config or {}).get("configurable", {})
+        clauses, params = [], []
+        for column, key in (("thread_id", "thread_id"), ("checkpoint_ns", "checkpoint_ns")):
+            if configurable.get(key) is not None:
+                clauses.append(f"{column} = ?")
+                params.append(configurable[key])
+        if before:
+            clauses.append("checkpoint_id < ?")
+            params.append(get_checkpoint_id(before))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._read_lock:
+            keys = self._reader.execute(
+                f"SELECT thread_id, checkpoint_ns, checkpoint_id FROM checkpoints {where} ORDER BY checkpoint_id DESC",
+                params,
+            ).fetchall()
+        count = 0
+        for thread_id, ns, checkpoint_id in keys:
+            found = self._store_lookup(thread_id, ns, checkpoint_id)
+            if found is None:
+                continue
+            result = self._to_tuple(thread_id, ns, found)
+            if filter and any(result.metadata.get(k) != v for k, v in filter.items()):
+                continue
+            yield result
+            count += 1
+            if limit is not None and count >= limit:
+                return
+
+    def delete_thread(self, thread_id: str) -> None:
+        self.flush()
+        super().delete_thread(thread_id)
+        with self._read_lock, self._reader:
+            self._reader.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+            self._reader.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+
+    def close(self) -> None:
+        """Flush outstanding batches and stop the writer thread"""
+        if self._writer_thread.is_alive():
+            self._queue.put(None)
+            self._writer_thread.join()
+        self._reader.close()
+        self.store.close()
+
+    def stats(self) -> Dict[str, Any]:
+        base = super().stats()
+        base.update({
+            "backend": "sqlite",
+            "path": self.path,
+            "queued_rows": self._queue.qsize(),
+            "rows_written": self.rows_written,
+            "commits": self.commits,
+            "store_reads": self.store_reads,
+        })
+        return base
+
+
+_checkpointer: Optional[BaseCheckpointSaver] = None
+_checkpointer_created = False
+
+
+def get_checkpointer() -> Optional[BaseCheckpointSaver]:
+    """Get the process-wide checkpointer selected by KIGO_CHECKPOINTER (None when disabled)"""
+    global _checkpointer, _checkpointer_created
+    if not _checkpointer_created:
+        backend = os.getenv("KIGO_CHECKPOINTER", "memory")
+        max_bytes = int(float(os.getenv("KIGO_THREAD_STORE_MAX_MB", "256")) * 1024 * 1024)
+        idle_ttl = float(os.getenv("KIGO_THREAD_IDLE_TTL", "3600"))
+        sweep_interval = float(os.getenv("KIGO_THREAD_SWEEP_INTERVAL", "60"))
+        if backend == "sqlite":
+            _checkpointer = SqliteCheckpointSaver(
+                os.getenv("KIGO_CHECKPOINT_DB", ".kigo_checkpoints.sqlite"),
+                flush_interval=float(os.getenv("KIGO_CHECKPOINT_FLUSH_MS", "50")) / 1000,
+                batch_size=int(os.getenv("KIGO_CHECKPOINT_BATCH_SIZE", "256")),
+                store=ThreadStore(
+                    max_bytes=max_bytes,
+                    idle_ttl=idle_ttl,
+                    max_threads=int(os.getenv("KIGO_CHECKPOINT_RESIDENT_THREADS", "1000")),
+                    sweep_interval=sweep_interval,
+                ),
+            )
+        elif backend == "memory":
+            _checkpointer = InMemoryCheckpointSaver(store=ThreadStore(
+                max_bytes=max_bytes,
+                idle_ttl=idle_ttl,
+                spill_dir=os.getenv("KIGO_THREAD_SPILL_DIR", ".kigo_threads"),
+                spill_ttl=float(os.getenv("KIGO_THREAD_SPILL_TTL", "86400")),
+                sweep_interval=sweep_interval,
+            ))
+        _checkpointer_created = True
+    return _checkpointer
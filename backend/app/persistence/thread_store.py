@@ -0,0 +1,365 @@
+"""
+Bounded per-thread state store
+
+Every chat thread's checkpoints used to live in process memory until the
+worker restarted, and `copilotkit_runtime` mints a fresh sessionId whenever
+the client omits one, so a long-running worker only ever grew. The store
+keeps one `ThreadRecord` per thread_id with byte accounting, and enforces:
+
+- a global ceiling on resident bytes (least recently used threads go first)
+- an idle TTL (threads untouched for that long are evicted on the next sweep;
+  a background sweeper runs one every `sweep_interval` seconds, so idle
+  threads go even when no request touches the store)
+- an optional cap on resident thread count
+
+Evicted threads are spilled to one file each under the spill directory and
+rehydrated transparently the next time their thread_id is requested. Spill
+files are written and deleted by a background spill thread, never on the
+caller's thread; an evicted record stays charged to the resident bytes until
+its file is on disk, and is taken back from memory if requested before that.
+Async callers reload spilled threads with `load()` off the event loop.
+Owners that persist elsewhere (the SQLite checkpointer) run without a spill
+directory and veto eviction of threads with unflushed rows via `can_evict`.
+
+Configuration (used by get_checkpointer):
+- KIGO_THREAD_STORE_MAX_MB  resident byte ceiling (256)
+- KIGO_THREAD_IDLE_TTL      seconds before an idle thread is evicted (3600)
+- KIGO_THREAD_SWEEP_INTERVAL  seconds between background sweeps (60; 0 disables)
+- KIGO_THREAD_SPILL_DIR     spill directory (.kigo_threads; empty disables spilling)
+- KIGO_THREAD_SPILL_TTL     seconds a spilled thread is kept on disk (86400)
+"""
+
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+import hashlib
+import os
+import pickle
+import queue
+import threading
+import time
+
+from app.server.logs import get_logger
+
+
+logger = get_logger("thread_store")
+
+# Rough per-entry overhead of the dicts and tuples around each blob
+ENTRY_OVERHEAD_BYTES = 200
+
+
+class ThreadRecord:
+    """All checkpoint state of one thread, across checkpoint namespaces"""
+
+    __slots__ = ("thread_id", "checkpoints", "latest", "writes", "nbytes", "last_access")
+
+    def __init__(self, thread_id: str):
+        self.thread_id = thread_id
+        self.checkpoints: Dict[str, Dict[str, Any]] = {}        # ns -> checkpoint_id -> entry
+        self.latest: Dict[str, str] = {}                         # ns -> latest checkpoint_id
+        self.writes: Dict[Any, Dict[Any, Any]] = {}              # (ns, checkpoint_id) -> writes
+        self.nbytes = 0
+        self.last_access = time.monotonic()
+
+    def __getstate__(self):
+        return (self.thread_id, self.checkpoints, self.latest, self.writes, self.nbytes)
+
+    def __setstate__(self, state):
+        self.thread_id, self.checkpoints, self.latest, self.writes, self.nbytes = state
+        self.last_access = time.monotonic()
+
+    def snapshot(self) -> "ThreadRecord":
+        """Copy of the containers (the blobs are immutable), safe to pickle on another thread"""
+        copy = ThreadRecord.__new__(ThreadRecord)
+        copy.__setstate__((
+            self.thread_id,
+            {ns: dict(entries) for ns, entries in self.checkpoints.items()},
+            dict(self.latest),
+            {key: dict(rows) for key, rows in self.writes.items()},
+            self.nbytes,
+        ))
+        return copy
+
+
+class ThreadStore:
+    """LRU + TTL bounded map of thread_id -> ThreadRecord with disk spill"""
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, idle_ttl: float = 3600.0,
+                 max_threads: Optional[int] = None, spill_dir: Optional[str] = None,
+                 spill_ttl: float = 86400.0, can_evict: Optional[Callable[[str], bool]] = None,
+                 sweep_interval: Optional[float] = None):
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self.max_threads = max_threads
+        self.spill_dir = spill_dir or None
+        self.spill_ttl = spill_ttl
+        self.can_evict = can_evict
+        self._records: "OrderedDict[str, ThreadRecord]" = OrderedDict()
+        # thread_id -> (bytes on disk, spilled at), oldest spill first
+        self._spilled: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+        # thread_id -> (record, snapshot being written) for evictions whose file is not on disk yet
+        self._spilling: Dict[str, Tuple[ThreadRecord, ThreadRecord]] = {}
+        self.lock = threading.RLock()
+        self.resident_bytes = 0          # includes records still being spilled
+        self.spilling_bytes = 0
+        self._spill_queue: "queue.Queue" = queue.Queue()
+        self._spill_thread: Optional[threading.Thread] = None
+        self.evictions = 0
+        self.expirations = 0
+        self.rehydrations = 0
+        self.sweeps = 0
+        self._closed = threading.Event()
+        self._sweep_thread: Optional[threading.Thread] = None
+        if sweep_interval:
+            self._sweep_thread = threading.Thread(
+                target=self._sweep_loop, args=(sweep_interval,), name="kigo-thread-sweep", daemon=True)
+            self._sweep_thread.start()
+        if self.spill_dir:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            # Spilled threads belong to the process that spilled them
+            for name in os.listdir(self.spill_dir):
+                if name.endswith((".thread", ".tmp")):
+                    os.remove(os.path.join(self.spill_dir, name))
+
+    # ---------- Access ----------
+
+    def is_resident(self, thread_id: str) -> bool:
+        return thread_id in self._records
+
+    def peek(self, thread_id: str) -> Optional[ThreadRecord]:
+        """Resident record without touching recency or rehydrating"""
+        return self._records.get(thread_id)
+
+    def is_spilled(self, thread_id: str) -> bool:
+        """Whether reading this thread needs disk I/O"""
+        return thread_id in self._spilled and thread_id not in self._records
+
+    def get(self, thread_id: str, create: bool = False) -> Optional[ThreadRecord]:
+        """
+        Resident record for `thread_id`, rehydrating it from disk if it was spilled.
+
+        Rehydrating reads the spill file on the calling thread; async callers
+        `load()` spilled threads off the event loop first.
+        """
+        with self.lock:
+            record = self._records.get(thread_id)
+            if record is None and thread_id in self._spilling:
+                record = self._unspill(thread_id)
+            if record is None and thread_id in self._spilled:
+                loaded = self._read_spill(thread_id)
+                if loaded is not None:
+                    record = self._install(loaded)
+                    self._enforce(keep=thread_id)
+                else:
+                    self._spilled.pop(thread_id, None)
+            if record is None and create:
+                record = ThreadRecord(thread_id)
+                self._records[thread_id] = record
+            if record is not None:
+                record.last_access = time.monotonic()
+                self._records.move_to_end(thread_id)
+            return record
+
+    def load(self, thread_id: str) -> None:
+        """Rehydrate a spilled thread, reading its file without holding the lock (run via asyncio.to_thread)"""
+        with self.lock:
+            if not self.is_spilled(thread_id):
+                return
+            spill = self._spilled[thread_id]
+        loaded = self._read_spill(thread_id)
+        with self.lock:
+            if self._spilled.get(thread_id) is not spill or thread_id in self._records:
+                return  # brought back, re-spilled or removed meanwhile; get() handles it
+            if loaded is None:
+                self._spilled.pop(thread_id, None)
+                return
+            self._install(loaded)
+            self._enforce(keep=thread_id)
+
+    def charge(self, record: ThreadRecord, delta: int) -> None:
+        """Adjust a record's byte count, evicting other threads if over the ceiling"""
+        with self.lock:
+            record.nbytes += delta
+            if record.thread_id in self._records:
+                self.resident_bytes += delta
+            self._enforce(keep=record.thread_id)
+
+    def remove(self, thread_id: str) -> None:
+        with self.lock:
+            record = self._records.pop(thread_id, None)
+            if record is not None:
+                self.resident_bytes -= record.nbytes
+            spilling = self._spilling.pop(thread_id, None)
+            if spilling is not None:
+                self.resident_bytes -= spilling[0].nbytes
+                self.spilling_bytes -= spilling[0].nbytes
+            if self._spilled.pop(thread_id, None) is not None or spilling is not None:
+                self._submit("remove", thread_id)
+
+    def thread_ids(self) -> Iterator[str]:
+        with self.lock:
+            return iter(list(self._records) + [t for t in self._spilled if t not in self._records])
+
+    def sweep(self) -> None:
+        """Expire idle threads and enforce the ceilings"""
+        with self.lock:
+            self.sweeps += 1
+            self._enforce()
+
+    def _sweep_loop(self, interval: float) -> None:
+        while not self._closed.wait(interval):
+            try:
+                self.sweep()
+            except Exception:
+                logger.exception("thread sweep failed")
+
+    def close(self) -> None:
+        """Stop the background sweeper and wait for queued spill file operations"""
+        self._closed.set()
+        if self._sweep_thread is not None:
+            self._sweep_thread.join()
+        self.flush()
+
+    def flush(self) -> None:
+        """Block until every queued spill file operation has finished"""
+        if self._spill_thread is not None:
+            self._spill_queue.join()
+
+    # ---------- Eviction ----------
+
+    def _enforce(self, keep: Optional[str] = None) -> None:
+        now = time.monotonic()
+        for thread_id, record in list(self._records.items()):
+            if now - record.last_access < self.idle_ttl:
+                break  # LRU order: everything after this was touched more recently
+            if thread_id != keep and self._evict(record):
+                self.expirations += 1
+
+        for thread_id, record in list(self._records.items()):
+            over_bytes = self.resident_bytes - self.spilling_bytes > self.max_bytes
+            over_count = self.max_threads is not None and len(self._records) > self.max_threads
+            if not (over_bytes or over_count):
+                break
+            if thread_id != keep:
+                self._evict(record)
+
+        while self._spilled:
+            thread_id, (_, spilled_at) = next(iter(self._spilled.items()))
+            if now - spilled_at < self.spill_ttl:
+                break
+            del self._spilled[thread_id]
+            self._submit("remove", thread_id)
+
+    def _evict(self, record: ThreadRecord) -> bool:
+        if self.can_evict is not None and not self.can_evict(record.thread_id):
+            return False
+        del self._records[record.thread_id]
+        if self.spill_dir:
+            # Written by the spill thread; the bytes stay charged until the file is on disk
+            snapshot = record.snapshot()
+            self._spilling[record.thread_id] = (record, snapshot)
+            self.spilling_bytes += record.nbytes
+            self._submit("spill", record.thread_id, snapshot)
+            return True
+        self.resident_bytes -= record.nbytes
+        self.evictions += 1
+        return True
+
+    def _unspill(self, thread_id: str) -> ThreadRecord:
+        """Take back a record whose spill has not finished; the pending write is discarded"""
+        record, _ = self._spilling.pop(thread_id)
+        self.spilling_bytes -= record.nbytes
+        self._records[thread_id] = record
+        return record
+
+    def _install(self, record: ThreadRecord) -> ThreadRecord:
+        self._spilled.pop(record.thread_id, None)
+        self._submit("remove", record.thread_id)
+        self._records[record.thread_id] = record
+        self.resident_bytes += record.nbytes
+        self.rehydrations += 1
+        return record
+
+    # ---------- Spill files (spill thread only, except reads) ----------
+
+    def _submit(self, op: str, thread_id: str, snapshot: Optional[ThreadRecord] = None) -> None:
+        if self._spill_thread is None:
+            self._spill_thread = threading.Thread(target=self._spill_loop, name="kigo-thread-spill", daemon=True)
+            self._spill_thread.start()
+        self._spill_queue.put((op, thread_id, snapshot))
+
+    def _spill_loop(self) -> None:
+        while True:
+            op, thread_id, snapshot = self._spill_queue.get()
+            try:
+                if op == "spill":
+                    self._write_spill(thread_id, snapshot)
+                else:
+                    self._remove_spill_file(thread_id)
+            except Exception:
+                logger.exception("spill thread error", extra={"fields": {"op": op, "thread_id": thread_id}})
+            finally:
+                self._spill_queue.task_done()
+
+    def _spill_path(self, thread_id: str) -> str:
+        digest = hashlib.sha1(thread_id.encode("utf-8")).hexdigest()
+        return os.path.join(self.spill_dir, f"{digest}.thread")
+
+    def _write_spill(self, thread_id: str, snapshot: ThreadRecord) -> None:
+        path = self._spill_path(thread_id)
+        tmp_path = f"{path}.tmp"
+        error: Optional[OSError] = None
+        try:
+            with open(tmp_path, "wb") as f:
+                pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+            size = os.path.getsize(path)
+        except OSError as e:
+            error = e
+        with self.lock:
+            pending = self._spilling.get(thread_id)
+            if pending is None or pending[1] is not snapshot:
+                # Taken back or removed while the file was being written
+                if error is None:
+                    self._remove_spill_file(thread_id)
+                return
+            record, _ = self._spilling.pop(thread_id)
+            self.spilling_bytes -= record.nbytes
+            if error is not None:
+                logger.warning("spill failed, keeping thread resident", extra={"fields": {"thread_id": thread_id, "error": str(error)}})
+                self._records[thread_id] = record
+                self._records.move_to_end(thread_id, last=False)
+                return
+            self.resident_bytes -= record.nbytes
+            self._spilled.pop(thread_id, None)
+            self._spilled[thread_id] = (size, time.monotonic())
+            self.evictions += 1
+
+    def _read_spill(self, thread_id: str) -> Optional[ThreadRecord]:
+        try:
+            with open(self._spill_path(thread_id), "rb") as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            logger.warning("rehydrate failed", extra={"fields": {"thread_id": thread_id, "error": str(e)}})
+            return None
+
+    def _remove_spill_file(self, thread_id: str) -> None:
+        try:
+            os.remove(self._spill_path(thread_id))
+        except OSError:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "resident_threads": len(self._records),
+                "resident_bytes": self.resident_bytes,
+                "max_bytes": self.max_bytes,
+                "spilling_threads": len(self._spilling),
+                "spilled_threads": len(self._spilled),
+                "spilled_bytes": sum(size for size, _ in self._spilled.values()),
+                "idle_ttl_seconds": self.idle_ttl,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "sweeps": self.sweeps,
+                "rehydrations": self.rehydrations,
+            }
@@ -0,0 +1 @@
+# Kigo Pro server infrastructure (transport, middleware helpers)
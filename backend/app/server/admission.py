@@ -0,0 +1,269 @@
+"""
+Token-bucket admission control for chat and agent endpoints
+
+Nothing used to stop one merchant session from flooding `/copilotkit` or
+`/agents/execute` and using up the LLM budget every other session on the
+worker shares. Each request now takes from two buckets per scope before it
+runs. One counts requests; the other counts estimated LLM tokens, from the
+message length plus a fixed per-turn allowance for prompts and output.
+
+Scopes:
+- session  keyed by sessionId / threadId (the same id in every endpoint)
+- tenant   keyed by tenantId / merchantId, else the program type; skipped
+           when the request carries neither
+
+A request is admitted only if every bucket has room. Otherwise the tokens it
+already took are returned and `RateLimitedError` is raised; the endpoints
+turn it into HTTP 429 + Retry-After.
+
+Buckets live in a `BucketStore`. The default is in process memory.
+`SqliteBucketStore` keeps them in a SQLite file that every worker on the
+host opens, a local stand-in for a shared store like Redis, so limits hold
+across serve.py workers.
+
+Configuration (rates per minute, bursts are bucket capacity):
+- KIGO_RATE_LIMITS           "0" disables admission control
+- KIGO_RATE_SESSION_RPM      (30)      KIGO_RATE_SESSION_BURST        (10)
+- KIGO_RATE_SESSION_TPM      (20000)   KIGO_RATE_SESSION_TOKEN_BURST  (20000)
+- KIGO_RATE_TENANT_RPM       (300)     KIGO_RATE_TENANT_BURST         (60)
+- KIGO_RATE_TENANT_TPM       (200000)  KIGO_RATE_TENANT_TOKEN_BURST   (200000)
+- KIGO_RATE_TOKENS_PER_TURN  estimated prompt + output tokens per turn (1500)
+- KIGO_RATE_STORE            "memory" (default) or "sqlite"
+- KIGO_RATE_DB               SQLite path for the shared store (.kigo_ratelimit.sqlite)
+"""
+
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import math
+import os
+import sqlite3
+import threading
+import time
+
+
+class RateLimitedError(Exception):
+    """Raised when a request exceeds one of its token buckets"""
+
+    def __init__(self, reason: str, retry_after: float, scope: str, bucket: str):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+        self.scope = scope
+        self.bucket = bucket
+
+
+@dataclass(frozen=True)
+class BucketSpec:
+    """Refill rate (per second) and capacity of one kind of bucket"""
+    name: str
+    rate: float
+    capacity: float
+
+
+# ---------- Stores ----------
+
+class BucketStore:
+    """Where bucket levels live; `take` must be atomic per key"""
+
+    # Whether `take` may block on I/O (then it is run off the event loop)
+    blocking = False
+
+    def take(self, key: str, cost: float, rate: float, capacity: float) -> Tuple[bool, float]:
+        """
+        Remove `cost` tokens from the bucket (a negative cost returns them).
+
+        Returns (allowed, retry_after_seconds). A denied take leaves the
+        bucket unchanged.
+        """
+        raise NotImplementedError
+
+    def size(self) -> int:
+        return 0
+
+
+def _refill(level: float, updated: float, now: float, rate: float, capacity: float) -> float:
+    return min(capacity, level + (now - updated) * rate)
+
+
+def _apply(level: float, cost: float, rate: float, capacity: float) -> Tuple[bool, float, float]:
+    """(allowed, new level, retry_after) for taking `cost` from `level`"""
+    if cost <= level:
+        return True, min(capacity, level - cost), 0.0
+    return False, level, (cost - level) / rate if rate > 0 else 60.0
+
+
+class MemoryBucketStore(BucketStore):
+    """Per-process buckets; past `max_keys` the least recently used one is dropped (and comes back full)"""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, cost: float, rate: float, capacity: float) -> Tuple[bool, float]:
+        now = time.monotonic()
+        with self._lock:
+            level, updated = self._buckets.get(key, (capacity, now))
+            level = _refill(level, updated, now, rate, capacity)
+            allowed, level, retry_after = _apply(level, cost, rate, capacity)
+            self._buckets[key] = (level, now)
+            self._buckets.move_to_end(key)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)  # least recently used
+            return allowed, retry_after
+
+    def size(self) -> int:
+        return len(self._buckets)
+
+
+class SqliteBucketStore(BucketStore):
+    """Buckets in a SQLite file shared by every worker process on the host"""
+
+    blocking = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, level REAL NOT NULL, updated REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: str, cost: float, rate: float, capacity: float) -> Tuple[bool, float]:
+        conn = self._connect()
+        now = time.time()  # wall clock: shared between processes
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT level, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            level, updated = row if row else (capacity, now)
+            level = _refill(level, updated, now, rate, capacity)
+            allowed, level, retry_after = _apply(level, cost, rate, capacity)
+            conn.execute("INSERT OR REPLACE INTO buckets (key, level, updated) VALUES (?, ?, ?)", (key, level, now))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed, retry_after
+
+    def size(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM buckets").fetchone()[0]
+
+
+# ---------- Admission ----------
+
+def _per_minute(env: str, default: float) -> float:
+    return float(os.getenv(env, str(default))) / 60.0
+
+
+class AdmissionController:
+    """Checks a request against its session and tenant buckets"""
+
+    def __init__(self, store: Optional[BucketStore] = None, enabled: bool = True,
+                 tokens_per_turn: int = 1500, specs: Optional[Dict[str, Tuple[BucketSpec, BucketSpec]]] = None):
+        self.store = store or MemoryBucketStore()
+        self.enabled = enabled
+        self.tokens_per_turn = tokens_per_turn
+        self.specs = specs or {
+            "session": (
+                BucketSpec("requests", _per_minute("KIGO_RATE_SESSION_RPM", 30), float(os.getenv("KIGO_RATE_SESSION_BURST", "10"))),
+                BucketSpec("tokens", _per_minute("KIGO_RATE_SESSION_TPM", 20000), float(os.getenv("KIGO_RATE_SESSION_TOKEN_BURST", "20000"))),
+            ),
+            "tenant": (
+                BucketSpec("requests", _per_minute("KIGO_RATE_TENANT_RPM", 300), float(os.getenv("KIGO_RATE_TENANT_BURST", "60"))),
+                BucketSpec("tokens", _per_minute("KIGO_RATE_TENANT_TPM", 200000), float(os.getenv("KIGO_RATE_TENANT_TOKEN_BURST", "200000"))),
+            ),
+        }
+        self.admitted = 0
+        self.limited: Counter = Counter()
+
+    def estimate_tokens(self, message: Optional[str]) -> int:
+        """Prompt + output tokens a turn with this message is expected to use"""
+        return len(message or "") // 4 + self.tokens_per_turn
+
+    def _take_all(self, takes: List[Tuple[str, str, BucketSpec, float]]) -> Optional[RateLimitedError]:
+        done = []
+        for scope, key, spec, cost in takes:
+            cost = min(cost, spec.capacity)  # an oversized turn needs a full bucket, not forever
+            allowed, retry_after = self.store.take(f"{scope}:{spec.name}:{key}", cost, spec.rate, spec.capacity)
+            if not allowed:
+                for taken_key, taken_spec, taken_cost in done:
+                    self.store.take(taken_key, -taken_cost, taken_spec.rate, taken_spec.capacity)
+                return RateLimitedError(f"{scope} {spec.name} limit reached", retry_after, scope, spec.name)
+            done.append((f"{scope}:{spec.name}:{key}", spec, cost))
+        return None
+
+    async def admit(self, session: Optional[str], tenant: Optional[str] = None,
+                    message: Optional[str] = None, tokens: Optional[int] = None) -> None:
+        """Take one request and the turn's estimated tokens, or raise RateLimitedError"""
+        if not self.enabled:
+            return
+        tokens = self.estimate_tokens(message) if tokens is None else tokens
+        takes = []
+        for scope, key in (("session", session), ("tenant", tenant)):
+            if key:
+                request_spec, token_spec = self.specs[scope]
+                takes.append((scope, str(key), request_spec, 1.0))
+                takes.append((scope, str(key), token_spec, float(tokens)))
+        if not takes:
+            return
+        if self.store.blocking:
+            error = await asyncio.to_thread(self._take_all, takes)
+        else:
+            error = self._take_all(takes)
+        if error is not None:
+            self.limited[f"{error.scope}_{error.bucket}"] += 1
+            raise error
+        self.admitted += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "store": type(self.store).__name__,
+            "admitted": self.admitted,
+            "limited": dict(self.limited),
+            "buckets": self.store.size() if not self.store.blocking else None,
+        }
+
+
+def tenant_key(context: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Tenant of a request: explicit tenant/merchant id, else its program type"""
+    context = context or {}
+    campaign = context.get("campaignData") if isinstance(context.get("campaignData"), dict) else {}
+    for source in (context, campaign):
+        for field in ("tenantId", "merchantId"):
+            if source.get(field):
+                return f"{field}:{source[field]}"
+    program = context.get("programType") or campaign.get("programType")
+    return f"program:{program}" if program else None
+
+
+# ==================== PROCESS-WIDE CONTROLLER ====================
+
+_controller: Optional[AdmissionController] = None
+
+
+def get_admission_controller() -> AdmissionController:
+    """Get the process-wide admission controller (configured from the environment)"""
+    global _controller
+    if _controller is None:
+        if os.getenv("KIGO_RATE_STORE", "memory") == "sqlite":
+            store: BucketStore = SqliteBucketStore(os.getenv("KIGO_RATE_DB", ".kigo_ratelimit.sqlite"))
+        else:
+            store = MemoryBucketStore()
+        _controller = AdmissionController(
+            store=store,
+            enabled=os.getenv("KIGO_RATE_LIMITS", "1") != "0",
+            tokens_per_turn=int(os.getenv("KIGO_RATE_TOKENS_PER_TURN", "1500")),
+        )
+    return _controller
@@ -0,0 +1,454 @@
+"""
+Thread-affine multi-process dispatcher
+
+`serve.py` starts N single-process uvicorn workers on loopback ports and puts
+this small ASGI proxy in front of them. Each request is routed by consistent
+hashing of its thread key, so a thread's checkpoints, intent cache entries
+and other per-process state always live on the same worker:
+
+- X-Thread-Id header, or ?thread_id= query parameter
+- body `thread_id` / `threadId` (approve, agents/execute)
+- body `context.sessionId` (chat and stream endpoints)
+
+Chat requests without a sessionId get one minted here, so the thread the
+worker creates hashes back to that same worker on the next turn. Requests
+with no key at all go to the worker with the fewest requests in flight.
+
+Rolling restart (SIGHUP to serve.py): each worker in turn is replaced by a
+fresh process on a spare port. Once the new process answers /ready (graph
+compiled, caches warm) it takes
+over the worker's ring slot; the old one gets SIGTERM and drains its
+in-flight requests. Hash assignments never move during a restart.
+
+WebSockets are relayed the same way, keyed by their ?thread_id= query. A
+socket opened without one gets a minted thread_id appended to the query it
+is relayed with, so the worker opens its session on the thread it was
+routed by.
+
+GET /ready is answered here rather than proxied: 200 only while every ring
+slot's worker answers its own /ready, since a keyed request cannot be sent
+anywhere else. GET /_dispatcher/stats reports how requests are spread across
+workers.
+"""
+
+from bisect import bisect
+from typing import Any, Dict, List, Optional
+import asyncio
+import hashlib
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import httpx
+from fastapi import FastAPI, Request, WebSocket
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.requests import HTTPConnection
+
+from app.server.logs import get_logger
+
+
+# Hop-by-hop headers that must not be forwarded by a proxy
+HOP_HEADERS = {"connection", "keep-alive", "transfer-encoding", "te", "trailer", "upgrade",
+               "proxy-authorization", "proxy-authenticate", "host", "content-length"}
+
+DISPATCHER_PATH = "/_dispatcher"
+
+logger = get_logger("dispatcher")
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent hash ring with virtual nodes"""
+
+    def __init__(self, nodes: List[str], vnodes: int = 128):
+        self._points = sorted((_hash(f"{node}#{i}"), node) for node in nodes for i in range(vnodes))
+        self._keys = [point for point, _ in self._points]
+
+    def node_for(self, key: str) -> str:
+        index = bisect(self._keys, _hash(key)) % len(self._keys)
+        return self._points[index][1]
+
+
+def routing_key(request: HTTPConnection, body: Any) -> Optional[str]:
+    """Thread key of a request, if it carries one"""
+    key = request.headers.get("x-thread-id") or request.query_params.get("thread_id")
+    if key:
+        return key
+    if isinstance(body, dict):
+        key = body.get("thread_id") or body.get("threadId")
+        context = body.get("context")
+        if not key and isinstance(context, dict):
+            key = context.get("sessionId")
+    return str(key) if key else None
+
+
+class WorkerSlot:
+    """One position on the ring and the process currently serving it"""
+
+    def __init__(self, worker_id: str, ports: List[int]):
+        self.worker_id = worker_id
+        self.ports = ports                     # primary and spare, alternated on restart
+        self.generation = 0
+        self.process: Optional[subprocess.Popen] = None
+        self.restarting = False
+        self.started_at = 0.0
+        self.requests = 0
+        self.keyed_requests = 0
+        self.in_flight = 0
+        self.errors = 0
+        self.restarts = 0
+
+    @property
+    def port(self) -> int:
+        return self.ports[self.generation % 2]
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+
+class Dispatcher:
+    """Spawns the workers and proxies requests to them by thread key"""
+
+    def __init__(self, workers: int, base_port: int = 8100, app_path: str = "main:app",
+                 vnodes: int = 128, ready_timeout: float = 90.0, drain_timeout: float = 30.0,
+                 cwd: Optional[str] = None, ready_path: str = "/ready"):
+        self.app_path = app_path
+        self.ready_path = ready_path
+        self.ready_timeout = ready_timeout
+        self.drain_timeout = drain_timeout
+        self.cwd = cwd
+        self.slots = [WorkerSlot(f"worker-{i}", [base_port + i, base_port + workers + i]) for i in range(workers)]
+        self._by_id = {slot.worker_id: slot for slot in self.slots}
+        self.ring = HashRing([slot.worker_id for slot in self.slots], vnodes=vnodes)
+        self.client: Optional[httpx.AsyncClient] = None
+        self.sessions_minted = 0
+        self._restart_lock = asyncio.Lock()
+        self._monitor: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    # ---------- Process management ----------
+
+    def _spawn(self, slot: WorkerSlot, port: int) -> subprocess.Popen:
+        env = {**os.environ, "KIGO_WORKER_ID": slot.worker_id}
+        env.setdefault("KIGO_DRAIN_TIMEOUT", str(self.drain_timeout))
+        spill_dir = os.getenv("KIGO_THREAD_SPILL_DIR", ".kigo_threads")
+        if spill_dir:
+            # The thread store clears its spill directory on startup, so each
+            # process (including a replacement and the one it retires) gets its own
+            env["KIGO_THREAD_SPILL_DIR"] = os.path.join(spill_dir, f"{slot.worker_id}-{port}")
+        return subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", self.app_path, "--host", "127.0.0.1", "--port", str(port),
+             "--timeout-graceful-shutdown", str(int(self.drain_timeout)), "--no-access-log"],
+            cwd=self.cwd,
+            env=env,
+        )
+
+    async def _wait_ready(self, process: subprocess.Popen, port: int) -> None:
+        deadline = time.monotonic() + self.ready_timeout
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"worker on port {port} exited with code {process.returncode}")
+            try:
+                response = await self.client.get(f"http://127.0.0.1:{port}{self.ready_path}", timeout=2.0)
+                if response.status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.25)
+        raise TimeoutError(f"worker on port {port} not ready after {self.ready_timeout:.0f}s")
+
+    async def _stop_process(self, process: Optional[subprocess.Popen]) -> None:
+        if process is None or process.poll() is not None:
+            return
+        process.send_signal(signal.SIGTERM)
+        # uvicorn's graceful shutdown, then the app's own drain, each up to drain_timeout
+        try:
+            await asyncio.wait_for(asyncio.to_thread(process.wait), timeout=2 * self.drain_timeout + 5)
+        except asyncio.TimeoutError:
+            process.kill()
+            await asyncio.to_thread(process.wait)
+
+    async def start(self) -> None:
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(connect=5.0, read=None, write=30.0, pool=30.0),
+            limits=httpx.Limits(max_connections=None, max_keepalive_connections=64 * len(self.slots)),
+        )
+        for slot in self.slots:
+            slot.process = self._spawn(slot, slot.port)
+        await asyncio.gather(*(self._wait_ready(slot.process, slot.port) for slot in self.slots))
+        now = time.monotonic()
+        for slot in self.slots:
+            slot.started_at = now
+        self._monitor = asyncio.create_task(self._monitor_workers())
+        logger.info("workers ready", extra={"fields": {"workers": len(self.slots), "ports": [slot.port for slot in self.slots]}})
+
+    async def stop(self) -> None:
+        self._stopping = True
+        if self._monitor is not None:
+            self._monitor.cancel()
+        await asyncio.gather(*(self._stop_process(slot.process) for slot in self.slots))
+        if self.client is not None:
+            await self.client.aclose()
+
+    async def _replace(self, slot: WorkerSlot) -> None:
+        """Start a fresh process on the slot's spare port, then retire the old one"""
+        slot.restarting = True
+        try:
+            spare_port = slot.ports[(slot.generation + 1) % 2]
+            process = self._spawn(slot, spare_port)
+            try:
+                await self._wait_ready(process, spare_port)
+            except Exception:
+                await self._stop_process(process)
+                raise
+            old_process = slot.process
+            slot.process = process
+            slot.generation += 1
+            slot.started_at = time.monotonic()
+            slot.restarts += 1
+        finally:
+            slot.restarting = False
+        await self._stop_process(old_process)
+
+    async def rolling_restart(self) -> None:
+        async with self._restart_lock:
+            logger.info("rolling restart", extra={"fields": {"workers": len(self.slots)}})
+            for slot in self.slots:
+                try:
+                    await self._replace(slot)
+                    logger.info("worker restarted", extra={"fields": {"worker_id": slot.worker_id, "port": slot.port}})
+                except Exception:
+                    logger.exception("worker restart failed, keeping the old process", extra={"fields": {"worker_id": slot.worker_id}})
+
+    async def _monitor_workers(self) -> None:
+        """Respawn workers that die outside of a restart"""
+        while not self._stopping:
+            await asyncio.sleep(1.0)
+            for slot in self.slots:
+                if slot.restarting or slot.process is None or slot.process.poll() is None:
+                    continue
+                logger.warning("worker exited, respawning", extra={"fields": {"worker_id": slot.worker_id, "returncode": slot.process.returncode}})
+                async with self._restart_lock:
+                    try:
+                        slot.process = self._spawn(slot, slot.port)
+                        await self._wait_ready(slot.process, slot.port)
+                        slot.started_at = time.monotonic()
+                        slot.restarts += 1
+                    except Exception:
+                        logger.exception("worker respawn failed", extra={"fields": {"worker_id": slot.worker_id}})
+
+    # ---------- Routing ----------
+
+    def pick(self, key: Optional[str]) -> WorkerSlot:
+        if key:
+            return self._by_id[self.ring.node_for(key)]
+        return min(self.slots, key=lambda slot: slot.in_flight)
+
+    def _prepare_body(self, raw: bytes, content_type: str):
+        """Parse a JSON body and mint a sessionId for chat requests that lack a thread key"""
+        if not raw or "application/json" not in content_type:
+            return raw, None
+        try:
+            body = json.loads(raw)
+        except ValueError:
+            return raw, None
+        if isinstance(body, dict) and "message" in body and not (body.get("thread_id") or body.get("threadId")):
+            context = body.get("context")
+            if context is None or isinstance(context, dict):
+                context = dict(context or {})
+                if not context.get("sessionId"):
+                    context["sessionId"] = f"session_{os.urandom(8).hex()}"
+                    body["context"] = context
+                    self.sessions_minted += 1
+                    raw = json.dumps(body).encode("utf-8")
+        return raw, body
+
+    async def proxy(self, request: Request):
+        raw, body = self._prepare_body(await request.body(), request.headers.get("content-type", ""))
+        key = routing_key(request, body)
+        slot = self.pick(key)
+        slot.requests += 1
+        slot.keyed_requests += 1 if key else 0
+        slot.in_flight += 1
+
+        url = httpx.URL(f"{slot.base_url}{request.url.path}", query=request.url.query.encode("utf-8"))
+        headers = [(k, v) for k, v in request.headers.items() if k.lower() not in HOP_HEADERS]
+        headers.append(("x-kigo-worker", slot.worker_id))
+        try:
+            upstream = await self.client.send(
+                self.client.build_request(request.method, url, headers=headers, content=raw),
+                stream=True,
+            )
+        except httpx.HTTPError as e:
+            slot.in_flight -= 1
+            slot.errors += 1
+            return JSONResponse(
+                status_code=503,
+                content={"detail": f"Worker {slot.worker_id} unavailable: {e.__class__.__name__}"},
+                headers={"Retry-After": "1"},
+            )
+
+        async def relay():
+            # Released here rather than in a BackgroundTask, which Starlette
+            # skips when the client disconnects mid-body
+            try:
+                async for chunk in upstream.aiter_raw():
+                    yield chunk
+            finally:
+                slot.in_flight -= 1
+                await upstream.aclose()
+
+        response_headers = {k: v for k, v in upstream.headers.items() if k.lower() not in HOP_HEADERS}
+        response_headers["x-kigo-worker"] = slot.worker_id
+        return StreamingResponse(relay(), status_code=upstream.status_code, headers=response_headers)
+
+    async def proxy_websocket(self, websocket: WebSocket) -> None:
+        """Pin a WebSocket to its thread's worker (by ?thread_id=) and relay frames both ways"""
+        import websockets  # ships with uvicorn[standard]
+
+        key = routing_key(websocket, None)
+        query = websocket.url.query
+        if not key:
+            # Same as chat bodies without a sessionId: mint the thread here so it hashes back to this worker
+            key = f"session_{os.urandom(8).hex()}"
+            query = websocket.url.include_query_params(thread_id=key).query
+            self.sessions_minted += 1
+        slot = self.pick(key)
+        slot.requests += 1
+        slot.keyed_requests += 1
+        slot.in_flight += 1
+        url = f"ws://127.0.0.1:{slot.port}{websocket.url.path}"
+        if query:
+            url = f"{url}?{query}"
+        try:
+            async with websockets.connect(url, max_size=None) as upstream:
+                await websocket.accept()
+
+                async def client_to_worker():
+                    while True:
+                        message = await websocket.receive()
+                        if message["type"] == "websocket.disconnect":
+                            return
+                        await upstream.send(message["text"] if message.get("text") is not None else message["bytes"])
+
+                async def worker_to_client():
+                    async for data in upstream:
+                        if isinstance(data, str):
+                            await websocket.send_text(data)
+                        else:
+                            await websocket.send_bytes(data)
+                    await websocket.close()
+
+                relays = [asyncio.create_task(client_to_worker()), asyncio.create_task(worker_to_client())]
+                _, pending = await asyncio.wait(relays, return_when=asyncio.FIRST_COMPLETED)
+                for relay in pending:
+                    relay.cancel()
+        except (OSError, websockets.exceptions.WebSocketException) as e:
+            slot.errors += 1
+            logger.warning("websocket relay failed", extra={"fields": {"worker_id": slot.worker_id, "error": str(e)}})
+            try:
+                await websocket.close(code=1011)
+            except RuntimeError:
+                pass
+        finally:
+            slot.in_flight -= 1
+
+    # ---------- Health ----------
+
+    async def worker_ready(self, slot: WorkerSlot) -> bool:
+        if slot.process is not None and slot.process.poll() is not None:
+            return False
+        try:
+            response = await self.client.get(f"{slot.base_url}{self.ready_path}", timeout=2.0)
+        except httpx.HTTPError:
+            return False
+        return response.status_code == 200
+
+    async def readiness(self) -> Dict[str, Any]:
+        """Ready only while every ring slot's worker is ready"""
+        results = await asyncio.gather(*(self.worker_ready(slot) for slot in self.slots))
+        not_ready = [slot.worker_id for slot, ok in zip(self.slots, results) if not ok]
+        return {
+            "status": "ready" if not not_ready and not self._stopping else "unavailable",
+            "workers": len(self.slots),
+            "not_ready": not_ready,
+        }
+
+    # ---------- Reporting ----------
+
+    def stats(self) -> Dict[str, Any]:
+        total = sum(slot.requests for slot in self.slots)
+        mean = total / len(self.slots) if self.slots else 0
+        return {
+            "workers": [
+                {
+                    "worker_id": slot.worker_id,
+                    "port": slot.port,
+                    "pid": slot.process.pid if slot.process else None,
+                    "alive": slot.process is not None and slot.process.poll() is None,
+                    "uptime_seconds": round(time.monotonic() - slot.started_at, 1) if slot.started_at else 0.0,
+                    "requests": slot.requests,
+                    "share": round(slot.requests / total, 4) if total else 0.0,
+                    "keyed_requests": slot.keyed_requests,
+                    "in_flight": slot.in_flight,
+                    "errors": slot.errors,
+                    "restarts": slot.restarts,
+                }
+                for slot in self.slots
+            ],
+            "total_requests": total,
+            "sessions_minted": self.sessions_minted,
+            # max/mean requests per worker; 1.0 is a perfectly even spread
+            "imbalance": round(max(slot.requests for slot in self.slots) / mean, 3) if mean else 0.0,
+        }
+
+    def log_report(self) -> None:
+        logger.info("dispatch report", extra={"fields": self.stats()})
+
+
+def create_dispatcher_app(dispatcher: Dispatcher, report_interval: float = 60.0) -> FastAPI:
+    """ASGI front end: dispatcher stats plus a catch-all proxy route"""
+
+    async def report_loop():
+        while True:
+            await asyncio.sleep(report_interval)
+            dispatcher.log_report()
+
+    async def lifespan(app: FastAPI):
+        await dispatcher.start()
+        reporter = asyncio.create_task(report_loop()) if report_interval > 0 else None
+        try:
+            yield
+        finally:
+            if reporter is not None:
+                reporter.cancel()
+            dispatcher.log_report()
+            await dispatcher.stop()
+
+    app = FastAPI(title="Kigo Pro Dispatcher", lifespan=lifespan)
+
+    @app.get(f"{DISPATCHER_PATH}/stats")
+    async def dispatcher_stats():
+        return dispatcher.stats()
+
+    @app.get(dispatcher.ready_path)
+    async def ready():
+        readiness = await dispatcher.readiness()
+        return JSONResponse(status_code=200 if readiness["status"] == "ready" else 503, content=readiness)
+
+    @app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS", "HEAD"])
+    async def proxy(request: Request):
+        return await dispatcher.proxy(request)
+
+    @app.websocket("/{path:path}")
+    async def proxy_websocket(websocket: WebSocket):
+        await dispatcher.proxy_websocket(websocket)
+
+    return app
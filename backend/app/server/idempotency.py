@@ -0,0 +1,127 @@
+"""
+Idempotency keys for approval and agent execution requests
+
+The frontend retries `/api/copilotkit/approve` and `/agents/execute` on
+flaky networks. Each retry used to run the graph again for the same thread:
+another LLM round trip, and possibly `execute_approved_action` twice.
+
+`IdempotencyStore.run(key, fingerprint, fn)` runs `fn` once per key:
+- the first request runs it; the call is shielded, so the graph run still
+  finishes if that client disconnects, and its retry gets the result
+- concurrent duplicates wait for that same call and share its result
+- a completed result is kept for KIGO_IDEMPOTENCY_TTL seconds and replayed
+  to later duplicates without touching the graph or the rate limits
+- failures are not stored, so a retry after an error runs again
+- reusing a key with a different request body raises `IdempotencyConflict`
+
+Callers pass the key from the `Idempotency-Key` header. Requests without
+one are not deduplicated at all: two byte-identical bodies may be two
+deliberate actions. Results live in process memory. serve.py routes a
+thread's requests to one worker, so its retries find them.
+
+Configuration:
+- KIGO_IDEMPOTENCY_TTL       seconds completed results are replayed (3600)
+- KIGO_IDEMPOTENCY_MAX_KEYS  stored results at most, oldest dropped first (10000)
+"""
+
+from collections import Counter, OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import os
+import time
+
+
+class IdempotencyConflict(Exception):
+    """Raised when an idempotency key is reused for a different request"""
+
+    def __init__(self, reason: str, status: int = 422):
+        super().__init__(reason)
+        self.reason = reason
+        self.status = status  # 422 for a stored result, 409 while the other request is still running
+
+
+def request_fingerprint(payload: Any) -> str:
+    """Stable hash of a request body, to tell a retry from a different request under the same key"""
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(encoded.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class IdempotencyStore:
+    """Runs each keyed call once, shares it with concurrent duplicates and replays its result"""
+
+    def __init__(self, ttl: Optional[float] = None, max_keys: Optional[int] = None):
+        self.ttl = float(os.getenv("KIGO_IDEMPOTENCY_TTL", "3600")) if ttl is None else ttl
+        self.max_keys = int(os.getenv("KIGO_IDEMPOTENCY_MAX_KEYS", "10000")) if max_keys is None else max_keys
+        # key -> (fingerprint, result, expires_at), oldest first
+        self._results: "OrderedDict[Hashable, Tuple[str, Any, float]]" = OrderedDict()
+        self._inflight: Dict[Hashable, Tuple[str, asyncio.Task]] = {}
+        self.counts: Counter = Counter()
+
+    def _prune(self, now: float) -> None:
+        while self._results:
+            key, (_, _, expires_at) = next(iter(self._results.items()))
+            if expires_at > now and len(self._results) <= self.max_keys:
+                break
+            del self._results[key]
+
+    async def run(self, key: Hashable, fingerprint: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Result of `fn` for this key, and whether it was replayed rather than run here"""
+        now = time.monotonic()
+        self._prune(now)
+
+        stored = self._results.get(key)
+        if stored is not None:
+            stored_fingerprint, result, _ = stored
+            if stored_fingerprint != fingerprint:
+                self.counts["conflicts"] += 1
+                raise IdempotencyConflict("Idempotency-Key was already used for a different request")
+            self.counts["replayed"] += 1
+            return result, True
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            inflight_fingerprint, task = inflight
+            if inflight_fingerprint != fingerprint:
+                self.counts["conflicts"] += 1
+                raise IdempotencyConflict("Idempotency-Key is in use by a different request still running", status=409)
+            self.counts["joined"] += 1
+            return await asyncio.shield(task), True
+
+        self.counts["executed"] += 1
+        task = asyncio.ensure_future(fn())
+        self._inflight[key] = (fingerprint, task)
+        task.add_done_callback(lambda done: self._finish(key, fingerprint, done))
+        return await asyncio.shield(task), False
+
+    def _finish(self, key: Hashable, fingerprint: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key, (None, None))[1] is task:
+            del self._inflight[key]
+        if task.cancelled() or task.exception() is not None:
+            self.counts["failed"] += 1
+            return
+        self._results[key] = (fingerprint, task.result(), time.monotonic() + self.ttl)
+        self._results.move_to_end(key)
+        self._prune(time.monotonic())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "stored": len(self._results),
+            "in_flight": len(self._inflight),
+            "ttl_seconds": self.ttl,
+            **{name: self.counts[name] for name in ("executed", "replayed", "joined", "conflicts", "failed")},
+        }
+
+
+# ==================== PROCESS-WIDE STORE ====================
+
+_store: Optional[IdempotencyStore] = None
+
+
+def get_idempotency_store() -> IdempotencyStore:
+    """Get the process-wide idempotency store (configured from the environment)"""
+    global _store
+    if _store is None:
+        _store = IdempotencyStore()
+    return _store
@@ -0,0 +1,216 @@
+"""
+Lifespan manager: warm startup, readiness and graceful drain
+
+One `AppLifecycle` per server replaces import-time setup and `on_event`
+hooks. Its `lifespan` context:
+
+1. runs the registered startup steps in order (compile the graph, open
+   pools, train and fill caches), timing each one
+2. marks the app ready; `/ready` answers 503 until then, so serve.py and
+   load balancers only route to warm workers
+3. on SIGTERM flips to draining at once: `/ready` goes 503 and `admit()`
+   rejects new turns with `ServerDrainingError` (503 + Retry-After) while
+   turns already inside `async with lifecycle.turn()` keep running
+4. at shutdown waits for those in-flight turns up to the drain deadline,
+   then runs the shutdown steps in reverse order
+
+uvicorn already stops accepting connections on SIGTERM and waits for open
+HTTP requests. The drain covers what it can't see: new turns arriving on
+kept-alive sockets and WebSockets, and background graph runs.
+
+Configuration:
+- KIGO_DRAIN_TIMEOUT  seconds to wait for in-flight turns at shutdown (30)
+"""
+
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+import asyncio
+import json
+import os
+import signal
+import time
+
+from app.server.logs import get_logger
+
+
+class ServerDrainingError(Exception):
+    """Raised for new turns once the server has started draining"""
+
+    def __init__(self, reason: str = "server is shutting down", retry_after: int = 1):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+Step = Callable[[], Awaitable[Any]]
+
+logger = get_logger("lifecycle")
+
+
+class AppLifecycle:
+    """Startup steps, readiness, in-flight turn tracking and drain for one app"""
+
+    def __init__(self, name: str, drain_timeout: Optional[float] = None):
+        self.name = name
+        self.drain_timeout = float(os.getenv("KIGO_DRAIN_TIMEOUT", "30")) if drain_timeout is None else drain_timeout
+        self.state = "starting"             # starting | ready | draining | stopped
+        self.in_flight = 0
+        self.rejected = 0
+        self.startup_ms: Dict[str, float] = {}
+        self._startup: List[Tuple[str, Step]] = []
+        self._shutdown: List[Tuple[str, Step]] = []
+        self._idle: Optional[asyncio.Event] = None
+        self._previous_sigterm: Any = None
+
+    # ---------- Registration ----------
+
+    def on_startup(self, name: str) -> Callable[[Step], Step]:
+        def register(step: Step) -> Step:
+            self._startup.append((name, step))
+            return step
+        return register
+
+    def on_shutdown(self, name: str) -> Callable[[Step], Step]:
+        def register(step: Step) -> Step:
+            self._shutdown.append((name, step))
+            return step
+        return register
+
+    # ---------- Readiness ----------
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def start_draining(self) -> None:
+        if self.state in ("starting", "ready"):
+            self.state = "draining"
+            logger.info("draining", extra={"fields": {"app": self.name, "in_flight": self.in_flight}})
+
+    def _install_sigterm_hook(self) -> None:
+        """Start draining as soon as SIGTERM arrives, then let the server's own handler run"""
+        try:
+            previous = signal.getsignal(signal.SIGTERM)
+
+            def handler(signum, frame):
+                self.start_draining()
+                if callable(previous):
+                    previous(signum, frame)
+                elif previous == signal.SIG_DFL:
+                    raise SystemExit(128 + signum)
+
+            signal.signal(signal.SIGTERM, handler)
+            self._previous_sigterm = previous
+        except ValueError:
+            pass  # not the main thread (e.g. embedded in tests); shutdown still drains
+
+    # ---------- Turns ----------
+
+    def admit(self) -> None:
+        """Raise ServerDrainingError unless new turns are accepted"""
+        if self.state in ("draining", "stopped"):
+            self.rejected += 1
+            raise ServerDrainingError()
+
+    @asynccontextmanager
+    async def turn(self) -> AsyncIterator[None]:
+        """Track one graph run so shutdown can wait for it"""
+        self.admit()
+        if self._idle is None:
+            self._idle = asyncio.Event()
+        self.in_flight += 1
+        self._idle.clear()
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            if self.in_flight == 0:
+                self._idle.set()
+
+    async def drain(self) -> bool:
+        """Wait for in-flight turns; False if the deadline passed first"""
+        self.start_draining()
+        if self.in_flight == 0:
+            return True
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=self.drain_timeout)
+            return True
+        except asyncio.TimeoutError:
+            logger.warning("drain deadline passed", extra={"fields": {"app": self.name, "drain_timeout": self.drain_timeout, "in_flight": self.in_flight}})
+            return False
+
+    # ---------- Lifespan ----------
+
+    @asynccontextmanager
+    async def lifespan(self, app: Any) -> AsyncIterator[None]:
+        self._install_sigterm_hook()
+        started = time.perf_counter()
+        for name, step in self._startup:
+            step_started = time.perf_counter()
+            await step()
+            self.startup_ms[name] = round((time.perf_counter() - step_started) * 1000, 1)
+        self.state = "ready"
+        logger.info("ready", extra={"fields": {"app": self.name, "startup_ms": round((time.perf_counter() - started) * 1000, 1), "steps_ms": self.startup_ms}})
+        try:
+            yield
+        finally:
+            await self.drain()
+            for name, step in reversed(self._shutdown):
+                try:
+                    await step()
+                except Exception:
+                    logger.exception("shutdown step failed", extra={"fields": {"app": self.name, "step": name}})
+            self.state = "stopped"
+            if self._previous_sigterm is not None:
+                try:
+                    signal.signal(signal.SIGTERM, self._previous_sigterm)
+                except ValueError:
+                    pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "in_flight": self.in_flight,
+            "rejected_while_draining": self.rejected,
+            "startup_ms": dict(self.startup_ms),
+            "drain_timeout_seconds": self.drain_timeout,
+        }
+
+
+class DrainMiddleware:
+    """
+    ASGI middleware: count POSTs to turn endpoints as in-flight turns.
+
+    The whole request, including a streamed response body, runs inside
+    `lifecycle.turn()`. While draining they get 503 + Retry-After and
+    `Connection: close`, so clients on kept-alive sockets reconnect to a
+    worker that is still serving.
+    """
+
+    def __init__(self, app, lifecycle: AppLifecycle, paths: Iterable[str]):
+        self.app = app
+        self.lifecycle = lifecycle
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        try:
+            self.lifecycle.admit()
+        except ServerDrainingError as e:
+            body = json.dumps({"detail": f"Server is draining: {e.reason}. Please retry shortly."}).encode("utf-8")
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode("ascii")),
+                    (b"retry-after", str(e.retry_after).encode("ascii")),
+                    (b"connection", b"close"),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+        async with self.lifecycle.turn():
+            await self.app(scope, receive, send)
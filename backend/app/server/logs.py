@@ -0,0 +1,174 @@
+"""
+Non-blocking structured logging
+
+Handlers used to `print` several lines per request straight to stdout from
+the event loop, so a slow terminal or log pipe stalled every request. Now
+callers only put a record on a bounded queue; one background thread formats
+records as JSON lines and writes them:
+
+    {"ts": "...", "level": "INFO", "logger": "kigo.request", "msg": "request",
+     "method": "POST", "path": "/copilotkit", "status": 200, "duration_ms": 41.2}
+
+Structured fields are passed with `extra={"fields": {...}}`. When the queue
+is full, records are dropped and counted rather than blocking the caller.
+
+`RequestLogMiddleware` logs one record per request. Body previews are
+captured only for a sampled fraction of requests, from the chunks the app
+reads anyway, so the body is never buffered an extra time.
+
+Configuration:
+- KIGO_LOG_LEVEL                minimum level (INFO)
+- KIGO_LOG_QUEUE_SIZE           records buffered before dropping (10000)
+- KIGO_LOG_BODY_SAMPLE_RATE     fraction of requests logged with a body preview (0.01)
+- KIGO_LOG_BODY_PREVIEW_BYTES   preview length (200)
+"""
+
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+
+
+ROOT_LOGGER = "kigo"
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; runs on the listener thread"""
+
+    def __init__(self):
+        super().__init__()
+        self.worker = os.getenv("KIGO_WORKER_ID")
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if self.worker:
+            entry["worker"] = self.worker
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks or writes to stderr when the queue is full"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only resolve what can't cross threads safely: %-args and the traceback.
+        # JSON encoding happens on the listener thread.
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[DroppingQueueHandler] = None
+
+
+def setup_logging() -> logging.Logger:
+    """Route the `kigo` logger tree through the background writer (idempotent)"""
+    global _listener, _queue_handler
+    root = logging.getLogger(ROOT_LOGGER)
+    if _listener is None:
+        log_queue: queue.Queue = queue.Queue(maxsize=int(os.getenv("KIGO_LOG_QUEUE_SIZE", "10000")))
+        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler.setFormatter(JsonFormatter())
+        _queue_handler = DroppingQueueHandler(log_queue)
+        _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=False)
+        _listener.start()
+        root.addHandler(_queue_handler)
+        root.setLevel(os.getenv("KIGO_LOG_LEVEL", "INFO").upper())
+        root.propagate = False
+    return root
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the writer thread"""
+    global _listener, _queue_handler
+    if _listener is not None:
+        _listener.stop()
+        logging.getLogger(ROOT_LOGGER).removeHandler(_queue_handler)
+        _listener = None
+        _queue_handler = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    setup_logging()
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+def logging_stats() -> Dict[str, Any]:
+    return {
+        "level": logging.getLevelName(logging.getLogger(ROOT_LOGGER).getEffectiveLevel()),
+        "queued": _queue_handler.queue.qsize() if _queue_handler is not None else 0,
+        "dropped": _queue_handler.dropped if _queue_handler is not None else 0,
+    }
+
+
+class RequestLogMiddleware:
+    """ASGI middleware: one structured record per HTTP request, sampled body previews"""
+
+    def __init__(self, app, sample_rate: Optional[float] = None, preview_bytes: Optional[int] = None):
+        self.app = app
+        self.logger = get_logger("request")
+        self.sample_rate = float(os.getenv("KIGO_LOG_BODY_SAMPLE_RATE", "0.01")) if sample_rate is None else sample_rate
+        self.preview_bytes = int(os.getenv("KIGO_LOG_BODY_PREVIEW_BYTES", "200")) if preview_bytes is None else preview_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.logger.isEnabledFor(logging.INFO):
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = {"code": 500}
+        preview = bytearray()
+        sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+
+        async def receive_wrapper():
+            message = await receive()
+            if message["type"] == "http.request" and len(preview) < self.preview_bytes:
+                preview.extend(message.get("body", b"")[: self.preview_bytes - len(preview)])
+            return message
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive_wrapper if sampled else receive, send_wrapper)
+        finally:
+            fields = {
+                "method": scope["method"],
+                "path": scope["path"],
+                "status": status["code"],
+                "duration_ms": round((time.perf_counter() - start) * 1000, 2),
+            }
+            if preview:
+                fields["body_preview"] = preview.decode("utf-8", errors="replace")
+            self.logger.info("request", extra={"fields": fields})
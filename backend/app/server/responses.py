@@ -0,0 +1,111 @@
+"""
+Fast JSON responses
+
+- `dumps` encodes with orjson when it is installed (falls back to the standard
+  library) and knows how to encode LangChain messages and other pydantic
+  models, so graph state never takes FastAPI's `jsonable_encoder` detour.
+- `FastJSONResponse` renders with `dumps`.
+- `StaticJSON` serializes a constant payload once and serves the same bytes
+  with an ETag. Requests whose If-None-Match matches get 304 without a body.
+- `project` trims a response to the dotted `fields` a caller asked for,
+  e.g. `?fields=message,actions,requires_approval`.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Union
+import hashlib
+import json
+
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump()
+    if hasattr(obj, "dict"):
+        return obj.dict()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    return str(obj)
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+else:
+    def dumps(obj: Any) -> bytes:
+        return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class StaticJSON:
+    """A constant JSON payload, serialized once and served with an ETag"""
+
+    def __init__(self, payload: Any):
+        self.body = dumps(payload)
+        self.etag = f'"{hashlib.blake2b(self.body, digest_size=12).hexdigest()}"'
+        self.headers = {"ETag": self.etag, "Cache-Control": "no-cache"}
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag.startswith("W/"):  # weak comparison, RFC 9110 13.1.2
+                tag = tag[2:]
+            if tag == self.etag:
+                return True
+        return False
+
+    def response(self, request: Request) -> Response:
+        if self.matches(request.headers.get("if-none-match")):
+            return Response(status_code=304, headers=self.headers)
+        return Response(content=self.body, media_type="application/json", headers=self.headers)
+
+
+def parse_fields(fields: Union[None, str, Iterable[str]]) -> Optional[List[str]]:
+    """`"a,b.c"` or `["a", "b.c"]` -> `["a", "b.c"]`; None/empty -> None (no projection)"""
+    if not fields:
+        return None
+    if isinstance(fields, str):
+        fields = fields.split(",")
+    parsed = [field.strip() for field in fields if field and field.strip()]
+    return parsed or None
+
+
+def project(payload: Dict[str, Any], fields: Union[None, str, Iterable[str]]) -> Dict[str, Any]:
+    """Keep only the requested (optionally dotted) fields of `payload`"""
+    paths = parse_fields(fields)
+    if paths is None:
+        return payload
+    projected: Dict[str, Any] = {}
+    for path in paths:
+        keys = path.split(".")
+        source: Any = payload
+        for key in keys:
+            if not isinstance(source, dict) or key not in source:
+                break
+            source = source[key]
+        else:
+            target = projected
+            for key in keys[:-1]:
+                target = target.setdefault(key, {})
+            target[keys[-1]] = source
+    return projected
@@ -0,0 +1,266 @@
+"""
+Background run queue for the LangGraph server
+
+`POST /runs` used to call the synchronous `workflow.invoke` inside the
+request handler, blocking the event loop for the whole LLM chain, and
+`GET /runs/{run_id}` answered "completed" for any id. Runs are now:
+
+    pending -> running -> success | error | timeout | cancelled
+
+`RunManager.submit` registers a `Run` and puts it on a bounded queue, then
+returns at once. A fixed pool of asyncio workers executes queued runs through
+the executor coroutine (the server passes one that calls `ainvoke`). Callers
+long-poll with `wait`, or follow status transitions with `watch`, and can
+cancel pending or running runs. Finished runs are kept for a retention
+window, then dropped.
+
+Configuration:
+- KIGO_RUN_WORKERS      concurrent runs (4)
+- KIGO_RUN_QUEUE_SIZE   pending runs before submissions are rejected (1000)
+- KIGO_RUN_TIMEOUT      seconds before a running run is stopped (300)
+- KIGO_RUN_RETENTION    seconds finished runs stay queryable (3600)
+- KIGO_RUN_MAX_RECORDS  finished runs kept at most (10000)
+"""
+
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+import asyncio
+import os
+import time
+import uuid
+
+from app.server.logs import get_logger
+
+
+TERMINAL_STATUSES = {"success", "error", "timeout", "cancelled"}
+
+logger = get_logger("runs")
+
+
+class RunQueueFull(Exception):
+    """Raised when the run queue cannot take another run"""
+
+    def __init__(self, reason: str, retry_after: int = 1):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def _iso(ts: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat() if ts is not None else None
+
+
+class Run:
+    """One queued graph execution and its outcome"""
+
+    def __init__(self, assistant_id: str, graph_input: Dict[str, Any], config: Optional[Dict[str, Any]] = None):
+        self.run_id = str(uuid.uuid4())
+        self.assistant_id = assistant_id
+        self.input = graph_input
+        self.config = config or {}
+        self.status = "pending"
+        self.output: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self.cancel_requested = False
+        self.changed = asyncio.Condition()
+        self.done = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+    def to_dict(self, include_output: bool = True) -> Dict[str, Any]:
+        queue_ms = (self.started_at or self.finished_at or time.time()) - self.created_at
+        run_ms = ((self.finished_at or time.time()) - self.started_at) if self.started_at else None
+        data = {
+            "run_id": self.run_id,
+            "assistant_id": self.assistant_id,
+            "status": self.status,
+            "created_at": _iso(self.created_at),
+            "started_at": _iso(self.started_at),
+            "finished_at": _iso(self.finished_at),
+            "queue_ms": round(queue_ms * 1000, 1),
+            "run_ms": round(run_ms * 1000, 1) if run_ms is not None else None,
+            "error": self.error,
+        }
+        if include_output:
+            data["output"] = self.output
+        return data
+
+
+class RunManager:
+    """Run registry plus the worker pool that drains the run queue"""
+
+    def __init__(self, executor: Callable[[Run], Awaitable[Dict[str, Any]]], workers: int = 4,
+                 max_queue: int = 1000, timeout: float = 300.0, retention: float = 3600.0,
+                 max_records: int = 10000):
+        self.executor = executor
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.retention = retention
+        self.max_records = max_records
+        self._runs: "OrderedDict[str, Run]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self.counts = {status: 0 for status in TERMINAL_STATUSES}
+        self.rejected = 0
+
+    # ---------- Lifecycle ----------
+
+    def start(self) -> None:
+        if self._workers:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def drain(self, timeout: float) -> bool:
+        """Let queued and running runs finish, up to `timeout` seconds; False if some did not"""
+        active = [run for run in self._runs.values() if not run.finished]
+        if not active:
+            return True
+        try:
+            await asyncio.wait_for(asyncio.gather(*(run.done.wait() for run in active)), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def stop(self) -> None:
+        """Cancel in-flight and pending runs and stop the workers"""
+        active = [run for run in self._runs.values() if not run.finished]
+        for run in active:
+            await self.cancel(run.run_id)
+        await asyncio.gather(*(run.done.wait() for run in active))
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    # ---------- Registry ----------
+
+    async def submit(self, assistant_id: str, graph_input: Dict[str, Any],
+                     config: Optional[Dict[str, Any]] = None) -> Run:
+        self.start()  # lazily, so ASGI hosts that skip startup events still get workers
+        self._prune()
+        run = Run(assistant_id, graph_input, config)
+        try:
+            self._queue.put_nowait(run)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise RunQueueFull(f"{self._queue.qsize()} runs already queued")
+        self._runs[run.run_id] = run
+        return run
+
+    def get(self, run_id: str) -> Optional[Run]:
+        return self._runs.get(run_id)
+
+    async def cancel(self, run_id: str) -> Optional[Run]:
+        run = self._runs.get(run_id)
+        if run is None or run.finished:
+            return run
+        run.cancel_requested = True
+        if run.task is not None:
+            run.task.cancel()
+        else:
+            # Still queued: the worker skips it when it comes up
+            await self._transition(run, "cancelled")
+        return run
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.retention
+        finished = [run for run in self._runs.values() if run.finished]
+        excess = len(finished) - self.max_records
+        for run in finished:
+            if run.finished_at < cutoff or excess > 0:
+                del self._runs[run.run_id]
+                excess -= 1
+
+    # ---------- Waiting ----------
+
+    async def wait(self, run: Run, timeout: float) -> Run:
+        """Long-poll: return once the run finishes or `timeout` seconds pass"""
+        try:
+            await asyncio.wait_for(run.done.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        return run
+
+    async def watch(self, run: Run) -> AsyncIterator[Run]:
+        """Yield the run on every status transition, ending after a terminal one"""
+        status = None
+        while True:
+            async with run.changed:
+                await run.changed.wait_for(lambda: run.status != status)
+                status = run.status
+            yield run
+            if run.finished:
+                return
+
+    # ---------- Execution ----------
+
+    async def _transition(self, run: Run, status: str, **fields: Any) -> None:
+        async with run.changed:
+            run.status = status
+            for key, value in fields.items():
+                setattr(run, key, value)
+            if status == "running":
+                run.started_at = time.time()
+            if status in TERMINAL_STATUSES:
+                run.finished_at = time.time()
+                run.task = None
+                self.counts[status] += 1
+                run.done.set()
+            run.changed.notify_all()
+
+    async def _worker(self) -> None:
+        while True:
+            run = await self._queue.get()
+            try:
+                if run.status == "pending":
+                    await self._execute(run)
+            finally:
+                self._queue.task_done()
+
+    async def _execute(self, run: Run) -> None:
+        run.task = asyncio.create_task(asyncio.wait_for(self.executor(run), timeout=self.timeout))
+        await self._transition(run, "running")
+        try:
+            output = await run.task
+        except asyncio.CancelledError:
+            await self._transition(run, "cancelled")
+            if not run.cancel_requested:
+                raise  # the worker itself is shutting down
+        except asyncio.TimeoutError:
+            await self._transition(run, "timeout", error=f"Run exceeded {self.timeout:.0f}s")
+        except Exception as e:
+            logger.exception("run failed", extra={"fields": {"run_id": run.run_id}})
+            await self._transition(run, "error", error=str(e))
+        else:
+            await self._transition(run, "success", output=output)
+
+    def stats(self) -> Dict[str, Any]:
+        active = [run for run in self._runs.values() if not run.finished]
+        return {
+            "workers": self.workers,
+            "pending": sum(1 for run in active if run.status == "pending"),
+            "running": sum(1 for run in active if run.status == "running"),
+            "tracked": len(self._runs),
+            "rejected": self.rejected,
+            "completed": dict(self.counts),
+        }
+
+
+def run_manager_from_env(executor: Callable[[Run], Awaitable[Dict[str, Any]]]) -> RunManager:
+    return RunManager(
+        executor,
+        workers=int(os.getenv("KIGO_RUN_WORKERS", "4")),
+        max_queue=int(os.getenv("KIGO_RUN_QUEUE_SIZE", "1000")),
+        timeout=float(os.getenv("KIGO_RUN_TIMEOUT", "300")),
+        retention=float(os.getenv("KIGO_RUN_RETENTION", "3600")),
+        max_records=int(os.getenv("KIGO_RUN_MAX_RECORDS", "10000")),
+    )
@@ -0,0 +1,105 @@
+"""
+Server-Sent Events streaming for the supervisor graph
+
+Translates LangGraph's `astream_events` feed into SSE frames so the client
+sees node transitions and LLM tokens as they happen instead of waiting for
+the whole chain:
+
+    event: node   data: {"node": "supervisor", "status": "start"}
+    event: token  data: {"node": "general_agent", "content": "Hi"}
+    event: final  data: {...CopilotKitResponse...}
+    event: error  data: {"detail": "..."}
+
+`final` (or `error`) is always the last frame. `iter_graph_events` yields
+the same events as (event, data) pairs for other transports (ws.py).
+"""
+
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple
+import json
+
+from app.llm.scheduler import LLMOverloadedError
+from app.server.logs import get_logger
+
+
+logger = get_logger("sse")
+
+# Graph nodes whose LLM output is user-facing (intent classification is not)
+TOKEN_NODES = {"general_agent", "offer_manager_agent"}
+
+# Graph nodes reported as transitions
+GRAPH_NODES = {
+    "supervisor",
+    "general_agent",
+    "campaign_agent",
+    "analytics_agent",
+    "offer_manager_agent",
+    "approval_node",
+    "execute_action",
+}
+
+
+def format_sse(event: str, data: Any) -> str:
+    """Encode one SSE frame"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def _chunk_text(chunk: Any) -> str:
+    """Extract text from an AIMessageChunk (string or Anthropic content blocks)"""
+    content = getattr(chunk, "content", chunk)
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(
+            block.get("text", "") if isinstance(block, dict) else str(block)
+            for block in content
+        )
+    return ""
+
+
+async def iter_graph_events(
+    workflow: Any,
+    graph_input: Optional[Dict[str, Any]],
+    config: Dict[str, Any],
+    build_final: Callable[[Dict[str, Any]], Dict[str, Any]],
+) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Run the graph and yield (event, data) pairs; `build_final` turns the final
+    state into the last payload. A None input resumes the thread from its
+    latest checkpoint.
+    """
+    final_state: Optional[Dict[str, Any]] = None
+    try:
+        async for event in workflow.astream_events(graph_input, config=config, version="v2"):
+            kind = event["event"]
+            node = event.get("metadata", {}).get("langgraph_node")
+
+            if kind == "on_chat_model_stream" and node in TOKEN_NODES:
+                text = _chunk_text(event["data"].get("chunk"))
+                if text:
+                    yield "token", {"node": node, "content": text}
+            elif kind in ("on_chain_start", "on_chain_end") and event.get("name") in GRAPH_NODES and event.get("name") == node:
+                status = "start" if kind == "on_chain_start" else "end"
+                yield "node", {"node": node, "status": status}
+            elif kind == "on_chain_end" and not event.get("parent_ids"):
+                # Root run finished: its output is the final graph state
+                output = event["data"].get("output")
+                if isinstance(output, dict):
+                    final_state = output
+
+        yield "final", build_final(final_state or {})
+    except LLMOverloadedError as e:
+        yield "error", {"detail": e.reason, "status": 503, "retry_after": e.retry_after}
+    except Exception as e:
+        logger.exception("stream failed")
+        yield "error", {"detail": str(e)}
+
+
+async def stream_graph_events(
+    workflow: Any,
+    graph_input: Dict[str, Any],
+    config: Dict[str, Any],
+    build_final: Callable[[Dict[str, Any]], Dict[str, Any]],
+) -> AsyncIterator[str]:
+    """Run the graph and yield SSE frames"""
+    async for event, data in iter_graph_events(workflow, graph_input, config, build_final):
+        yield format_sse(event, data)
@@ -0,0 +1,161 @@
+"""
+Pooled upstream HTTP client for proxy endpoints
+
+`copilotkit_endpoint.py` used to open a new `httpx.AsyncClient` per request
+to the LangGraph server, paying a fresh TCP connection every time and
+buffering the whole reply before forwarding it. `UpstreamClient` holds one
+keep-alive pool, created and closed by the app lifespan, and returns
+streaming responses so callers can pass the body through chunk by chunk.
+
+Retries are bounded and only happen when they are safe:
+- idempotent methods (GET, HEAD, OPTIONS, PUT, DELETE) on transport errors
+  and 502/503/504
+- any method when the connection could not be established at all, since
+  the request never reached the upstream
+
+Configuration:
+- KIGO_UPSTREAM_URL                   (default http://127.0.0.1:8123)
+- KIGO_UPSTREAM_MAX_CONNECTIONS       (default 100)
+- KIGO_UPSTREAM_MAX_KEEPALIVE         (default 20)
+- KIGO_UPSTREAM_KEEPALIVE_EXPIRY      (seconds, default 30)
+- KIGO_UPSTREAM_TIMEOUT               (seconds, default 30)
+- KIGO_UPSTREAM_RETRIES               (default 2)
+- KIGO_UPSTREAM_POOLING               ("0" opens a client per request, for benchmarks)
+"""
+
+from typing import Any, Dict, Optional
+import asyncio
+import os
+import random
+
+import httpx
+
+from app.server.logs import get_logger
+
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RETRY_STATUSES = {502, 503, 504}
+
+logger = get_logger("upstream")
+
+
+class UpstreamClient:
+    """One pooled httpx client for a single upstream base URL"""
+
+    def __init__(self, base_url: Optional[str] = None, max_connections: Optional[int] = None,
+                 max_keepalive: Optional[int] = None, keepalive_expiry: Optional[float] = None,
+                 timeout: Optional[float] = None, retries: Optional[int] = None,
+                 pooled: Optional[bool] = None, backoff: float = 0.05):
+        self.base_url = base_url or os.getenv("KIGO_UPSTREAM_URL", "http://127.0.0.1:8123")
+        self.limits = httpx.Limits(
+            max_connections=max_connections or int(os.getenv("KIGO_UPSTREAM_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=max_keepalive or int(os.getenv("KIGO_UPSTREAM_MAX_KEEPALIVE", "20")),
+            keepalive_expiry=keepalive_expiry or float(os.getenv("KIGO_UPSTREAM_KEEPALIVE_EXPIRY", "30")),
+        )
+        self.timeout = timeout or float(os.getenv("KIGO_UPSTREAM_TIMEOUT", "30"))
+        self.retries = int(os.getenv("KIGO_UPSTREAM_RETRIES", "2")) if retries is None else retries
+        self.pooled = os.getenv("KIGO_UPSTREAM_POOLING", "1") != "0" if pooled is None else pooled
+        self.backoff = backoff
+        self._client: Optional[httpx.AsyncClient] = None
+        self.requests = 0
+        self.retried = 0
+        self.failures = 0
+
+    def _new_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(base_url=self.base_url, limits=self.limits, timeout=self.timeout)
+
+    # ---------- Lifecycle ----------
+
+    async def startup(self) -> None:
+        if self.pooled and (self._client is None or self._client.is_closed):
+            self._client = self._new_client()
+        logger.info("upstream client ready", extra={"fields": {"base_url": self.base_url, "pooled": self.pooled, "retries": self.retries}})
+
+    async def shutdown(self) -> None:
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+        logger.info("upstream client closed")
+
+    # ---------- Requests ----------
+
+    def _retryable(self, method: str, error: Optional[Exception], status: Optional[int]) -> bool:
+        if isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout)):
+            return True
+        if method not in IDEMPOTENT_METHODS:
+            return False
+        return error is not None or status in RETRY_STATUSES
+
+    async def stream(self, method: str, path: str, **kwargs: Any) -> httpx.Response:
+        """
+        Send a request and return the response with its body unread.
+
+        The caller must consume it (`aiter_raw()`, `aread()`) and `aclose()` it.
+        """
+        method = method.upper()
+        self.requests += 1
+        owned_client = None
+        if self.pooled:
+            if self._client is None or self._client.is_closed:
+                self._client = self._new_client()  # hosts that skip the lifespan
+            client = self._client
+        else:
+            client = owned_client = self._new_client()
+
+        attempt = 0
+        while True:
+            error: Optional[Exception] = None
+            response: Optional[httpx.Response] = None
+            try:
+                response = await client.send(client.build_request(method, path, **kwargs), stream=True)
+            except httpx.TransportError as e:
+                error = e
+            status = response.status_code if response is not None else None
+
+            if attempt < self.retries and self._retryable(method, error, status):
+                if response is not None:
+                    await response.aclose()
+                attempt += 1
+                self.retried += 1
+                await asyncio.sleep(self.backoff * (2 ** (attempt - 1)) * (1 + random.random()))
+                continue
+
+            if error is not None:
+                self.failures += 1
+                if owned_client is not None:
+                    await owned_client.aclose()
+                raise error
+            if owned_client is not None:
+                # Close the one-off client together with the response
+                original_aclose = response.aclose
+
+                async def aclose() -> None:
+                    await original_aclose()
+                    await owned_client.aclose()
+
+                response.aclose = aclose
+            return response
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "base_url": self.base_url,
+            "pooled": self.pooled,
+            "requests": self.requests,
+            "retries": self.retried,
+            "failures": self.failures,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+        }
+
+
+# ==================== PROCESS-WIDE CLIENT ====================
+
+_upstream: Optional[UpstreamClient] = None
+
+
+def get_upstream_client() -> UpstreamClient:
+    """Get the process-wide upstream client (configured from the environment)"""
+    global _upstream
+    if _upstream is None:
+        _upstream = UpstreamClient()
+    return _upstream
@@ -0,0 +1,237 @@
+"""
+WebSocket chat transport
+
+Each HTTP chat turn re-sends and re-validates the whole CopilotKit request,
+including `campaignData`, and rebuilds the app context and thread config.
+Over `/copilotkit/ws` the connection owns one `ChatSession`. The context is
+sent once and cached server-side, so each turn only carries the new message.
+Graph events stream back on the same socket, and approvals are answered there
+too.
+
+Client -> server frames (JSON):
+
+    {"type": "init", "context": {...}}            optional, before the first message
+    {"type": "context", "context": {...}}         merge into the cached context
+    {"type": "message", "message": "..."}         run a turn
+    {"type": "approval", "decision": "approved"}  resume a thread paused for approval
+    {"type": "cancel"}                            stop the running turn
+    {"type": "ping"}
+
+Server -> client frames: `session`, then per turn `node` / `token` events and
+a `final` (CopilotKitResponse) or `error`, plus `cancelled` and `pong`. A
+connection runs one turn at a time. While the server drains, new turns get a
+503 `error` frame and running ones finish before shutdown. Pass `?thread_id=` to resume an existing
+thread; it takes precedence over a `sessionId` in the frame context, because
+serve.py's dispatcher routes the socket by it (and mints one when it is
+missing).
+
+Configuration:
+- KIGO_WS_IDLE_TIMEOUT  seconds without a client frame before the socket is closed (900)
+"""
+
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, Optional
+import asyncio
+import os
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+from app.llm.scheduler import llm_request_class
+from app.server.admission import RateLimitedError, get_admission_controller, tenant_key
+from app.server.lifecycle import AppLifecycle, ServerDrainingError
+from app.server.logs import get_logger
+from app.server.responses import dumps
+from app.server.sse import iter_graph_events
+
+
+APPROVAL_DECISIONS = {"approved", "rejected"}
+
+logger = get_logger("ws")
+
+_stats = {"open": 0, "accepted": 0, "turns": 0, "approvals": 0, "cancelled": 0}
+
+
+class ChatSession:
+    """Per-connection chat state: cached app context and thread config"""
+
+    __slots__ = ("context", "thread_id", "tenant", "config", "turn")
+
+    def __init__(self, context: Dict[str, Any], tenant: Optional[str] = None):
+        self.context = context
+        self.thread_id = context["sessionId"]
+        self.tenant = tenant
+        self.config = {"configurable": {"thread_id": self.thread_id}}
+        self.turn: Optional[asyncio.Task] = None
+
+    @property
+    def busy(self) -> bool:
+        return self.turn is not None and not self.turn.done()
+
+
+async def serve_chat_socket(
+    websocket: WebSocket,
+    workflow: Any,
+    make_context: Callable[[Dict[str, Any]], Dict[str, Any]],
+    build_final: Callable[[Dict[str, Any], str], Dict[str, Any]],
+    idle_timeout: Optional[float] = None,
+    lifecycle: Optional[AppLifecycle] = None,
+) -> None:
+    """Serve one chat connection until the client disconnects or goes idle"""
+    if idle_timeout is None:
+        idle_timeout = float(os.getenv("KIGO_WS_IDLE_TIMEOUT", "900"))
+    await websocket.accept()
+    _stats["open"] += 1
+    _stats["accepted"] += 1
+    send_lock = asyncio.Lock()
+    session: Optional[ChatSession] = None
+
+    async def send(payload: Dict[str, Any]) -> None:
+        async with send_lock:
+            await websocket.send_text(dumps(payload).decode("utf-8"))
+
+    def open_session(context: Dict[str, Any]) -> ChatSession:
+        context = dict(context or {})
+        # The query's thread_id is what the dispatcher routed this socket by
+        if websocket.query_params.get("thread_id"):
+            context["sessionId"] = websocket.query_params["thread_id"]
+        return ChatSession(make_context(context), tenant_key(context))
+
+    async def draining(e: ServerDrainingError) -> None:
+        await send({"type": "error", "status": 503, "detail": f"Server is draining: {e.reason}",
+                    "retry_after": e.retry_after})
+
+    async def admitted(message: Optional[str] = None) -> bool:
+        """Same drain check and token-bucket admission as the HTTP endpoints; error frames instead of closing"""
+        try:
+            if lifecycle is not None:
+                lifecycle.admit()
+            await get_admission_controller().admit(session.thread_id, session.tenant, message)
+        except ServerDrainingError as e:
+            await draining(e)
+            return False
+        except RateLimitedError as e:
+            await send({"type": "error", "status": 429, "detail": f"Rate limit exceeded: {e.reason}",
+                        "retry_after": e.retry_after})
+            return False
+        return True
+
+    def in_flight():
+        """Count the turn as in flight so a drain waits for it"""
+        return lifecycle.turn() if lifecycle is not None else nullcontext()
+
+    async def stream_turn(graph_input: Optional[Dict[str, Any]], request_class: Optional[str] = None) -> None:
+        try:
+            async with in_flight():
+                with llm_request_class(request_class) if request_class else nullcontext():
+                    async for event, data in iter_graph_events(
+                        workflow, graph_input, session.config, lambda result: build_final(result, session.thread_id)
+                    ):
+                        await send({"type": event, **data})
+        except ServerDrainingError as e:
+            try:
+                await draining(e)
+            except Exception:
+                pass
+        except asyncio.CancelledError:
+            _stats["cancelled"] += 1
+            try:
+                await send({"type": "cancelled"})
+            except Exception:
+                pass
+        except WebSocketDisconnect:
+            pass  # the socket went away mid-turn; the receive loop cleans up
+        except Exception as e:
+            logger.exception("turn failed", extra={"fields": {"thread_id": session.thread_id}})
+            try:
+                await send({"type": "error", "detail": str(e)})
+            except Exception:
+                pass  # the socket is gone too
+
+    async def approve(decision: str) -> None:
+        try:
+            snapshot = await workflow.aget_state(session.config)
+            if "approval_node" not in (snapshot.next or ()):
+                await send({"type": "error", "status": 409, "detail": f"No pending approval for thread {session.thread_id}"})
+                return
+            # Same resume path as /api/copilotkit/approve
+            await workflow.aupdate_state(session.config, {"approval_status": decision}, as_node="approval_node")
+        except Exception as e:
+            logger.exception("approval failed", extra={"fields": {"thread_id": session.thread_id}})
+            try:
+                await send({"type": "error", "detail": str(e)})
+            except Exception:
+                pass
+            return
+        await stream_turn(None, "approval")
+
+    try:
+        while True:
+            try:
+                frame = await asyncio.wait_for(websocket.receive_json(), timeout=idle_timeout)
+            except asyncio.TimeoutError:
+                await websocket.close(code=1000, reason="idle")
+                return
+            except ValueError:
+                await send({"type": "error", "detail": "Frames must be JSON"})
+                continue
+            if not isinstance(frame, dict):
+                await send({"type": "error", "detail": "Frames must be JSON objects"})
+                continue
+
+            kind = frame.get("type")
+            if kind == "ping":
+                await send({"type": "pong"})
+            elif kind == "cancel":
+                if session is not None and session.busy:
+                    session.turn.cancel()
+            elif session is not None and session.busy and kind in ("init", "context", "message", "approval"):
+                await send({"type": "error", "status": 409, "detail": "A turn is already running on this connection"})
+            elif kind == "init":
+                session = open_session(frame.get("context"))
+                await send({"type": "session", "thread_id": session.thread_id})
+            elif kind == "context":
+                if session is None:
+                    session = open_session(frame.get("context"))
+                    await send({"type": "session", "thread_id": session.thread_id})
+                else:
+                    patch = frame.get("context") or {}
+                    session.context = make_context({**session.context, **patch, "sessionId": session.thread_id})
+                    session.tenant = tenant_key(patch) or session.tenant
+            elif kind == "message":
+                message = frame.get("message")
+                if not isinstance(message, str) or not message.strip():
+                    await send({"type": "error", "status": 400, "detail": "message must be a non-empty string"})
+                    continue
+                if session is None:
+                    session = open_session(frame.get("context"))
+                    await send({"type": "session", "thread_id": session.thread_id})
+                if not await admitted(message):
+                    continue
+                from langchain_core.messages import HumanMessage
+
+                _stats["turns"] += 1
+                session.turn = asyncio.create_task(stream_turn(
+                    {"messages": [HumanMessage(content=message)], "context": session.context}
+                ))
+            elif kind == "approval":
+                decision = frame.get("decision")
+                if session is None or decision not in APPROVAL_DECISIONS:
+                    await send({"type": "error", "status": 400,
+                                "detail": "approval needs an open session and a decision of 'approved' or 'rejected'"})
+                    continue
+                if not await admitted():
+                    continue
+                _stats["approvals"] += 1
+                session.turn = asyncio.create_task(approve(decision))
+            else:
+                await send({"type": "error", "status": 400, "detail": f"Unknown frame type: {kind!r}"})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        _stats["open"] -= 1
+        if session is not None and session.busy:
+            session.turn.cancel()
+
+
+def chat_socket_stats() -> Dict[str, Any]:
+    return dict(_stats)
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Benchmark: cold-start budget of each server entry point
+
+Every autoscale event pays for importing the entry module before uvicorn can
+even bind its port. This harness runs `python -X importtime -c "import <module>"`
+in fresh interpreters and reports, per entry point:
+
+- import ms       median cumulative import time of the module and everything it pulls in
+- process ms      median wall time of the whole interpreter (startup + import + exit)
+- modules         number of modules imported
+- deferred        heavy packages that should only load in the lifespan
+                  (langgraph, langchain_*, anthropic, copilotkit) but were imported
+
+plus the heaviest direct imports of each entry module. With --serve it also
+starts each ASGI app under uvicorn and times spawn -> first /ready 200, i.e.
+import plus the warm-up steps (graph compile, LLM pool, caches).
+
+    cd backend
+    python benchmarks/bench_cold_start.py                       # report
+    python benchmarks/bench_cold_start.py --save-budget benchmarks/cold_start_budget.json
+    python benchmarks/bench_cold_start.py --budget benchmarks/cold_start_budget.json
+
+The run fails (exit 1) when an entry point imports a deferred package, or,
+with a budget, when import or ready time exceeds it by more than --tolerance.
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+REPO_DIR = os.path.dirname(BACKEND_DIR)
+
+# name -> (module, working directory, ASGI app or None)
+ENTRY_POINTS = {
+    "main": ("main", BACKEND_DIR, "main:app"),
+    "langgraph_server": ("langgraph_server", REPO_DIR, "langgraph_server:app"),
+    "copilotkit_endpoint": ("copilotkit_endpoint", BACKEND_DIR, "copilotkit_endpoint:app"),
+    "serve": ("serve", BACKEND_DIR, None),
+}
+
+DEFERRED_PACKAGES = ("langgraph", "langchain_core", "langchain_anthropic", "langchain", "anthropic", "copilotkit")
+
+
+def parse_importtime(stderr: str):
+    """[(depth, module, self_us, cumulative_us)] from -X importtime output"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "| imported package" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            self_us, cumulative_us = int(self_us), int(cumulative_us)
+        except ValueError:
+            continue
+        stripped = name.lstrip(" ")
+        depth = (len(name) - len(stripped) - 1) // 2  # one leading space, then two per nesting level
+        rows.append((depth, stripped, self_us, cumulative_us))
+    return rows
+
+
+def measure_import(module: str, cwd: str):
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [BACKEND_DIR, os.getenv("PYTHONPATH")]))}
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=cwd, env=env, capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - start) * 1000
+    if proc.returncode != 0:
+        tail = "\n".join(line for line in proc.stderr.splitlines() if not line.startswith("import time:"))[-800:]
+        raise RuntimeError(f"import {module} failed:\n{tail}")
+    rows = parse_importtime(proc.stderr)
+    entry = next((row for row in rows if row[1] == module and row[0] == 0), None)
+    # The entry module's line comes after its children; they are the depth-1 rows before it
+    children = []
+    for depth, name, _, cumulative_us in rows:
+        if name == module and depth == 0:
+            break
+        if depth == 1:
+            children.append((name, cumulative_us / 1000))
+        elif depth == 0:
+            children = []  # interpreter-startup imports before the entry module
+    loaded = {name.split(".")[0] for _, name, _, _ in rows}
+    return {
+        "import_ms": entry[3] / 1000 if entry else sum(row[3] for row in rows if row[0] == 0) / 1000,
+        "process_ms": wall_ms,
+        "modules": len(rows),
+        "deferred": sorted(loaded.intersection(DEFERRED_PACKAGES)),
+        "heaviest": sorted(children, key=lambda item: item[1], reverse=True),
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_ready(app_path: str, cwd: str, timeout: float) -> float:
+    """Milliseconds from spawning uvicorn to the first 200 from /ready"""
+    port = free_port()
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [BACKEND_DIR, os.getenv("PYTHONPATH")]))}
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", app_path, "--host", "127.0.0.1", "--port", str(port),
+                             "--no-access-log", "--log-level", "warning"],
+                            cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        with httpx.Client(timeout=1.0) as client:
+            while time.perf_counter() - start < timeout:
+                if proc.poll() is not None:
+                    raise RuntimeError(f"{app_path} exited with code {proc.returncode}")
+                try:
+                    if client.get(f"http://127.0.0.1:{port}/ready").status_code == 200:
+                        return (time.perf_counter() - start) * 1000
+                except httpx.HTTPError:
+                    pass
+                time.sleep(0.02)
+        raise TimeoutError(f"{app_path} not ready after {timeout:.0f}s")
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def run_entry_point(name: str, repeats: int, serve: bool, ready_timeout: float):
+    module, cwd, app_path = ENTRY_POINTS[name]
+    measure_import(module, cwd)  # warm the bytecode cache; not counted
+    samples = [measure_import(module, cwd) for _ in range(repeats)]
+    result = {
+        "import_ms": statistics.median(s["import_ms"] for s in samples),
+        "process_ms": statistics.median(s["process_ms"] for s in samples),
+        "modules": samples[-1]["modules"],
+        "deferred": samples[-1]["deferred"],
+        "heaviest": samples[-1]["heaviest"],
+    }
+    if serve and app_path:
+        result["ready_ms"] = statistics.median(measure_ready(app_path, cwd, ready_timeout) for _ in range(repeats))
+    return result
+
+
+def check_budget(results, budget, tolerance):
+    """Messages for every entry point that regressed"""
+    failures = []
+    for name, r in results.items():
+        if r["deferred"]:
+            failures.append(f"{name} imports {', '.join(r['deferred'])} at import time")
+        limits = budget.get(name, {})
+        for metric in ("import_ms", "ready_ms"):
+            if metric in limits and metric in r and r[metric] > limits[metric] * (1 + tolerance):
+                failures.append(f"{name} {metric} {r[metric]:.1f} > budget {limits[metric]:.1f} (+{tolerance:.0%})")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entry-points", default=",".join(ENTRY_POINTS))
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--top", type=int, default=5, help="heaviest direct imports to list per entry point")
+    parser.add_argument("--serve", action="store_true", help="also time uvicorn spawn -> /ready")
+    parser.add_argument("--ready-timeout", type=float, default=120.0)
+    parser.add_argument("--budget", help="budget JSON written by --save-budget; fail on regression")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown over the budget")
+    parser.add_argument("--save-budget", help="write the measured times to this file as the new budget")
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.entry_points.split(","):
+        try:
+            results[name] = run_entry_point(name, args.repeats, args.serve, args.ready_timeout)
+        except (RuntimeError, TimeoutError) as e:
+            print(f"❌ {name}: {e}")
+            sys.exit(2)
+
+    print(f"📊 Cold start, median of {args.repeats} fresh interpreters ({sys.executable})")
+    header = f"{'entry point':<22}{'import ms':>11}{'process ms':>12}{'ready ms':>10}{'modules':>9}  deferred"
+    print(header)
+    print("-" * len(header))
+    for name, r in results.items():
+        ready = f"{r['ready_ms']:.0f}" if "ready_ms" in r else "-"
+        print(f"{name:<22}{r['import_ms']:>11.1f}{r['process_ms']:>12.1f}{ready:>10}{r['modules']:>9}  "
+              f"{', '.join(r['deferred']) or 'none'}")
+    for name, r in results.items():
+        top = ", ".join(f"{module} {ms:.1f}ms" for module, ms in r["heaviest"][: args.top])
+        print(f"   {name}: {top}")
+
+    if args.save_budget:
+        budget = {name: {k: round(r[k], 1) for k in ("import_ms", "ready_ms") if k in r} for name, r in results.items()}
+        with open(args.save_budget, "w") as f:
+            json.dump(budget, f, indent=2)
+        print(f"\n💾 Budget written to {args.save_budget}")
+
+    budget = {}
+    if args.budget:
+        with open(args.budget) as f:
+            budget = json.load(f)
+    failures = check_budget(results, budget, args.tolerance)
+    if failures:
+        print("\n❌ Cold-start regression:")
+        for failure in failures:
+            print(f"   - {failure}")
+        sys.exit(1)
+    print("\n✅ Within budget" if budget else "\n✅ No deferred packages imported at startup")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark: pooled vs per-call LLM clients
+
+Drives ChatAnthropic against a local fake Messages API and reports per-request
+latency plus how many TCP connections each mode opened.
+
+    cd backend
+    python benchmarks/bench_llm_pool.py --requests 200 --concurrency 20
+
+Runs over plain HTTP on loopback, so the "unpooled" column understates the
+real cost: production calls also pay a TLS handshake per new connection.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("ANTHROPIC_API_KEY", "sk-ant-benchmark")
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from app.llm.registry import LLMClientRegistry, PoolLimits
+from fake_anthropic_server import FakeAnthropicServer
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_mode(server: FakeAnthropicServer, pooled: bool, requests: int, concurrency: int):
+    registry = LLMClientRegistry(limits=PoolLimits(), pooled=pooled, base_url=server.base_url)
+    await registry.startup()
+    server.reset_counters()
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one_call(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            llm = registry.get()
+            await llm.ainvoke([SystemMessage(content="Classify"), HumanMessage(content=f"create an offer {i}")])
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(one_call(i) for i in range(requests)))
+    wall = time.perf_counter() - wall_start
+
+    result = {
+        "mode": "pooled" if pooled else "unpooled",
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "throughput_rps": requests / wall,
+        "connections_opened": server.connections_accepted,
+        "peak_open_sockets": server.peak_connections_open,
+        "open_sockets_before_shutdown": server.connections_open,
+    }
+    await registry.shutdown()
+    await asyncio.sleep(0.05)
+    return result
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--server-latency-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    server = FakeAnthropicServer(latency_ms=args.server_latency_ms)
+    await server.start()
+    try:
+        results = [
+            await run_mode(server, pooled=False, requests=args.requests, concurrency=args.concurrency),
+            await run_mode(server, pooled=True, requests=args.requests, concurrency=args.concurrency),
+        ]
+    finally:
+        await server.stop()
+
+    print(f"📊 {args.requests} requests, concurrency {args.concurrency}, server latency {args.server_latency_ms}ms")
+    header = f"{'mode':<10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>9}{'conns':>8}{'peak':>7}{'left open':>11}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r['mode']:<10}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}"
+            f"{r['throughput_rps']:>9.1f}{r['connections_opened']:>8}{r['peak_open_sockets']:>7}"
+            f"{r['open_sockets_before_shutdown']:>11}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
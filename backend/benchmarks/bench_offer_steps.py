@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Benchmark: legacy dict steps vs the compact StepTable
+
+Builds offer sessions with many steps, each receiving many progress updates,
+and reports for both models:
+
+- retained memory (tracemalloc) after building the session
+- time to look up every step by id (get_or_create)
+- time to serialize the session to the JSON shape the frontend reads
+- time to rebuild the session from that JSON (once per node run)
+
+    cd backend
+    python benchmarks/bench_offer_steps.py --steps 50 500 5000 --updates 200
+
+The legacy model is reproduced inline: list-of-dicts with a linear scan and
+unbounded update lists. Only the standard library is needed.
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.agents.steps import MAX_STEP_UPDATES, StepTable
+
+
+# ---------- Legacy model (pre-StepTable offer_manager helpers) ----------
+
+def legacy_get_or_create_step(steps, step_id, description, step_type):
+    for step in steps:
+        if step["id"] == step_id:
+            return step
+    new_step = {
+        "id": step_id,
+        "description": description,
+        "status": "pending",
+        "type": step_type,
+        "updates": [],
+        "result": None,
+        "metadata": {"start_time": datetime.now().isoformat()},
+    }
+    steps.append(new_step)
+    return new_step
+
+
+def legacy_mark_step_complete(step, result=None):
+    step["status"] = "complete"
+    if result:
+        step["result"] = result
+    if "metadata" in step:
+        step["metadata"]["end_time"] = datetime.now().isoformat()
+
+
+def build_legacy(n_steps, n_updates):
+    steps = []
+    for i in range(n_steps):
+        step = legacy_get_or_create_step(steps, f"step_{i}", f"Step {i}", "research")
+        step["status"] = "running"
+        for u in range(n_updates):
+            step["updates"].append(f"🔍 Progress update {u} for step {i}")
+        legacy_mark_step_complete(step, {"index": i})
+    return steps
+
+
+def build_compact(n_steps, n_updates):
+    steps = StepTable()
+    for i in range(n_steps):
+        step = steps.get_or_create(f"step_{i}", f"Step {i}", "research")
+        step.status = "running"
+        for u in range(n_updates):
+            step.add_update(f"🔍 Progress update {u} for step {i}")
+        step.complete({"index": i})
+    return steps
+
+
+# ---------- Measurements ----------
+
+def retained_bytes(build, *args):
+    gc.collect()
+    tracemalloc.start()
+    session = build(*args)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del session
+    return current
+
+
+def timed_ms(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def bench(n_steps, n_updates):
+    legacy = build_legacy(n_steps, n_updates)
+    compact = build_compact(n_steps, n_updates)
+    ids = [f"step_{i}" for i in range(n_steps)]
+    legacy_json = json.dumps(legacy)
+    compact_json = json.dumps(compact.to_state())
+
+    return {
+        "legacy": {
+            "memory_kb": retained_bytes(build_legacy, n_steps, n_updates) / 1024,
+            "lookup_ms": timed_ms(lambda: [legacy_get_or_create_step(legacy, i, "", "") for i in ids]),
+            "serialize_ms": timed_ms(lambda: json.dumps(legacy)),
+            "rebuild_ms": timed_ms(lambda: json.loads(legacy_json)),
+            "json_kb": len(legacy_json) / 1024,
+        },
+        "compact": {
+            "memory_kb": retained_bytes(build_compact, n_steps, n_updates) / 1024,
+            "lookup_ms": timed_ms(lambda: [compact.get_or_create(i, "", "") for i in ids]),
+            "serialize_ms": timed_ms(lambda: json.dumps(compact.to_state())),
+            "rebuild_ms": timed_ms(lambda: StepTable.from_state(json.loads(compact_json))),
+            "json_kb": len(compact_json) / 1024,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, nargs="+", default=[50, 500, 5000])
+    parser.add_argument("--updates", type=int, default=200, help="progress updates per step")
+    args = parser.parse_args()
+
+    print(f"📊 {args.updates} updates per step (StepTable keeps the last {MAX_STEP_UPDATES})")
+    header = f"{'steps':>7}{'model':>9}{'memory KB':>12}{'lookup ms':>11}{'serialize ms':>14}{'rebuild ms':>12}{'JSON KB':>10}"
+    print(header)
+    print("-" * len(header))
+    for n_steps in args.steps:
+        results = bench(n_steps, args.updates)
+        for model in ("legacy", "compact"):
+            r = results[model]
+            print(f"{n_steps:>7}{model:>9}{r['memory_kb']:>12.1f}{r['lookup_ms']:>11.2f}"
+                  f"{r['serialize_ms']:>14.2f}{r['rebuild_ms']:>12.2f}{r['json_kb']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
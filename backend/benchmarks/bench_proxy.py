@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-hop overhead of the copilotkit_endpoint agent proxy
+
+Puts a local fake upstream (fake_anthropic_server.py, answering every POST
+with a small JSON body) behind `copilotkit_endpoint.app` and compares:
+
+- direct    client -> upstream, no proxy hop (baseline)
+- unpooled  client -> proxy -> upstream, new upstream client per request
+            (the old behaviour)
+- pooled    client -> proxy -> upstream over the shared keep-alive pool
+
+    cd backend
+    python benchmarks/bench_proxy.py --requests 500 --concurrency 20
+
+"overhead" is the proxied p50 minus the direct p50, i.e. the cost of the hop.
+The proxy is driven in-process over ASGI, so the client side adds no
+socket of its own.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import httpx
+
+import app.server.upstream as upstream_module
+from app.server.upstream import UpstreamClient
+from fake_anthropic_server import FakeAnthropicServer
+
+BODY = {"agent_name": "supervisor", "input": {"messages": [{"type": "human", "content": "create an offer"}]}}
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def drive(client: httpx.AsyncClient, path: str, payload, requests: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one_call():
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post(path, json=payload)
+            await response.aread()
+            response.raise_for_status()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(one_call() for _ in range(requests)))
+    return latencies, time.perf_counter() - wall_start
+
+
+async def run_mode(server: FakeAnthropicServer, mode: str, requests: int, concurrency: int):
+    server.reset_counters()
+    if mode == "direct":
+        async with httpx.AsyncClient(base_url=server.base_url) as client:
+            latencies, wall = await drive(client, "/runs/wait", {"assistant_id": "supervisor", **BODY}, requests, concurrency)
+    else:
+        import copilotkit_endpoint
+
+        upstream = UpstreamClient(base_url=server.base_url, pooled=(mode == "pooled"))
+        upstream_module._upstream = upstream
+        await upstream.startup()
+        try:
+            transport = httpx.ASGITransport(app=copilotkit_endpoint.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://proxy") as client:
+                latencies, wall = await drive(client, "/copilotkit/agents/execute", BODY, requests, concurrency)
+        finally:
+            await upstream.shutdown()
+    await asyncio.sleep(0.05)
+    return {
+        "mode": mode,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "throughput_rps": requests / wall,
+        "connections_opened": server.connections_accepted,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--server-latency-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    server = FakeAnthropicServer(latency_ms=args.server_latency_ms)
+    await server.start()
+    try:
+        results = [await run_mode(server, mode, args.requests, args.concurrency)
+                   for mode in ("direct", "unpooled", "pooled")]
+    finally:
+        await server.stop()
+
+    baseline = results[0]["p50_ms"]
+    print(f"📊 {args.requests} requests, concurrency {args.concurrency}, upstream latency {args.server_latency_ms}ms")
+    header = f"{'mode':<10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>9}{'conns':>8}{'overhead ms':>13}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        overhead = "" if r["mode"] == "direct" else f"{r['p50_ms'] - baseline:+.2f}"
+        print(f"{r['mode']:<10}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}"
+              f"{r['throughput_rps']:>9.1f}{r['connections_opened']:>8}{overhead:>13}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-turn state size and merge cost over a long conversation
+
+Two measurements over an N-turn conversation (default 200):
+
+1. Reducer merge - applies each turn's node update to the state the way
+   LangGraph does (add_messages for `messages`, replace for everything else),
+   once with full-state updates ({**state, "messages": messages + [ai]}) and
+   once with delta updates ({"messages": [ai]}).
+2. End-to-end - drives the real supervisor graph on one thread with the
+   offline fake LLM and the in-memory checkpointer, recording turn latency
+   and the serialized size of the thread's latest checkpoint.
+
+    cd backend
+    python benchmarks/bench_state_growth.py --turns 200
+
+Exits non-zero if the delta merge time or checkpoint size grows faster than
+linearly: the cost per message in the last 10% of turns may be at most
+--max-growth times the cost per message at the 10% mark. The graph run also
+fails if any node fell back (a warning from the `kigo` loggers, such as the
+keyword intent fallback or the canned greeting) or the LLM circuit breaker
+opened, since the turns would then not have exercised the real nodes.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("ANTHROPIC_API_KEY", "sk-ant-benchmark")
+os.environ.setdefault("KIGO_LLM_BACKEND", "fake")
+os.environ.setdefault("KIGO_FAKE_LLM_LATENCY", "fixed:0")
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.graph.message import add_messages
+
+from app.agents.supervisor import create_supervisor_workflow
+from app.llm.breaker import get_llm_breaker
+from app.persistence.checkpointer import InMemoryCheckpointSaver
+from app.server.logs import ROOT_LOGGER
+
+USER_TURNS = [
+    "Hi there",
+    "I want to create a 20% off offer for new customers",
+    "Show me last month's redemption rates",
+    "Can you help me set up an ad campaign?",
+]
+
+
+def apply_update(state: dict, update: dict) -> dict:
+    """Merge a node update into state with the supervisor's channel semantics"""
+    merged = dict(state)
+    for key, value in update.items():
+        merged[key] = add_messages(state.get(key, []), value) if key == "messages" else value
+    return merged
+
+
+def bench_reducer(turns: int, delta: bool):
+    state = {"messages": [], "context": {"currentPage": "/"}, "user_intent": "general"}
+    merge_us, update_sizes = [], []
+    for turn in range(turns):
+        state = apply_update(state, {"messages": [HumanMessage(content=USER_TURNS[turn % len(USER_TURNS)])]})
+        ai = AIMessage(content=f"Reply {turn}: " + "lorem ipsum " * 20)
+        if delta:
+            update = {"messages": [ai], "user_intent": "general"}
+        else:
+            update = {**state, "messages": state["messages"] + [ai], "user_intent": "general"}
+        start = time.perf_counter()
+        state = apply_update(state, update)
+        merge_us.append((time.perf_counter() - start) * 1e6)
+        update_sizes.append(len(update["messages"]))
+    return merge_us, update_sizes, len(state["messages"])
+
+
+class FallbackCounter(logging.Handler):
+    """Collects warnings from the app loggers: every node fallback logs one"""
+
+    def __init__(self):
+        super().__init__(level=logging.WARNING)
+        self.records = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.records.append(f"{record.name}: {record.getMessage()}")
+
+
+async def bench_graph(turns: int):
+    checkpointer = InMemoryCheckpointSaver()
+    workflow = create_supervisor_workflow(checkpointer=checkpointer)
+    config = {"configurable": {"thread_id": "bench-state-growth"}}
+    latencies_ms, checkpoint_bytes = [], []
+    fallbacks = FallbackCounter()
+    logging.getLogger(ROOT_LOGGER).addHandler(fallbacks)
+    try:
+        for turn in range(turns):
+            start = time.perf_counter()
+            await workflow.ainvoke(
+                {"messages": [HumanMessage(content=USER_TURNS[turn % len(USER_TURNS)])], "context": {"currentPage": "/"}},
+                config=config,
+            )
+            latencies_ms.append((time.perf_counter() - start) * 1000)
+            snapshot = checkpointer.get_tuple(config)
+            checkpoint_bytes.append(len(checkpointer.serde.dumps_typed(snapshot.checkpoint)[1]))
+    finally:
+        logging.getLogger(ROOT_LOGGER).removeHandler(fallbacks)
+    return latencies_ms, checkpoint_bytes, fallbacks.records
+
+
+def per_message_growth(samples, messages_at):
+    """Ratio of cost-per-message near the end vs at the 10% mark"""
+    n = len(samples)
+    early = slice(max(0, n // 10 - 2), n // 10 + 3)
+    late = slice(n - max(5, n // 10), n)
+    early_cost = statistics.median(samples[early]) / statistics.median(messages_at[early])
+    late_cost = statistics.median(samples[late]) / statistics.median(messages_at[late])
+    return late_cost / early_cost
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--max-growth", type=float, default=2.0)
+    parser.add_argument("--skip-graph", action="store_true", help="only run the reducer benchmark")
+    args = parser.parse_args()
+
+    history = [2 * (t + 1) for t in range(args.turns)]
+    full_us, full_sizes, _ = bench_reducer(args.turns, delta=False)
+    delta_us, delta_sizes, final_messages = bench_reducer(args.turns, delta=True)
+
+    print(f"📊 Reducer merge over {args.turns} turns ({final_messages} messages at the end)")
+    header = f"{'turn':>6}{'history':>9}{'full msgs':>11}{'full µs':>10}{'delta msgs':>12}{'delta µs':>10}"
+    print(header)
+    print("-" * len(header))
+    checkpoints = sorted({0, args.turns // 4, args.turns // 2, 3 * args.turns // 4, args.turns - 1})
+    for t in checkpoints:
+        print(f"{t + 1:>6}{history[t]:>9}{full_sizes[t]:>11}{full_us[t]:>10.1f}{delta_sizes[t]:>12}{delta_us[t]:>10.1f}")
+    print(f"{'total':>6}{'':>9}{sum(full_sizes):>11}{sum(full_us):>10.0f}{sum(delta_sizes):>12}{sum(delta_us):>10.0f}")
+
+    failures = []
+    merge_growth = per_message_growth(delta_us, history)
+    print(f"\n📈 Delta merge cost per message, late vs early: {merge_growth:.2f}x (budget {args.max_growth}x)")
+    if merge_growth > args.max_growth:
+        failures.append("delta merge time")
+
+    if not args.skip_graph:
+        latencies_ms, checkpoint_bytes, fallbacks = asyncio.run(bench_graph(args.turns))
+        print(f"\n📊 Supervisor graph, {args.turns} turns on one thread (fake LLM, in-memory checkpointer)")
+        header = f"{'turn':>6}{'turn ms':>10}{'checkpoint KB':>15}{'bytes/msg':>11}"
+        print(header)
+        print("-" * len(header))
+        for t in checkpoints:
+            print(f"{t + 1:>6}{latencies_ms[t]:>10.2f}{checkpoint_bytes[t] / 1024:>15.1f}"
+                  f"{checkpoint_bytes[t] / history[t]:>11.0f}")
+        size_growth = per_message_growth(checkpoint_bytes, history)
+        print(f"\n📈 Checkpoint bytes per message, late vs early: {size_growth:.2f}x (budget {args.max_growth}x)")
+        if size_growth > args.max_growth:
+            failures.append("checkpoint size")
+        breaker = get_llm_breaker().stats()
+        if fallbacks or breaker["times_opened"] or breaker["short_circuited"]:
+            print(f"\n❌ {len(fallbacks)} fallbacks, breaker opened {breaker['times_opened']}x: "
+                  "these turns did not measure the real nodes")
+            for record in fallbacks[:5]:
+                print(f"   - {record}")
+            failures.append("LLM fallbacks")
+
+    if failures:
+        print(f"❌ Failed: {', '.join(failures)}")
+        sys.exit(1)
+    print("✅ State growth is linear")
+
+
+if __name__ == "__main__":
+    main()
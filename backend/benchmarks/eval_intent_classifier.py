@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Offline evaluation: local intent classifier vs LLM labels
+
+Reports, for each confidence threshold, how many turns the local tier answers
+without touching the network and how often it agrees with the LLM label.
+
+    cd backend
+    # Evaluate against a file of {"text": ..., "llm_label": ...} records
+    python benchmarks/eval_intent_classifier.py --labels my_llm_labels.jsonl
+
+    # Label a plain-text file (one message per line) with the real LLM first
+    python benchmarks/eval_intent_classifier.py --label-with-llm messages.txt --save-labels labels.jsonl
+
+Without --labels the bundled training corpus is used with leave-one-out
+evaluation, so every message is scored by a model that never saw it.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.intent.classifier import (
+    CORPUS_PATH,
+    INTENT_LABELS,
+    LocalIntentClassifier,
+    training_examples,
+)
+
+THRESHOLDS = [0.0, 0.1, 0.2, 0.3, 0.35, 0.4, 0.5, 0.6, 0.8]
+
+
+def load_labels(path):
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                record = json.loads(line)
+                records.append((record["text"], record.get("llm_label") or record["label"]))
+    return records
+
+
+async def label_with_llm(path):
+    from app.agents.supervisor import llm_classify_intent
+
+    with open(path, encoding="utf-8") as f:
+        texts = [line.strip() for line in f if line.strip()]
+    records = []
+    for text in texts:
+        records.append((text, await llm_classify_intent(text)))
+    return records
+
+
+def predictions(records, leave_one_out):
+    """(predicted label, confidence, seconds) for every record"""
+    examples = training_examples()
+    shared = None if leave_one_out else LocalIntentClassifier().fit(examples)
+    results = []
+    for text, label in records:
+        model = shared
+        if leave_one_out:
+            held_out = [e for e in examples if e != (text, label)]
+            model = LocalIntentClassifier().fit(held_out)
+        start = time.perf_counter()
+        predicted, confidence = model.predict(text)
+        results.append((predicted, confidence, time.perf_counter() - start))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--labels", help="JSONL file with text and llm_label fields")
+    parser.add_argument("--label-with-llm", help="Plain-text file of messages to label with the real LLM")
+    parser.add_argument("--save-labels", help="Where to write LLM labels produced by --label-with-llm")
+    args = parser.parse_args()
+
+    leave_one_out = False
+    if args.label_with_llm:
+        records = asyncio.run(label_with_llm(args.label_with_llm))
+        if args.save_labels:
+            with open(args.save_labels, "w", encoding="utf-8") as f:
+                for text, label in records:
+                    f.write(json.dumps({"text": text, "llm_label": label}) + "\n")
+            print(f"💾 Saved {len(records)} LLM labels to {args.save_labels}")
+    elif args.labels:
+        records = load_labels(args.labels)
+    else:
+        records = load_labels(CORPUS_PATH)
+        leave_one_out = True
+
+    results = predictions(records, leave_one_out)
+    latencies_us = sorted(r[2] * 1e6 for r in results)
+
+    print(f"📊 {len(records)} messages ({'leave-one-out on training corpus' if leave_one_out else 'held-out labels'})")
+    print(f"⏱️  local classify: p50 {latencies_us[len(latencies_us) // 2]:.1f}µs, max {latencies_us[-1]:.1f}µs")
+    print()
+    header = f"{'threshold':>9}{'local %':>9}{'network %':>11}{'local acc':>11}{'end-to-end acc':>16}"
+    print(header)
+    print("-" * len(header))
+    for threshold in THRESHOLDS:
+        answered = [(p, (t, l)) for (p, c, _), (t, l) in zip(results, records) if c >= threshold]
+        correct = sum(1 for p, (_, l) in answered if p == l)
+        local_rate = len(answered) / len(records)
+        local_acc = correct / len(answered) if answered else 0.0
+        # Escalated turns get the LLM label by definition
+        end_to_end = (correct + len(records) - len(answered)) / len(records)
+        print(f"{threshold:>9.2f}{local_rate:>9.1%}{1 - local_rate:>11.1%}{local_acc:>11.1%}{end_to_end:>16.1%}")
+
+    print()
+    print("Disagreements with the LLM label at the default threshold:")
+    default = LocalIntentClassifier().threshold
+    confusion = Counter()
+    for (predicted, confidence, _), (text, label) in zip(results, records):
+        if confidence >= default and predicted != label:
+            confusion[(label, predicted)] += 1
+            print(f"  ❌ '{text}': llm={label} local={predicted} (confidence {confidence:.2f})")
+    if not confusion:
+        print("  ✅ none")
+    print()
+    print("Per-label coverage at the default threshold:")
+    for intent in INTENT_LABELS:
+        rows = [(p, c) for (p, c, _), (_, l) in zip(results, records) if l == intent]
+        if rows:
+            local = sum(1 for _, c in rows if c >= default)
+            print(f"  {intent:<17}{local:>4}/{len(rows):<4} answered locally")
+
+
+if __name__ == "__main__":
+    main()
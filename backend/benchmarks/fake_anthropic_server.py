@@ -0,0 +1,97 @@
+"""
+Minimal local stand-in for the Anthropic Messages API
+
+Speaks just enough HTTP/1.1 (keep-alive, Content-Length bodies) for the
+anthropic SDK to talk to it, and counts TCP connections so benchmarks can
+report how many sockets a client really opened.
+"""
+
+import asyncio
+import json
+from typing import Optional
+
+
+class FakeAnthropicServer:
+    """Answers every POST with a canned assistant message"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 latency_ms: float = 0.0, reply: str = "general"):
+        self.host = host
+        self.port = port
+        self.latency_ms = latency_ms
+        self.reply = reply
+        self.connections_accepted = 0
+        self.connections_open = 0
+        self.peak_connections_open = 0
+        self.requests_served = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def reset_counters(self) -> None:
+        self.connections_accepted = 0
+        self.peak_connections_open = self.connections_open
+        self.requests_served = 0
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    def _body(self) -> bytes:
+        return json.dumps({
+            "id": f"msg_{self.requests_served}",
+            "type": "message",
+            "role": "assistant",
+            "model": "claude-3-5-sonnet-20241022",
+            "content": [{"type": "text", "text": self.reply}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": 12, "output_tokens": 1},
+        }).encode()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections_accepted += 1
+        self.connections_open += 1
+        self.peak_connections_open = max(self.peak_connections_open, self.connections_open)
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                keep_alive = True
+                for line in head.decode("latin-1").split("\r\n")[1:]:
+                    name, _, value = line.partition(":")
+                    name = name.strip().lower()
+                    if name == "content-length":
+                        length = int(value.strip())
+                    elif name == "connection" and value.strip().lower() == "close":
+                        keep_alive = False
+                if length:
+                    await reader.readexactly(length)
+
+                if self.latency_ms:
+                    await asyncio.sleep(self.latency_ms / 1000)
+
+                body = self._body()
+                self.requests_served += 1
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\n"
+                    b"content-type: application/json\r\n"
+                    + f"content-length: {len(body)}\r\n".encode()
+                    + (b"connection: keep-alive\r\n" if keep_alive else b"connection: close\r\n")
+                    + b"\r\n" + body
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            self.connections_open -= 1
+            writer.close()
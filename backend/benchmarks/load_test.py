@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+End-to-end load test for the Kigo Pro servers, fully offline
+
+Switches the LLM registry to the fake chat model, mounts the FastAPI apps
+in-process through httpx's ASGI transport, and drives them with an asyncio
+load generator. Reports throughput and p50/p95/p99 latency per endpoint.
+
+httpx's ASGI transport does not send lifespan events, so each app is run
+inside its own lifespan context: the graph, pooled clients, run workers and
+caches are started as they would be under uvicorn, and warm-up is not
+charged to the first requests.
+
+    cd backend
+    python benchmarks/load_test.py --requests 500 --concurrency 50
+    python benchmarks/load_test.py --servers main --latency lognormal:300:0.5 \\
+        --tokens-per-sec 80 --failure-rate 0.02 --json baseline.json
+
+Use --json to save results and --compare to diff against a saved baseline.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from collections import defaultdict
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, ".."))
+
+MESSAGES = [
+    "I want to create a new offer",
+    "create an offer",
+    "help with ofer setup",
+    "Show me analytics",
+    "how is my offer performing",
+    "Create a new ad campaign",
+    "Hello, how are you?",
+    "hi",
+    "what can you do",
+    "I need a coupon for my dealers this weekend",
+]
+
+
+def chat_body(message, session):
+    return {"message": message, "context": {"currentPage": "/offer-manager", "sessionId": session}}
+
+
+def agent_body(message, session):
+    return {"name": "supervisor", "threadId": session, "messages": [{"role": "user", "content": message}]}
+
+
+# (server, method, path, body builder)
+SCENARIOS = {
+    "main": [
+        ("POST", "/copilotkit", chat_body),
+        ("POST", "/", chat_body),
+        ("POST", "/copilotkit/stream", chat_body),
+        ("POST", "/agents/execute", agent_body),
+        ("GET", "/info", None),
+        ("GET", "/health", None),
+    ],
+    "langgraph_server": [
+        ("POST", "/runs", lambda m, s: {"assistant_id": "supervisor", "input": {"messages": [{"type": "human", "content": m}]}}),
+        ("POST", "/runs/wait", lambda m, s: {"assistant_id": "supervisor", "input": {"messages": [{"type": "human", "content": m}]}}),
+    ],
+    "copilotkit_server": [
+        ("POST", "/copilotkit", lambda m, s: {"messages": [{"role": "user", "content": m}]}),
+        ("GET", "/health", None),
+    ],
+}
+
+
+def load_app(server):
+    if server == "main":
+        import main
+        return main.app
+    if server == "langgraph_server":
+        import langgraph_server
+        return langgraph_server.app
+    if server == "copilotkit_server":
+        import copilotkit_server
+        return copilotkit_server.app
+    raise ValueError(server)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def drive(server, app, requests, concurrency, seed):
+    import httpx
+
+    rng = random.Random(seed)
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    scenarios = itertools.cycle(SCENARIOS[server])
+    jobs = [(next(scenarios), rng.choice(MESSAGES), f"load_{rng.randrange(concurrency * 4)}") for _ in range(requests)]
+    queue = asyncio.Queue()
+    for job in jobs:
+        queue.put_nowait(job)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=120) as client:
+        async def worker():
+            while not queue.empty():
+                (method, path, body), message, session = queue.get_nowait()
+                start = time.perf_counter()
+                try:
+                    if method == "GET":
+                        response = await client.get(path)
+                    else:
+                        response = await client.post(path, json=body(message, session))
+                    await response.aread()
+                    if response.status_code >= 400:
+                        errors[path] += 1
+                except Exception:
+                    errors[path] += 1
+                latencies[f"{method} {path}"].append((time.perf_counter() - start) * 1000)
+
+        wall_start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - wall_start
+
+    results = {}
+    for endpoint, samples in sorted(latencies.items()):
+        path = endpoint.split(" ", 1)[1]
+        results[endpoint] = {
+            "requests": len(samples),
+            "errors": errors[path],
+            "rps": len(samples) / wall,
+            "p50_ms": statistics.median(samples),
+            "p95_ms": percentile(samples, 95),
+            "p99_ms": percentile(samples, 99),
+        }
+    return {"wall_seconds": wall, "total_rps": requests / wall, "endpoints": results}
+
+
+def print_report(server, report, baseline=None):
+    print(f"\n📊 {server}: {report['total_rps']:.1f} req/s overall in {report['wall_seconds']:.2f}s")
+    header = f"{'endpoint':<28}{'reqs':>6}{'errs':>6}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+    print(header)
+    print("-" * len(header))
+    for endpoint, r in report["endpoints"].items():
+        line = (f"{endpoint:<28}{r['requests']:>6}{r['errors']:>6}{r['rps']:>9.1f}"
+                f"{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}")
+        previous = (baseline or {}).get("endpoints", {}).get(endpoint)
+        if previous:
+            line += f"   (p95 {r['p95_ms'] - previous['p95_ms']:+.1f}ms vs baseline)"
+        print(line)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--servers", default="main,langgraph_server,copilotkit_server")
+    parser.add_argument("--requests", type=int, default=300, help="requests per server")
+    parser.add_argument("--concurrency", type=int, default=30)
+    parser.add_argument("--latency", default="lognormal:150:0.5", help="fake LLM time-to-first-token distribution")
+    parser.add_argument("--tokens-per-sec", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="baseline JSON written by an earlier --json run")
+    args = parser.parse_args()
+
+    os.environ["KIGO_LLM_BACKEND"] = "fake"
+    os.environ["KIGO_FAKE_LLM_LATENCY"] = args.latency
+    os.environ["KIGO_FAKE_LLM_TOKENS_PER_SEC"] = str(args.tokens_per_sec)
+    os.environ["KIGO_FAKE_LLM_FAILURE_RATE"] = str(args.failure_rate)
+    os.environ["KIGO_FAKE_LLM_SEED"] = str(args.seed)
+    os.environ.setdefault("ANTHROPIC_API_KEY", "sk-ant-loadtest")
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    print(f"🚀 Fake LLM: latency={args.latency}, tokens/s={args.tokens_per_sec or 'instant'}, "
+          f"failure rate={args.failure_rate}")
+    reports = {}
+    for server in args.servers.split(","):
+        app = load_app(server)
+        async with app.router.lifespan_context(app):
+            reports[server] = await drive(server, app, args.requests, args.concurrency, args.seed)
+        print_report(server, reports[server], baseline.get(server))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": vars(args), **reports}, f, indent=2)
+        print(f"\n💾 Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
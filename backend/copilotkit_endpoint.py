@@ -2,16 +2,56 @@
 Add CopilotKit endpoint to LangGraph Server
 Simple FastAPI server that provides the /copilotkit endpoint
 and forwards to your existing LangGraph workflow
+
+Agent execution is proxied to the LangGraph server through one pooled,
+keep-alive client (app/server/upstream.py) opened in the lifespan; the
+upstream body is wrapped in the CopilotKit envelope without being re-parsed.
+It is read in full first, so an upstream failure mid-body still yields a
+well-formed "failed" reply instead of truncated JSON.
+
+`/runs/wait` answers 200 with the run's output. If KIGO_UPSTREAM_RUN_PATH
+points at `/runs` instead, the run is submitted with `Prefer: respond-async`
+and the 202 it returns is followed
+with `GET /runs/{run_id}/wait` until the run finishes (at most
+KIGO_UPSTREAM_RUN_WAIT seconds, default 300).
 """
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
 from pydantic import BaseModel
 from typing import List, Dict, Any
 import httpx
 import asyncio
+import logging
+import os
+
+from app.server.logs import get_logger, shutdown_logging
+from app.server.upstream import get_upstream_client
+
+logger = get_logger("copilotkit_endpoint")
+
+# LangGraph server route that runs a graph and answers with its output
+UPSTREAM_RUN_PATH = os.getenv("KIGO_UPSTREAM_RUN_PATH", "/runs/wait")
+# Longest wait for a queued run before giving up on it
+UPSTREAM_RUN_WAIT_SECONDS = float(os.getenv("KIGO_UPSTREAM_RUN_WAIT", "300"))
+TERMINAL_RUN_STATUSES = {"success", "error", "timeout", "cancelled"}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the pooled upstream client on startup; close it and flush the logs on shutdown"""
+    upstream = get_upstream_client()
+    await upstream.startup()
+    try:
+        yield
+    finally:
+        await upstream.shutdown()
+        shutdown_logging()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # CORS for CopilotKit
 app.add_middleware(
@@ -32,7 +72,6 @@ class CopilotKitRequest(BaseModel):
 @app.get("/copilotkit")
 async def copilotkit_actions():
     """CopilotKit actions endpoint for action discovery"""
-    print(f"[CopilotKit Endpoint] 📋 GET /copilotkit - Actions discovery request")
     response = {
         "actions": [],
         "agents": [
@@ -42,7 +81,7 @@ async def copilotkit_actions():
             }
         ]
     }
-    print(f"[CopilotKit Endpoint] ✅ Returning actions: {response}")
+    logger.debug("actions discovery", extra={"fields": {"response": response}})
     return response
 
 @app.post("/copilotkit")
@@ -60,7 +99,8 @@ async def copilotkit_endpoint(request: CopilotKitRequest):
             message = ' '.join(str(item) for item in content).lower()
         else:
             message = str(content).lower()
-        print(f"[CopilotKit Endpoint] 🚀 Message: {message}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("chat message content", extra={"fields": {"message": message}})
         
         # Simple intent detection and routing
         if any(word in message for word in ["create ad", "new ad", "campaign", "advertisement", "create campaign"]):
@@ -123,15 +163,13 @@ I'm your AI assistant for the Kigo Pro advertising platform! I can help you with
 
 What would you like to work on today?"""
         
-        print(f"[CopilotKit Endpoint] ✅ Generated response for intent")
-        
         return {
             "role": "assistant", 
             "content": response_content
         }
                 
-    except Exception as e:
-        print(f"[CopilotKit Endpoint] ❌ Error: {e}")
+    except Exception:
+        logger.exception("chat request failed")
         return {
             "role": "assistant",
             "content": "I'm here to help you with the Kigo Pro platform! How can I assist you today?"
@@ -144,7 +182,6 @@ async def root():
 @app.get("/copilotkit/info")
 async def copilotkit_info_get():
     """CopilotKit info endpoint for runtime discovery (GET)"""
-    print(f"[CopilotKit Endpoint] 📋 GET /copilotkit/info - Info discovery request")
     response = {
         "actions": [],
         "agents": [
@@ -154,13 +191,12 @@ async def copilotkit_info_get():
             }
         ]
     }
-    print(f"[CopilotKit Endpoint] ✅ Returning info: {response}")
+    logger.debug("info discovery", extra={"fields": {"method": "GET", "response": response}})
     return response
 
 @app.post("/copilotkit/info")
 async def copilotkit_info_post():
     """CopilotKit info endpoint for runtime discovery (POST)"""
-    print(f"[CopilotKit Endpoint] 📋 POST /copilotkit/info - Info discovery request")
     response = {
         "actions": [],
         "agents": [
@@ -170,9 +206,33 @@ async def copilotkit_info_post():
             }
         ]
     }
-    print(f"[CopilotKit Endpoint] ✅ Returning info: {response}")
+    logger.debug("info discovery", extra={"fields": {"method": "POST", "response": response}})
     return response
 
+async def wait_for_queued_run(run: Dict[str, Any]) -> Dict[str, Any]:
+    """Long-poll a run queued by `POST /runs` and return it in the `/runs/wait` shape"""
+    run_id = run.get("run_id")
+    if not run_id:
+        raise ValueError("queued run has no run_id")
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + UPSTREAM_RUN_WAIT_SECONDS
+    while run.get("status") not in TERMINAL_RUN_STATUSES:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            raise TimeoutError(f"run {run_id} still {run.get('status')} after {UPSTREAM_RUN_WAIT_SECONDS:.0f}s")
+        response = await get_upstream_client().stream(
+            "GET", f"/runs/{run_id}/wait", params={"timeout": min(remaining, 30.0)})
+        try:
+            await response.aread()
+        finally:
+            await response.aclose()
+        if response.status_code != 200:
+            raise ValueError(f"run {run_id} wait returned {response.status_code}")
+        run = response.json()
+    if run["status"] != "success":
+        raise ValueError(run.get("error") or f"run {run_id} {run['status']}")
+    return {"run_id": run_id, "status": "completed", "output": run.get("output")}
+
 class AgentExecuteRequest(BaseModel):
     agent_name: str
     input: Dict[str, Any]
@@ -180,47 +240,67 @@ class AgentExecuteRequest(BaseModel):
 @app.post("/copilotkit/agents/execute")
 async def execute_agent(request: AgentExecuteRequest):
     """Execute LangGraph agent via LangGraph server"""
-    print(f"[CopilotKit Endpoint] 🎯 AGENT EXECUTION - {request.agent_name}")
-    print(f"[CopilotKit Endpoint] 📝 Input: {request.input}")
+    logger.info("agent execution", extra={"fields": {"agent": request.agent_name}})
     
+    langgraph_request = {
+        "assistant_id": request.agent_name,
+        "input": request.input
+    }
+
     try:
-        # Forward to LangGraph server
-        async with httpx.AsyncClient() as client:
-            langgraph_request = {
-                "assistant_id": request.agent_name,
-                "input": request.input
+        # Forward to LangGraph server over the shared pool (POST is not retried once sent)
+        response = await get_upstream_client().stream(
+            "POST", UPSTREAM_RUN_PATH, json=langgraph_request, headers={"Prefer": "respond-async"})
+    except httpx.HTTPError as e:
+        logger.warning("agent execution failed", extra={"fields": {"agent": request.agent_name, "error": str(e)}})
+        return {
+            "result": {"error": str(e)},
+            "status": "failed"
+        }
+
+    if response.status_code == 202:
+        # Queued rather than run inline: follow the run until it has an output
+        try:
+            await response.aread()
+            await response.aclose()
+            run_data = await wait_for_queued_run(response.json())
+        except (httpx.HTTPError, ValueError, TimeoutError) as e:
+            logger.warning("queued run failed", extra={"fields": {"agent": request.agent_name, "error": str(e)}})
+            return {
+                "result": {"error": str(e)},
+                "status": "failed"
             }
-            
-            print(f"[CopilotKit Endpoint] 🚀 Calling LangGraph server: {langgraph_request}")
-            
-            response = await client.post(
-                "http://127.0.0.1:8123/runs",
-                json=langgraph_request,
-                timeout=30.0
-            )
-            
-            if response.status_code == 200:
-                run_data = response.json()
-                print(f"[CopilotKit Endpoint] ✅ LangGraph response: {run_data}")
-                
-                # Return in format CopilotKit expects
-                return {
-                    "result": run_data,
-                    "status": "completed"
-                }
-            else:
-                print(f"[CopilotKit Endpoint] ❌ LangGraph error: {response.status_code} - {response.text}")
-                return {
-                    "result": {"error": f"LangGraph error: {response.status_code}"},
-                    "status": "failed"
-                }
-                
-    except Exception as e:
-        print(f"[CopilotKit Endpoint] ❌ Agent execution error: {e}")
+        return {
+            "result": run_data,
+            "status": "completed"
+        }
+
+    if response.status_code != 200:
+        await response.aread()
+        await response.aclose()
+        logger.warning("upstream error", extra={"fields": {"status": response.status_code, "body": response.text[:500]}})
+        return {
+            "result": {"error": f"LangGraph error: {response.status_code}"},
+            "status": "failed"
+        }
+
+    try:
+        body = await response.aread()
+    except httpx.HTTPError as e:
+        logger.warning("upstream body interrupted", extra={"fields": {"agent": request.agent_name, "error": str(e)}})
         return {
             "result": {"error": str(e)},
             "status": "failed"
         }
+    finally:
+        await response.aclose()
+
+    # Wrap the upstream JSON in the envelope CopilotKit expects without re-parsing it
+    return Response(b'{"result":' + body + b',"status":"completed"}', media_type="application/json")
+
+@app.get("/health")
+async def health_check():
+    return {"status": "healthy", "upstream": get_upstream_client().stats()}
 
 if __name__ == "__main__":
     import uvicorn
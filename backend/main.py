@@ -4,10 +4,12 @@ FastAPI + LangGraph Backend for Kigo Pro Dashboard
 Official CopilotKit integration pattern using CopilotKit SDK
 """
 
+import asyncio
+import logging
 import os
-import time
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Request, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import Any, Dict, List, Optional
 import uvicorn
@@ -17,15 +19,39 @@ import uvicorn
 # from copilotkit import CopilotKitRemoteEndpoint, LangGraphAgent
 from dotenv import load_dotenv
 
-from app.agents.supervisor import create_supervisor_workflow
+from app.intent.cache import get_intent_cache
+from app.intent.classifier import get_local_classifier
+from app.llm.breaker import get_llm_breaker
+from app.llm.invoke import llm_call_stats
+from app.llm.registry import get_llm_registry
+from app.llm.scheduler import LLMOverloadedError, llm_request_class
+from app.server.admission import RateLimitedError, get_admission_controller, tenant_key
+from app.server.idempotency import IdempotencyConflict, get_idempotency_store, request_fingerprint
+from app.server.lifecycle import AppLifecycle, DrainMiddleware
+from app.server.logs import RequestLogMiddleware, get_logger, logging_stats, shutdown_logging
+from app.server.responses import FastJSONResponse, StaticJSON, project
+from app.server.sse import stream_graph_events
+from app.server.ws import chat_socket_stats, serve_chat_socket
 
 # Load environment variables
 load_dotenv()
 
+logger = get_logger("main")
+
+
+lifecycle = AppLifecycle("Kigo Pro Backend")
+
+# Turn endpoints: rejected while draining, waited for at shutdown
+TURN_PATHS = {
+    "/", "/copilotkit", "/stream", "/copilotkit/stream",
+    "/api/copilotkit/approve", "/agents/execute", "/copilotkit/agents/execute",
+}
+
 app = FastAPI(
     title="Kigo Pro LangGraph Backend",
     description="Python FastAPI + LangGraph backend for Kigo Pro dashboard",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifecycle.lifespan,
 )
 
 # CORS middleware for Next.js frontend
@@ -37,22 +63,106 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Logging middleware to debug CopilotKit requests
-@app.middleware("http")
-async def log_requests(request, call_next):
-    start_time = time.time()
-    print(f"🔍 [Request] {request.method} {request.url.path}")
-    if request.headers.get("content-type") == "application/json":
-        body = await request.body()
-        if body:
-            print(f"📝 [Body Preview] {str(body[:200])}")
-    response = await call_next(request)
-    process_time = time.time() - start_time
-    print(f"⏱️ [Response] {request.method} {request.url.path} - {response.status_code} in {process_time:.2f}s")
-    return response
+# Structured request log (queued to a background writer, sampled body previews)
+app.add_middleware(RequestLogMiddleware)
+
+# Track in-flight turns; 503 new ones once SIGTERM starts the drain
+app.add_middleware(DrainMiddleware, lifecycle=lifecycle, paths=TURN_PATHS)
+
+@app.exception_handler(LLMOverloadedError)
+async def llm_overloaded_handler(request, exc: LLMOverloadedError):
+    """Shed load fast when the LLM scheduler queue is full"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": f"Assistant is busy: {exc.reason}. Please retry shortly."},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+@app.exception_handler(RateLimitedError)
+async def rate_limited_handler(request, exc: RateLimitedError):
+    """A session or tenant exceeded its request or LLM token budget"""
+    return JSONResponse(
+        status_code=429,
+        content={"detail": f"Rate limit exceeded: {exc.reason}. Please retry in {exc.retry_after}s.", "scope": exc.scope},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+@app.exception_handler(IdempotencyConflict)
+async def idempotency_conflict_handler(request, exc: IdempotencyConflict):
+    """An Idempotency-Key was reused for a different request"""
+    return JSONResponse(status_code=exc.status, content={"detail": exc.reason})
+
+# ---------- Startup / shutdown ----------
+
+_supervisor_workflow = None
+
+
+def get_supervisor_workflow():
+    """The compiled LangGraph workflow (checkpointed so approval interrupts can resume)"""
+    global _supervisor_workflow
+    if _supervisor_workflow is None:
+        # Normally compiled by the "graph" startup step; hosts that skip the lifespan compile here.
+        # The agent modules (langgraph, langchain) are imported here, not when main is imported.
+        from app.agents.supervisor import create_supervisor_workflow
+        from app.persistence.checkpointer import get_checkpointer
+
+        _supervisor_workflow = create_supervisor_workflow(checkpointer=get_checkpointer())
+    return _supervisor_workflow
+
+
+@lifecycle.on_startup("graph")
+async def compile_graph():
+    get_supervisor_workflow()
+
+
+@lifecycle.on_startup("llm_client")
+async def open_llm_client():
+    await get_llm_registry().startup()
+
+
+@lifecycle.on_startup("caches")
+async def warm_caches():
+    from app.agents.compaction import get_compactor
+    from app.agents.supervisor import get_intent_batcher
+
+    get_intent_cache()
+    await asyncio.to_thread(get_local_classifier)  # trains the local intent model
+    get_intent_batcher()
+    get_compactor()
+    get_admission_controller()
+
+
+@lifecycle.on_startup("banner")
+async def announce_endpoints():
+    logger.info("Kigo Pro LangGraph Backend Ready", extra={"fields": {"endpoints": [
+        "/info & /copilotkit/info (CopilotKit agent discovery)",
+        "/agents/execute & /copilotkit/agents/execute (CopilotKit agent execution)",
+        "/copilotkit (Chat endpoint)",
+        "/copilotkit/stream (Streaming chat endpoint, Server-Sent Events)",
+        "/copilotkit/ws (WebSocket chat with per-connection sessions)",
+        "/ready (Readiness: 200 once warm, 503 while starting or draining)",
+    ]}})
+
+
+# Shutdown steps run in reverse: LLM client, then checkpoints, then logs
+@lifecycle.on_shutdown("logging")
+async def flush_logs():
+    shutdown_logging()
+
+
+@lifecycle.on_shutdown("checkpointer")
+async def close_checkpointer():
+    from app.persistence.checkpointer import get_checkpointer
+
+    checkpointer = get_checkpointer()
+    if checkpointer is not None:
+        await asyncio.to_thread(checkpointer.close)
+
+
+@lifecycle.on_shutdown("llm_client")
+async def close_llm_client():
+    await get_llm_registry().shutdown()
 
-# Initialize LangGraph workflow
-supervisor_workflow = create_supervisor_workflow()
 
 # Pydantic models for CopilotKit compatibility
 class Message(BaseModel):
@@ -75,203 +185,250 @@ class CopilotKitResponse(BaseModel):
     pending_action: Optional[Dict[str, Any]] = None
     thread_id: Optional[str] = None
 
+def app_context_from(context: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalize a client context dict (same structure as TypeScript version)"""
+    return {
+        "currentPage": context.get("currentPage", "/"),
+        "userRole": context.get("userRole", "user"),
+        "campaignData": context.get("campaignData", {}),
+        "sessionId": context.get("sessionId") or f"session_{os.urandom(8).hex()}",
+        "skipIntentCache": bool(context.get("skipIntentCache", False)),
+    }
+
+def build_app_context(request: CopilotKitRequest) -> Dict[str, Any]:
+    """Extract app context (same structure as TypeScript version)"""
+    return app_context_from(request.context)
+
+def build_copilotkit_response(result: Dict[str, Any], thread_id: str) -> CopilotKitResponse:
+    """Turn a final supervisor state into the CopilotKit response payload"""
+    ai_message = None
+    for msg in reversed(result.get("messages") or []):
+        if msg.__class__.__name__ == "AIMessage":
+            ai_message = msg.content
+            break
+        elif isinstance(msg, dict) and msg.get("role") == "assistant":
+            ai_message = msg.get("content")
+            break
+
+    pending_action = result.get("pending_action")
+    if result.get("requires_approval") and pending_action:
+        return CopilotKitResponse(
+            message=ai_message or "I need your approval to proceed.",
+            requires_approval=True,
+            pending_action=pending_action,
+            thread_id=thread_id
+        )
+
+    workflow_data = result.get("workflow_data") or {}
+    return CopilotKitResponse(
+        message=ai_message or "I'm not sure how to respond to that.",
+        actions=workflow_data.get("actions") or workflow_data.get("pending_actions") or [],
+        thread_id=thread_id
+    )
+
+async def admit_chat(request: CopilotKitRequest, app_context: Dict[str, Any]) -> None:
+    """Token-bucket admission for a chat turn (raises RateLimitedError -> 429)"""
+    await get_admission_controller().admit(app_context["sessionId"], tenant_key(request.context), request.message)
+
+async def run_chat_turn(request: CopilotKitRequest) -> CopilotKitResponse:
+    """Admit and run one chat turn through the supervisor graph on the request's thread"""
+    from langchain_core.messages import HumanMessage
+
+    app_context = build_app_context(request)
+    await admit_chat(request, app_context)
+    thread_id = app_context["sessionId"]
+
+    logger.info("chat message", extra={"fields": {"thread_id": thread_id, "chars": len(request.message)}})
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("chat message content", extra={"fields": {"message": request.message, "context": app_context}})
+
+    result = await get_supervisor_workflow().ainvoke(
+        {
+            "messages": [HumanMessage(content=request.message)],
+            "context": app_context
+        },
+        config={"configurable": {"thread_id": thread_id}}
+    )
+
+    response = build_copilotkit_response(result, thread_id)
+    if response.requires_approval:
+        logger.info("approval required", extra={"fields": {"thread_id": thread_id, "action": response.pending_action.get("description", "Unknown action")}})
+    return response
+
+def respond(response: CopilotKitResponse, fields: Optional[str] = None) -> FastJSONResponse:
+    """Serialize a CopilotKitResponse, keeping only `fields` when the caller asked for a projection"""
+    return FastJSONResponse(project(response.model_dump(), fields))
+
+async def idempotent(scope: str, thread_id: str, idempotency_key: Optional[str], payload: Any, fn):
+    """
+    Run `fn` once per Idempotency-Key on this thread: concurrent duplicates wait
+    for it and later ones get its stored result. Without a key every request
+    runs - two identical bodies may be two deliberate actions. Returns
+    (result, replayed).
+    """
+    if not idempotency_key:
+        return await fn(), False
+    return await get_idempotency_store().run((scope, thread_id, idempotency_key), request_fingerprint(payload), fn)
+
+def replay_headers(replayed: bool) -> Optional[Dict[str, str]]:
+    return {"Idempotent-Replayed": "true"} if replayed else None
+
+# Discovery payloads never change at runtime: serialize once, serve with an ETag
+ROOT_RESPONSE = StaticJSON({"message": "Kigo Pro LangGraph Backend is running!"})
+SUPERVISOR_DESCRIPTION = "Kigo Pro multi-agent supervisor that routes to campaign, analytics, filter, and merchant specialists"
+INFO_RESPONSE = StaticJSON({
+    "actions": [],
+    "agents": [{"name": "supervisor", "description": SUPERVISOR_DESCRIPTION}],
+})
+COPILOTKIT_INFO_RESPONSE = StaticJSON({
+    "actions": [],
+    "agents": [{"name": "supervisor", "description": SUPERVISOR_DESCRIPTION, "type": "langgraph"}],
+})
+
 @app.get("/")
-async def root():
-    return {"message": "Kigo Pro LangGraph Backend is running!"}
+async def root(request: Request):
+    return ROOT_RESPONSE.response(request)
 
 # CopilotKit main runtime endpoint - expects POST at root when using external runtime URL
 @app.post("/")
-async def copilotkit_runtime(request: CopilotKitRequest):
+async def copilotkit_runtime(request: CopilotKitRequest, fields: Optional[str] = None):
     """
     CopilotKit main runtime endpoint - processes chat messages through LangGraph
     This is the endpoint CopilotKit calls when runtimeUrl is set to http://localhost:8000
     """
     try:
-        # Extract app context (same structure as TypeScript version)
-        app_context = {
-            "currentPage": request.context.get("currentPage", "/"),
-            "userRole": request.context.get("userRole", "user"),
-            "campaignData": request.context.get("campaignData", {}),
-            "sessionId": request.context.get("sessionId", f"session_{os.urandom(8).hex()}"),
-        }
-
-        # Import HumanMessage for proper message format
-        from langchain_core.messages import HumanMessage
-        
-        # Create thread config for resumable execution
-        thread_config = {
-            "configurable": {
-                "thread_id": app_context["sessionId"]
-            }
-        }
-        
-        print(f"[CopilotKit Root] 🎯 Processing message: {request.message}")
-        print(f"[CopilotKit Root] 📋 Context: {app_context}")
-        
-        # Invoke LangGraph supervisor workflow with proper message format
-        result = await supervisor_workflow.ainvoke(
-            {
-                "messages": [HumanMessage(content=request.message)],
-                "context": app_context
-            },
-            config=thread_config
-        )
-
-        # Extract AI response from LangGraph result
-        ai_message = None
-        print(f"[DEBUG] LangGraph result keys: {list(result.keys())}")
-        
-        if result.get("messages"):
-            for i, msg in enumerate(reversed(result["messages"])):
-                # Check if it's an AIMessage using type checking
-                if msg.__class__.__name__ == "AIMessage":
-                    ai_message = msg.content
-                    print(f"[DEBUG] Found AIMessage with content: {msg.content}")
-                    break
-                elif isinstance(msg, dict) and msg.get("role") == "assistant":
-                    ai_message = msg.get("content")
-                    break
-
-        # Check if approval is required (workflow was interrupted)
-        requires_approval = result.get("requires_approval", False)
-        pending_action = result.get("pending_action")
-        
-        if requires_approval and pending_action:
-            print(f"[DEBUG] Approval required for action: {pending_action.get('description', 'Unknown action')}")
-            return CopilotKitResponse(
-                message=ai_message or "I need your approval to proceed.",
-                requires_approval=True,
-                pending_action=pending_action,
-                thread_id=app_context["sessionId"]
-            )
-        
-        # Extract any executed actions from workflow data
-        executed_actions = []
-        if result.get("workflow_data", {}).get("actions"):
-            executed_actions = result["workflow_data"]["actions"]
-        elif result.get("workflow_data", {}).get("pending_actions"):
-            executed_actions = result["workflow_data"]["pending_actions"]
-
-        return CopilotKitResponse(
-            message=ai_message or "I'm not sure how to respond to that.",
-            actions=executed_actions
-        )
-
+        return respond(await run_chat_turn(request), fields)
+    except (LLMOverloadedError, RateLimitedError):
+        raise
     except Exception as e:
-        print(f"[CopilotKit Root] ❌ Error processing chat request: {e}")
+        logger.exception("chat request failed")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "langgraph": "ready"}
+    from app.agents.compaction import get_compactor
+    from app.agents.supervisor import get_intent_batcher
+    from app.persistence.checkpointer import get_checkpointer
+
+    checkpointer = get_checkpointer()
+    return {
+        "status": "healthy",
+        "worker": os.getenv("KIGO_WORKER_ID"),
+        "langgraph": "ready" if _supervisor_workflow is not None else "not compiled",
+        "lifecycle": lifecycle.stats(),
+        "intent_cache": get_intent_cache().stats(),
+        "intent_classifier": get_local_classifier().stats(),
+        "intent_batcher": get_intent_batcher().stats(),
+        "llm_breaker": get_llm_breaker().stats(),
+        "llm": llm_call_stats(),
+        "checkpointer": checkpointer.stats() if checkpointer is not None else None,
+        "compaction": get_compactor().stats(),
+        "logging": logging_stats(),
+        "chat_sockets": chat_socket_stats(),
+        "admission": get_admission_controller().stats(),
+        "idempotency": get_idempotency_store().stats(),
+    }
+
+@app.get("/ready")
+async def readiness_check():
+    """200 once the graph is compiled and caches are warm; 503 while starting or draining"""
+    if lifecycle.ready:
+        return {"status": "ready", "worker": os.getenv("KIGO_WORKER_ID")}
+    return JSONResponse(status_code=503, content={"status": lifecycle.state, "in_flight": lifecycle.in_flight})
 
 @app.post("/copilotkit")
-async def handle_copilotkit_chat(request: CopilotKitRequest):
+async def handle_copilotkit_chat(request: CopilotKitRequest, fields: Optional[str] = None):
     """
     CopilotKit-compatible endpoint that processes chat messages through LangGraph
     """
     try:
-        # Extract app context (same structure as TypeScript version)
-        app_context = {
-            "currentPage": request.context.get("currentPage", "/"),
-            "userRole": request.context.get("userRole", "user"),
-            "campaignData": request.context.get("campaignData", {}),
-            "sessionId": request.context.get("sessionId", f"session_{os.urandom(8).hex()}"),
-        }
-
-        # Import HumanMessage for proper message format
-        from langchain_core.messages import HumanMessage
-        
-        # Create thread config for resumable execution
-        thread_config = {
-            "configurable": {
-                "thread_id": app_context["sessionId"]
-            }
-        }
-        
-        # Invoke LangGraph supervisor workflow with proper message format
-        result = await supervisor_workflow.ainvoke(
-            {
-                "messages": [HumanMessage(content=request.message)],
-                "context": app_context
-            },
-            config=thread_config
-        )
-
-        # Extract AI response from LangGraph result
-        ai_message = None
-        print(f"[DEBUG] LangGraph result keys: {list(result.keys())}")
-        print(f"[DEBUG] Messages in result: {result.get('messages', [])}")
-        
-        if result.get("messages"):
-            for i, msg in enumerate(reversed(result["messages"])):
-                print(f"[DEBUG] Message {i}: type={type(msg)}, hasattr _getType={hasattr(msg, '_getType')}")
-                if hasattr(msg, '_getType'):
-                    print(f"[DEBUG] Message {i} _getType: {msg._getType()}")
-                if hasattr(msg, 'content'):
-                    print(f"[DEBUG] Message {i} content: {msg.content}")
-                    
-                # Check if it's an AIMessage using type checking
-                if msg.__class__.__name__ == "AIMessage":
-                    ai_message = msg.content
-                    print(f"[DEBUG] Found AIMessage with content: {msg.content}")
-                    break
-                elif isinstance(msg, dict) and msg.get("role") == "assistant":
-                    ai_message = msg.get("content")
-                    break
-
-        # Check if approval is required (workflow was interrupted)
-        requires_approval = result.get("requires_approval", False)
-        pending_action = result.get("pending_action")
-        
-        if requires_approval and pending_action:
-            print(f"[DEBUG] Approval required for action: {pending_action.get('description', 'Unknown action')}")
-            return CopilotKitResponse(
-                message=ai_message or "I need your approval to proceed.",
-                requires_approval=True,
-                pending_action=pending_action,
-                thread_id=app_context["sessionId"]
-            )
-        
-        # Extract any executed actions from workflow data
-        executed_actions = []
-        if result.get("workflow_data", {}).get("actions"):
-            executed_actions = result["workflow_data"]["actions"]
-
-        return CopilotKitResponse(
-            message=ai_message or "I'm not sure how to respond to that.",
-            actions=executed_actions
-        )
-
+        return respond(await run_chat_turn(request), fields)
+    except (LLMOverloadedError, RateLimitedError):
+        raise
     except Exception as e:
-        print(f"Error processing chat request: {e}")
+        logger.exception("chat request failed")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/stream")
+@app.post("/copilotkit/stream")
+async def stream_copilotkit_chat(request: CopilotKitRequest):
+    """
+    Streaming variant of /copilotkit - Server-Sent Events with node transitions
+    and LLM tokens as they are generated, then the CopilotKitResponse as the
+    final `final` event
+    """
+    from langchain_core.messages import HumanMessage
+
+    app_context = build_app_context(request)
+    await admit_chat(request, app_context)
+    thread_id = app_context["sessionId"]
+    thread_config = {"configurable": {"thread_id": thread_id}}
+
+    def build_final(result: Dict[str, Any]) -> Dict[str, Any]:
+        return build_copilotkit_response(result, thread_id).model_dump()
+
+    events = stream_graph_events(
+        get_supervisor_workflow(),
+        {"messages": [HumanMessage(content=request.message)], "context": app_context},
+        thread_config,
+        build_final,
+    )
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.websocket("/copilotkit/ws")
+async def copilotkit_chat_socket(websocket: WebSocket):
+    """
+    Persistent chat connection - context is sent once and cached per connection,
+    turns stream node/token events back, approvals are answered on the same socket
+    """
+    await serve_chat_socket(
+        websocket,
+        get_supervisor_workflow(),
+        app_context_from,
+        lambda result, thread_id: build_copilotkit_response(result, thread_id).model_dump(),
+        lifecycle=lifecycle,
+    )
+
 @app.post("/api/copilotkit/approve")
-async def handle_approval(request: ApprovalRequest):
+async def handle_approval(request: ApprovalRequest, fields: Optional[str] = None,
+                          idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")):
     """
     Handle user approval/rejection of pending actions
+
+    Retries with the same Idempotency-Key replay the first result instead of
+    resuming the thread again.
     """
-    try:
-        from langchain_core.messages import HumanMessage
-        
-        # Create thread config to resume the specific conversation
-        thread_config = {
-            "configurable": {
-                "thread_id": request.thread_id
-            }
+    # Create thread config to resume the specific conversation
+    thread_config = {
+        "configurable": {
+            "thread_id": request.thread_id
         }
+    }
+
+    async def resume() -> Dict[str, Any]:
+        # Resuming generates too: charge the thread's session buckets
+        await get_admission_controller().admit(request.thread_id)
+
+        logger.info("approval decision", extra={"fields": {"thread_id": request.thread_id, "decision": request.approval_decision}})
         
-        print(f"[Approval] Resuming thread {request.thread_id} with decision: {request.approval_decision}")
+        # Only the thread's latest checkpoint is loaded - the conversation is not replayed
+        snapshot = await get_supervisor_workflow().aget_state(thread_config)
+        if "approval_node" not in (snapshot.next or ()):
+            raise HTTPException(status_code=409, detail=f"No pending approval for thread {request.thread_id}")
         
-        # Resume the workflow with the approval decision
-        result = await supervisor_workflow.ainvoke(
-            {
-                "approval_status": request.approval_decision,
-                "messages": []  # No new message, just approval
-            },
-            config=thread_config
+        # Record the decision as approval_node's output, then resume from the interrupt
+        # (approvals jump the LLM queue)
+        await get_supervisor_workflow().aupdate_state(
+            thread_config,
+            {"approval_status": request.approval_decision},
+            as_node="approval_node",
         )
+        with llm_request_class("approval"):
+            result = await get_supervisor_workflow().ainvoke(None, config=thread_config)
         
         # Extract AI response
         ai_message = None
@@ -289,67 +446,33 @@ async def handle_approval(request: ApprovalRequest):
         return CopilotKitResponse(
             message=ai_message or "Action processed.",
             actions=executed_actions
+        ).model_dump()
+
+    try:
+        response, replayed = await idempotent(
+            "approve", request.thread_id, idempotency_key, request.model_dump(), resume
         )
+        return FastJSONResponse(project(response, fields), headers=replay_headers(replayed))
         
+    except (HTTPException, LLMOverloadedError, RateLimitedError, IdempotencyConflict):
+        raise
     except Exception as e:
-        print(f"Error processing approval: {e}")
+        logger.exception("approval failed")
         raise HTTPException(status_code=500, detail=str(e))
 
 # CopilotKit Discovery Endpoints
 @app.get("/info")
-async def copilotkit_info_get():
-    """CopilotKit info endpoint for agent discovery (GET)"""
-    return {
-        "actions": [],
-        "agents": [
-            {
-                "name": "supervisor",
-                "description": "Kigo Pro multi-agent supervisor that routes to campaign, analytics, filter, and merchant specialists"
-            }
-        ]
-    }
-
 @app.post("/info")
-async def copilotkit_info_post():
-    """CopilotKit info endpoint for agent discovery (POST)"""
-    return {
-        "actions": [],
-        "agents": [
-            {
-                "name": "supervisor", 
-                "description": "Kigo Pro multi-agent supervisor that routes to campaign, analytics, filter, and merchant specialists"
-            }
-        ]
-    }
+async def copilotkit_info(request: Request):
+    """CopilotKit info endpoint for agent discovery"""
+    return INFO_RESPONSE.response(request)
 
 # Official CopilotKit endpoint pattern
 @app.get("/copilotkit/info")
-async def copilotkit_info_get():
-    """Official CopilotKit info endpoint for agent discovery (GET)"""
-    return {
-        "actions": [],
-        "agents": [
-            {
-                "name": "supervisor",
-                "description": "Kigo Pro multi-agent supervisor that routes to campaign, analytics, filter, and merchant specialists",
-                "type": "langgraph"
-            }
-        ]
-    }
-
 @app.post("/copilotkit/info")
-async def copilotkit_info_post():
-    """Official CopilotKit info endpoint for agent discovery (POST)"""
-    return {
-        "actions": [],
-        "agents": [
-            {
-                "name": "supervisor",
-                "description": "Kigo Pro multi-agent supervisor that routes to campaign, analytics, filter, and merchant specialists", 
-                "type": "langgraph"
-            }
-        ]
-    }
+async def copilotkit_official_info(request: Request):
+    """Official CopilotKit info endpoint for agent discovery"""
+    return COPILOTKIT_INFO_RESPONSE.response(request)
 
 class CopilotKitAgentRequest(BaseModel):
     name: str
@@ -359,15 +482,21 @@ class CopilotKitAgentRequest(BaseModel):
     config: Dict[str, Any] = {}
     properties: Dict[str, Any] = {}
     actions: List[Dict[str, Any]] = []
+    # Optional projection of `result`, e.g. ["message", "actions", "workflow_data.steps"]
+    fields: Optional[List[str]] = None
 
 @app.post("/agents/execute")
-async def execute_agent(request: CopilotKitAgentRequest):
-    """Execute LangGraph agent - handles CopilotKit's actual request format"""
-    print(f"[Python LangGraph] 🎯 AGENT EXECUTION - {request.name}")
-    print(f"[Python LangGraph] 📝 Thread ID: {request.threadId}")
-    print(f"[Python LangGraph] 📝 Messages: {len(request.messages)} messages")
-    
-    try:
+async def execute_agent(request: CopilotKitAgentRequest, fields: Optional[str] = None,
+                        idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")):
+    """Execute LangGraph agent - handles CopilotKit's actual request format
+
+    Without `fields` (query string or body) the full graph state is returned as
+    `result.workflow_data`; with it only the requested parts of `result` are.
+    Retries with the same Idempotency-Key replay the first result.
+    """
+    logger.info("agent execution", extra={"fields": {"agent": request.name, "thread_id": request.threadId, "messages": len(request.messages)}})
+
+    async def run_agent() -> Dict[str, Any]:
         # Extract the user's last message
         user_message = ""
         for msg in reversed(request.messages):
@@ -375,17 +504,21 @@ async def execute_agent(request: CopilotKitAgentRequest):
                 user_message = msg.get("content", "")
                 break
         
-        print(f"[Python LangGraph] 💬 User message: {user_message}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("agent user message", extra={"fields": {"thread_id": request.threadId, "message": user_message}})
+
+        await get_admission_controller().admit(request.threadId, tenant_key(request.properties or request.state), user_message)
         
         # Route to supervisor workflow (using async)
-        result = await supervisor_workflow.ainvoke({
+        result = await get_supervisor_workflow().ainvoke({
             "messages": [{"type": "human", "content": user_message}],
             "user_intent": "general",
             "context": {"threadId": request.threadId, "copilotkit_state": request.state},
             "agent_decision": request.name
-        })
+        }, config={"configurable": {"thread_id": request.threadId}})
         
-        print(f"[Python LangGraph] ✅ Workflow result: {result}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("agent workflow result", extra={"fields": {"thread_id": request.threadId, "result": result}})
         
         # Extract the final response
         if "messages" in result and result["messages"]:
@@ -393,17 +526,30 @@ async def execute_agent(request: CopilotKitAgentRequest):
             response_content = last_message.content if hasattr(last_message, 'content') else str(last_message)
         else:
             response_content = str(result)
-            
+
+        workflow_data = result.get("workflow_data") or {}
         return {
-            "result": {
-                "message": response_content,
-                "workflow_data": result
-            },
-            "status": "completed"
+            "message": response_content,
+            "actions": workflow_data.get("actions") or workflow_data.get("pending_actions") or [],
+            "requires_approval": bool(result.get("requires_approval")),
+            "pending_action": result.get("pending_action"),
+            "workflow_data": result,
         }
+
+    try:
+        # The projection is per response, so it is not part of what makes two requests the same
+        payload, replayed = await idempotent(
+            "execute", request.threadId, idempotency_key, request.model_dump(exclude={"fields"}), run_agent
+        )
+        return FastJSONResponse({
+            "result": project(payload, fields or request.fields),
+            "status": "completed"
+        }, headers=replay_headers(replayed))
         
+    except (LLMOverloadedError, RateLimitedError, IdempotencyConflict):
+        raise
     except Exception as e:
-        print(f"[Python LangGraph] ❌ Agent execution error: {e}")
+        logger.exception("agent execution failed")
         return {
             "result": {"error": str(e)},
             "status": "failed"
@@ -444,15 +590,10 @@ async def execute_agent(request: CopilotKitAgentRequest):
 
 # Official CopilotKit agent execution endpoint
 @app.post("/copilotkit/agents/execute")
-async def copilotkit_agents_execute(request: CopilotKitAgentRequest):
+async def copilotkit_agents_execute(request: CopilotKitAgentRequest, fields: Optional[str] = None,
+                                    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")):
     """Official CopilotKit agents execution endpoint - proxies to our main handler"""
-    return await execute_agent(request)
-
-print("✅ Kigo Pro LangGraph Backend Ready!")
-print("📡 Available endpoints:")
-print("  - /info & /copilotkit/info (CopilotKit agent discovery)")
-print("  - /agents/execute & /copilotkit/agents/execute (CopilotKit agent execution)")
-print("  - /copilotkit (Chat endpoint)")
+    return await execute_agent(request, fields, idempotency_key)
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Production entry point for the Kigo Pro backend
+
+Starts N uvicorn workers running `main:app` behind the thread-affine
+dispatcher in app/server/dispatcher.py:
+
+    cd backend
+    python serve.py --workers 4 --port 8000
+
+Send SIGHUP to this process for a graceful rolling restart of the workers;
+SIGINT/SIGTERM drain and stop everything.
+
+Configuration (flags override):
+- KIGO_WORKERS                 worker processes (CPU count)
+- KIGO_SERVE_HOST              dispatcher bind host (0.0.0.0)
+- KIGO_SERVE_PORT              dispatcher port (8000)
+- KIGO_WORKER_BASE_PORT        first loopback worker port (8100; 2 x workers ports are used)
+- KIGO_WORKER_APP              ASGI app each worker runs (main:app)
+- KIGO_DISPATCH_VNODES         virtual nodes per worker on the hash ring (128)
+- KIGO_DISPATCH_REPORT_SECONDS interval of the load-spread log (60, 0 disables)
+- KIGO_WORKER_DRAIN_SECONDS    graceful shutdown budget per worker (30)
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+
+import uvicorn
+
+from app.server.dispatcher import Dispatcher, create_dispatcher_app
+from app.server.logs import get_logger, shutdown_logging
+
+logger = get_logger("serve")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("KIGO_WORKERS", str(os.cpu_count() or 1))))
+    parser.add_argument("--host", default=os.getenv("KIGO_SERVE_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("KIGO_SERVE_PORT", "8000")))
+    parser.add_argument("--base-port", type=int, default=int(os.getenv("KIGO_WORKER_BASE_PORT", "8100")))
+    parser.add_argument("--app", default=os.getenv("KIGO_WORKER_APP", "main:app"))
+    args = parser.parse_args()
+
+    dispatcher = Dispatcher(
+        workers=max(1, args.workers),
+        base_port=args.base_port,
+        app_path=args.app,
+        vnodes=int(os.getenv("KIGO_DISPATCH_VNODES", "128")),
+        drain_timeout=float(os.getenv("KIGO_WORKER_DRAIN_SECONDS", "30")),
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    app = create_dispatcher_app(dispatcher, report_interval=float(os.getenv("KIGO_DISPATCH_REPORT_SECONDS", "60")))
+    server = uvicorn.Server(uvicorn.Config(app, host=args.host, port=args.port, access_log=False))
+
+    async def serve():
+        loop = asyncio.get_running_loop()
+        loop.add_signal_handler(signal.SIGHUP, lambda: loop.create_task(dispatcher.rolling_restart()))
+        logger.info("dispatcher listening", extra={"fields": {"host": args.host, "port": args.port, "workers": len(dispatcher.slots)}})
+        await server.serve()
+
+    try:
+        asyncio.run(serve())
+    finally:
+        shutdown_logging()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Admission control: token buckets, rollback on denial and the shared SQLite store"""
+
+import asyncio
+
+import pytest
+
+from app.server.admission import (
+    AdmissionController,
+    BucketSpec,
+    MemoryBucketStore,
+    RateLimitedError,
+    SqliteBucketStore,
+    tenant_key,
+)
+
+# Refill so slowly that nothing comes back during a test
+SLOW = 1e-6
+
+
+def controller(store=None, session_requests=2, tenant_requests=100, session_tokens=1e6, tokens_per_turn=10):
+    return AdmissionController(
+        store=store or MemoryBucketStore(),
+        tokens_per_turn=tokens_per_turn,
+        specs={
+            "session": (BucketSpec("requests", SLOW, session_requests), BucketSpec("tokens", SLOW, session_tokens)),
+            "tenant": (BucketSpec("requests", SLOW, tenant_requests), BucketSpec("tokens", SLOW, 1e6)),
+        },
+    )
+
+
+def admit_many(admission, n, session="s1", tenant=None, **kwargs):
+    async def scenario():
+        outcomes = []
+        for _ in range(n):
+            try:
+                await admission.admit(session, tenant, **kwargs)
+                outcomes.append(True)
+            except RateLimitedError as e:
+                outcomes.append(e)
+        return outcomes
+
+    return asyncio.run(scenario())
+
+
+def test_burst_then_429_with_retry_after():
+    admission = controller(session_requests=2)
+    *allowed, denied = admit_many(admission, 3)
+    assert allowed == [True, True]
+    assert (denied.scope, denied.bucket) == ("session", "requests")
+    assert denied.retry_after >= 1
+    assert admission.stats()["limited"] == {"session_requests": 1}
+
+
+def test_sessions_have_separate_buckets():
+    admission = controller(session_requests=1)
+    assert admit_many(admission, 1, session="a") == [True]
+    assert admit_many(admission, 1, session="b") == [True]
+
+
+def test_tokens_are_estimated_from_the_message():
+    admission = controller(session_tokens=100, tokens_per_turn=10)
+    assert admission.estimate_tokens("x" * 400) == 110
+    # An oversized turn needs a full bucket, so it is still admitted once
+    assert admit_many(admission, 1, message="x" * 4000) == [True]
+    denied = admit_many(admission, 1, message="x" * 400)[0]
+    assert isinstance(denied, RateLimitedError) and denied.bucket == "tokens"
+
+
+def test_denied_request_returns_what_it_already_took():
+    store = MemoryBucketStore()
+    admission = controller(store=store, session_requests=100, tenant_requests=1)
+    assert admit_many(admission, 1, session="a", tenant="t") == [True]
+    denied = admit_many(admission, 1, session="b", tenant="t")[0]
+    assert denied.scope == "tenant"
+    # Session "b" got its request token back
+    assert store.take("session:requests:b", 100, SLOW, 100) == (True, 0.0)
+
+
+def test_disabled_or_keyless_requests_are_not_limited():
+    admission = controller(session_requests=1)
+    admission.enabled = False
+    assert admit_many(admission, 3) == [True, True, True]
+    admission.enabled = True
+    assert admit_many(admission, 3, session=None) == [True, True, True]
+
+
+def test_memory_store_drops_least_recently_used_buckets():
+    store = MemoryBucketStore(max_keys=2)
+    for key in ("a", "b", "c"):
+        store.take(key, 1, SLOW, 1)
+    assert store.size() == 2
+    assert store.take("a", 1, SLOW, 1)[0] is True  # came back full
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "buckets.sqlite")
+    first, second = SqliteBucketStore(path), SqliteBucketStore(path)
+    assert first.take("k", 1, SLOW, 1) == (True, 0.0)
+    allowed, retry_after = second.take("k", 1, SLOW, 1)
+    assert allowed is False and retry_after > 0
+    assert second.size() == 1
+
+
+def test_sqlite_store_is_used_off_the_event_loop(tmp_path):
+    admission = controller(store=SqliteBucketStore(str(tmp_path / "buckets.sqlite")), session_requests=1)
+    first, second = admit_many(admission, 2)
+    assert first is True and isinstance(second, RateLimitedError)
+
+
+@pytest.mark.parametrize("context, key", [
+    ({"tenantId": "t1", "merchantId": "m1"}, "tenantId:t1"),
+    ({"campaignData": {"merchantId": "m1"}}, "merchantId:m1"),
+    ({"campaignData": {"programType": "yardi"}}, "program:yardi"),
+    ({}, None),
+    (None, None),
+])
+def test_tenant_key(context, key):
+    assert tenant_key(context) == key
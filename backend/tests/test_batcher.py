@@ -0,0 +1,108 @@
+"""Intent batcher: batching, dedup, per-item fallback and error propagation"""
+
+import asyncio
+
+import pytest
+
+from app.intent.batcher import IntentBatcher
+from app.llm.scheduler import LLMOverloadedError
+
+
+def make_batcher(many=None, one=None, **kwargs):
+    calls = {"one": [], "many": []}
+
+    async def classify_one(text):
+        calls["one"].append(text)
+        if one is not None:
+            return await one(text)
+        return f"label:{text}"
+
+    async def classify_many(texts):
+        calls["many"].append(list(texts))
+        if many is not None:
+            return await many(texts)
+        return [f"label:{t}" for t in texts]
+
+    return IntentBatcher(classify_one, classify_many, **kwargs), calls
+
+
+def classify_all(batcher, texts):
+    async def scenario():
+        return await asyncio.gather(*(batcher.classify(t) for t in texts), return_exceptions=True)
+
+    return asyncio.run(scenario())
+
+
+def test_concurrent_requests_share_one_deduplicated_batch():
+    batcher, calls = make_batcher(window_ms=5, max_batch=16)
+    results = classify_all(batcher, ["a", "b", "a", "c"])
+    assert results == ["label:a", "label:b", "label:a", "label:c"]
+    assert calls["many"] == [["a", "b", "c"]] and calls["one"] == []
+    assert batcher.stats()["in_flight_batches"] == 0
+
+
+def test_full_batch_flushes_without_waiting_for_the_window():
+    batcher, calls = make_batcher(window_ms=10_000, max_batch=2)
+    assert classify_all(batcher, ["a", "b"]) == ["label:a", "label:b"]
+    assert calls["many"] == [["a", "b"]]
+
+
+def test_single_message_uses_the_single_prompt():
+    batcher, calls = make_batcher(window_ms=1)
+    assert classify_all(batcher, ["hello"]) == ["label:hello"]
+    assert calls["one"] == ["hello"] and calls["many"] == []
+
+
+def test_disabled_batcher_calls_through():
+    batcher, calls = make_batcher(window_ms=0)
+    assert classify_all(batcher, ["a", "b"]) == ["label:a", "label:b"]
+    assert calls["one"] == ["a", "b"] and batcher.requests == 0
+
+
+def test_unparseable_batch_falls_back_per_item():
+    async def bad_json(texts):
+        raise ValueError("not a JSON array")
+
+    batcher, calls = make_batcher(many=bad_json, window_ms=5)
+    assert classify_all(batcher, ["a", "b"]) == ["label:a", "label:b"]
+    assert sorted(calls["one"]) == ["a", "b"] and batcher.fallbacks == 1
+
+
+def test_short_reply_fails_only_the_unlabelled_caller():
+    async def short(texts):
+        return ["label:a"]
+
+    batcher, _ = make_batcher(many=short, window_ms=5)
+    first, second = classify_all(batcher, ["a", "b"])
+    assert first == "label:a"
+    assert isinstance(second, RuntimeError)
+
+
+def test_overload_is_not_retried_per_item():
+    async def overloaded(texts):
+        raise LLMOverloadedError("LLM queue is full")
+
+    batcher, calls = make_batcher(many=overloaded, window_ms=5)
+    results = classify_all(batcher, ["a", "b"])
+    assert all(isinstance(r, LLMOverloadedError) for r in results)
+    assert calls["one"] == [] and batcher.fallbacks == 0
+
+
+@pytest.mark.parametrize("started", [False, True])
+def test_cancelled_batch_never_leaves_callers_waiting(started):
+    async def hang(texts):
+        await asyncio.sleep(10)
+
+    async def scenario():
+        batcher, calls = make_batcher(many=hang, window_ms=1)
+        waiters = [asyncio.ensure_future(batcher.classify(t)) for t in ("a", "b")]
+        while not batcher._tasks:
+            await asyncio.sleep(0.001)
+        while started and not calls["many"]:
+            await asyncio.sleep(0.001)
+        for task in list(batcher._tasks):
+            task.cancel()
+        return await asyncio.wait_for(asyncio.gather(*waiters, return_exceptions=True), timeout=1)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(r, RuntimeError) for r in results)
@@ -0,0 +1,73 @@
+"""Circuit breaker: tripping on error and slow-call rates, half-open probing"""
+
+import pytest
+
+from app.llm import breaker as breaker_module
+from app.llm.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(breaker_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_trips_on_error_rate_and_fails_fast(clock):
+    breaker = CircuitBreaker(min_calls=4, error_rate=0.5, open_seconds=10)
+    for ok in (True, False, True, False):
+        breaker.before_call()
+        breaker.record(ok, 0.1)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    assert breaker.stats()["short_circuited"] == 1
+
+
+def test_trips_on_slow_calls(clock):
+    breaker = CircuitBreaker(min_calls=3, slow_call_seconds=1, slow_rate=0.6)
+    for seconds in (2, 2, 0.1):
+        breaker.record(True, seconds)
+    assert breaker.state == OPEN
+    assert "slow-call" in breaker.last_opened_reason
+
+
+def test_needs_min_calls_and_forgets_old_outcomes(clock):
+    breaker = CircuitBreaker(window_seconds=30, min_calls=3, error_rate=0.5)
+    breaker.record(False, 0.1)
+    breaker.record(False, 0.1)
+    assert breaker.state == CLOSED
+    clock[0] += 31
+    breaker.record(False, 0.1)
+    assert breaker.state == CLOSED
+
+
+def test_half_open_lets_one_probe_through(clock):
+    breaker = CircuitBreaker(min_calls=1, error_rate=0.5, open_seconds=10)
+    breaker.record(False, 0.1)
+    clock[0] += 10
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record(True, 0.1)
+    assert breaker.state == CLOSED
+
+
+def test_failed_probe_reopens(clock):
+    breaker = CircuitBreaker(min_calls=1, error_rate=0.5, open_seconds=10)
+    breaker.record(False, 0.1)
+    clock[0] += 10
+    breaker.before_call()
+    breaker.record(False, 0.1)
+    assert breaker.state == OPEN and breaker.times_opened == 2
+
+
+def test_abandoned_probe_frees_the_slot(clock):
+    breaker = CircuitBreaker(min_calls=1, error_rate=0.5, open_seconds=10)
+    breaker.record(False, 0.1)
+    clock[0] += 10
+    breaker.before_call()
+    breaker.abandon()
+    breaker.before_call()  # a new probe may go
+    assert breaker.state == HALF_OPEN
@@ -0,0 +1,76 @@
+"""Checkpointer round trips, history trimming and the write-behind eviction race"""
+
+import threading
+
+import pytest
+
+pytest.importorskip("langgraph")
+
+from langgraph.checkpoint.base import empty_checkpoint
+
+from app.persistence.checkpointer import InMemoryCheckpointSaver, SqliteCheckpointSaver
+from app.persistence.thread_store import ThreadStore
+
+
+def config(thread_id, checkpoint_id=None):
+    configurable = {"thread_id": thread_id, "checkpoint_ns": ""}
+    if checkpoint_id:
+        configurable["checkpoint_id"] = checkpoint_id
+    return {"configurable": configurable}
+
+
+def put(saver, thread_id, parent=None):
+    checkpoint = empty_checkpoint()
+    return saver.put(config(thread_id, parent), checkpoint, {"step": 1}, {})["configurable"]["checkpoint_id"]
+
+
+def test_memory_round_trip_keeps_only_the_latest_checkpoint():
+    saver = InMemoryCheckpointSaver()
+    first = put(saver, "t1")
+    second = put(saver, "t1", parent=first)
+    saver.put_writes(config("t1", second), [("messages", "hi")], task_id="task")
+
+    found = saver.get_tuple(config("t1"))
+    assert found.config["configurable"]["checkpoint_id"] == second
+    assert found.parent_config["configurable"]["checkpoint_id"] == first
+    assert found.pending_writes == [("task", "messages", "hi")]
+    assert saver.get_tuple(config("t1", first)) is None
+
+
+def test_sqlite_serves_evicted_threads_from_the_database(tmp_path):
+    saver = SqliteCheckpointSaver(str(tmp_path / "cp.sqlite"), store=ThreadStore(max_threads=1))
+    try:
+        old = put(saver, "old")
+        put(saver, "new")
+        saver.flush()
+        saver.store.sweep()
+        assert not saver.store.is_resident("old")
+        found = saver.get_tuple(config("old"))
+        assert found.config["configurable"]["checkpoint_id"] == old
+        assert saver.store_reads == 1
+    finally:
+        saver.close()
+
+
+def test_rows_are_queued_before_a_sweep_can_evict_the_thread(tmp_path):
+    saver = SqliteCheckpointSaver(str(tmp_path / "cp.sqlite"), store=ThreadStore(idle_ttl=0))
+    blocked = []
+    queue_row = saver._on_put
+
+    def racing_on_put(*args):
+        # A concurrent sweep (e.g. from the writer thread) must wait for the row to be queued
+        sweeper = threading.Thread(target=saver.store.sweep)
+        sweeper.start()
+        sweeper.join(0.05)
+        blocked.append(sweeper.is_alive())
+        queue_row(*args)
+
+    saver._on_put = racing_on_put
+    try:
+        put(saver, "t1")
+        assert blocked == [True]
+        assert saver.store.is_resident("t1") or "t1" not in saver._unflushed
+        saver.flush()
+        assert saver.get_tuple(config("t1")) is not None
+    finally:
+        saver.close()
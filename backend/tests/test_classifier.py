@@ -0,0 +1,47 @@
+"""Local intent classifier: features, confident answers and escalation"""
+
+from app.intent.classifier import (
+    INTENT_LABELS,
+    LocalIntentClassifier,
+    extract_features,
+    load_corpus,
+    training_examples,
+)
+
+
+def trained(threshold=0.35):
+    return LocalIntentClassifier(threshold=threshold).fit(training_examples())
+
+
+def test_features_cover_words_bigrams_and_trigrams():
+    features = extract_features("Create offer")
+    assert features["w:create"] == 1 and features["b:create offer"] == 1
+    assert features["c:#of"] == 1 and features["c:er#"] == 1
+
+
+def test_corpus_labels_are_known():
+    corpus = load_corpus()
+    assert corpus
+    assert {label for _, label in corpus} <= set(INTENT_LABELS)
+    assert load_corpus("/nonexistent/corpus.jsonl") == []
+
+
+def test_clear_messages_are_answered_locally():
+    classifier = trained()
+    assert classifier.classify("create a promotion") == "offer_management"
+    assert classifier.classify("show me the analytics dashboard") == "analytics"
+    assert classifier.classify("hello there") == "general"
+    assert classifier.stats()["answered_locally"] == 3
+
+
+def test_unrelated_text_escalates_to_the_llm():
+    classifier = trained()
+    label, confidence = classifier.predict("qwzx plmk")
+    assert (label, confidence) == ("general", 0.0)
+    assert classifier.classify("qwzx plmk") is None
+    assert classifier.stats()["escalated_to_llm"] == 1
+
+
+def test_threshold_above_one_disables_the_tier():
+    classifier = trained(threshold=1.5)
+    assert classifier.classify("show analytics") is None
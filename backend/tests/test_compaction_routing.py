@@ -0,0 +1,69 @@
+"""Offer routing must not change when the turn that stated the program/objective is compacted away"""
+
+from typing import get_type_hints
+
+import pytest
+
+pytest.importorskip("langgraph")
+pytest.importorskip("langchain_anthropic")
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.graph.message import add_messages
+
+from app.agents.compaction import compact_messages, objective_from_text, program_from_text
+from app.agents.offer_manager import detect_program_type, determine_workflow_step
+from app.agents.supervisor import KigoProAgentState
+
+OPENING = "We run the John Deere dealer program and want to increase parts sales this spring"
+
+
+def conversation(filler_turns: int):
+    messages = [HumanMessage(content=OPENING, id="h0"), AIMessage(content="Great, tell me more.", id="a0")]
+    for i in range(1, filler_turns + 1):
+        messages.append(HumanMessage(content=f"ok {i}", id=f"h{i}"))
+        messages.append(AIMessage(content=f"noted {i}", id=f"a{i}"))
+    return messages
+
+
+def state_after_goal_setting(messages):
+    # What handle_goal_setting returned on the opening turn
+    return {
+        "messages": messages,
+        "context": {"currentPage": "/offer-manager"},
+        "program_type": program_from_text(OPENING),
+        "business_objective": objective_from_text(OPENING),
+    }
+
+
+def test_offer_context_keys_are_graph_channels():
+    hints = get_type_hints(KigoProAgentState)
+    assert "program_type" in hints
+    assert "business_objective" in hints
+
+
+def test_routing_is_unchanged_after_the_stating_turn_is_folded():
+    messages = conversation(filler_turns=8)
+    uncompacted = state_after_goal_setting(messages)
+
+    update = compact_messages(messages, None, keep_turns=6)
+    assert update is not None
+    folded = add_messages(messages, update["messages"])
+    assert all(getattr(m, "content", "") != OPENING for m in folded)
+    compacted = {**uncompacted, "messages": folded, "conversation_facts": update["conversation_facts"]}
+
+    for state in (uncompacted, compacted):
+        program = detect_program_type(state["context"], state["messages"], state["program_type"])
+        assert program == "john_deere"
+        assert determine_workflow_step(state) == "offer_creation"
+
+
+def test_recent_mention_overrides_the_stored_program():
+    messages = [HumanMessage(content="actually this is for our Yardi properties")]
+    assert detect_program_type({"currentPage": "/"}, messages, "john_deere") == "yardi"
+    assert detect_program_type({"currentPage": "/"}, [HumanMessage(content="hi")], None) == "general"
+
+
+def test_goal_setting_without_objective_stays_in_goal_setting():
+    state = {"messages": [HumanMessage(content="I want to create an offer")], "business_objective": None}
+    assert objective_from_text("I want to create an offer") is None
+    assert determine_workflow_step(state) == "goal_setting"
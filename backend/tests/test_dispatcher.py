@@ -0,0 +1,116 @@
+"""Dispatcher hashing, routing keys, in-flight accounting and readiness"""
+
+import asyncio
+import json
+from collections import Counter
+
+import pytest
+
+pytest.importorskip("fastapi")
+httpx = pytest.importorskip("httpx")
+
+from starlette.requests import Request
+
+from app.server.dispatcher import Dispatcher, HashRing, routing_key
+
+
+def make_request(path="/copilotkit", body=b"", headers=(), query=b""):
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query,
+        "headers": [(b"content-type", b"application/json"), *headers],
+        "server": ("dispatcher", 80),
+        "scheme": "http",
+        "root_path": "",
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    return Request(scope, receive)
+
+
+def dispatcher_with(handler, workers=2):
+    dispatcher = Dispatcher(workers=workers)
+    dispatcher.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return dispatcher
+
+
+def test_ring_is_stable_and_spreads_keys():
+    nodes = [f"worker-{i}" for i in range(4)]
+    ring = HashRing(nodes)
+    assert all(ring.node_for(f"t{i}") == HashRing(nodes).node_for(f"t{i}") for i in range(100))
+    spread = Counter(ring.node_for(f"session_{i}") for i in range(4000))
+    assert set(spread) == set(nodes)
+    assert max(spread.values()) / min(spread.values()) < 1.5
+
+
+def test_adding_a_node_only_moves_keys_to_it():
+    before = HashRing(["a", "b", "c"])
+    after = HashRing(["a", "b", "c", "d"])
+    moved = [k for k in map(str, range(2000)) if before.node_for(k) != after.node_for(k)]
+    assert moved and all(after.node_for(k) == "d" for k in moved)
+
+
+def test_routing_key_sources():
+    assert routing_key(make_request(headers=[(b"x-thread-id", b"h")]), {"thread_id": "b"}) == "h"
+    assert routing_key(make_request(query=b"thread_id=q"), None) == "q"
+    assert routing_key(make_request(), {"threadId": "b"}) == "b"
+    assert routing_key(make_request(), {"context": {"sessionId": "s"}}) == "s"
+    assert routing_key(make_request(), {"message": "hi"}) is None
+
+
+def test_chat_without_session_gets_one_minted():
+    dispatcher = Dispatcher(workers=2)
+    raw, body = dispatcher._prepare_body(json.dumps({"message": "hi"}).encode(), "application/json")
+    session = body["context"]["sessionId"]
+    assert session.startswith("session_") and json.loads(raw)["context"]["sessionId"] == session
+    assert dispatcher.sessions_minted == 1
+
+
+def test_in_flight_is_released_when_the_client_disconnects_mid_body():
+    async def scenario():
+        dispatcher = dispatcher_with(lambda request: httpx.Response(200, content=b"x" * 10))
+        response = await dispatcher.proxy(make_request(body=b'{"thread_id": "t1"}'))
+        slot = dispatcher.pick("t1")
+        assert slot.in_flight == 1
+        body = response.body_iterator
+        await body.__anext__()
+        await body.aclose()  # what Starlette does when the client goes away
+        await dispatcher.client.aclose()
+        return slot
+
+    assert asyncio.run(scenario()).in_flight == 0
+
+
+def test_unreachable_worker_answers_503():
+    def refuse(request):
+        raise httpx.ConnectError("refused", request=request)
+
+    async def scenario():
+        dispatcher = dispatcher_with(refuse)
+        response = await dispatcher.proxy(make_request(body=b'{"thread_id": "t1"}'))
+        await dispatcher.client.aclose()
+        return dispatcher, response
+
+    dispatcher, response = asyncio.run(scenario())
+    assert response.status_code == 503
+    assert dispatcher.pick("t1").in_flight == 0 and dispatcher.pick("t1").errors == 1
+
+
+def test_ready_requires_every_worker():
+    def handler(request):
+        return httpx.Response(503 if request.url.port == 8101 else 200)
+
+    async def scenario(handler):
+        dispatcher = dispatcher_with(handler)
+        readiness = await dispatcher.readiness()
+        await dispatcher.client.aclose()
+        return readiness
+
+    assert asyncio.run(scenario(lambda request: httpx.Response(200)))["status"] == "ready"
+    degraded = asyncio.run(scenario(handler))
+    assert degraded["status"] == "unavailable" and degraded["not_ready"] == ["worker-1"]
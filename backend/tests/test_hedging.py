@@ -0,0 +1,96 @@
+"""Timeout budgets, hedge triggering and the hedge cap"""
+
+import asyncio
+
+import pytest
+
+from app.llm.hedging import MIN_SAMPLES, WINDOW, HedgingPolicy, LLMTimeoutError, _parse_node_timeouts
+
+
+def warmed(policy: HedgingPolicy, node: str, seconds: float) -> HedgingPolicy:
+    for _ in range(MIN_SAMPLES):
+        policy._record(node, seconds)
+    return policy
+
+
+def slow_then_fast():
+    attempts = []
+
+    async def fn():
+        attempts.append(len(attempts))
+        await asyncio.sleep(1.0 if len(attempts) == 1 else 0.0)
+        return f"attempt {len(attempts)}"
+
+    return fn, attempts
+
+
+def test_parse_node_timeouts():
+    assert _parse_node_timeouts("detect_intent=5, general_agent=15,") == {"detect_intent": 5.0, "general_agent": 15.0}
+    assert _parse_node_timeouts("") == {}
+
+
+def test_budget_exceeded_raises_timeout_and_records_latency():
+    policy = HedgingPolicy(node_timeouts={"n": 0.02})
+    with pytest.raises(LLMTimeoutError):
+        asyncio.run(policy.call(lambda: asyncio.sleep(1), node="n"))
+    assert policy.timeouts == 1
+    assert len(policy._latencies["n"]) == 1
+
+
+def test_failure_propagates_and_feeds_the_percentile():
+    policy = HedgingPolicy()
+
+    async def boom():
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        asyncio.run(policy.call(boom, node="n"))
+    assert len(policy._latencies["n"]) == 1
+
+
+def test_slow_primary_is_hedged_and_the_hedge_wins():
+    policy = warmed(HedgingPolicy(hedging=True, node_timeouts={"n": 2}), "n", 0.01)
+    fn, attempts = slow_then_fast()
+    released = []
+    result = asyncio.run(policy.call(fn, node="n", reserve=lambda: True, release=lambda: released.append(1)))
+    assert result == "attempt 2"
+    assert len(attempts) == 2
+    assert policy.hedged == 1 and policy.hedge_wins == 1
+    assert released == [1]
+
+
+def test_no_hedge_when_disabled_for_the_call():
+    policy = warmed(HedgingPolicy(hedging=True, node_timeouts={"n": 2}), "n", 0.01)
+
+    async def fn():
+        await asyncio.sleep(0.05)
+        return "primary"
+
+    assert asyncio.run(policy.call(fn, node="n", reserve=lambda: True, hedge=False)) == "primary"
+    assert policy.hedged == 0
+
+
+def test_no_hedge_without_spare_capacity():
+    policy = warmed(HedgingPolicy(hedging=True, node_timeouts={"n": 2}), "n", 0.01)
+
+    async def fn():
+        await asyncio.sleep(0.05)
+        return "primary"
+
+    assert asyncio.run(policy.call(fn, node="n", reserve=lambda: False)) == "primary"
+    assert policy.hedged == 0
+
+
+def test_hedge_cap_counts_the_full_window():
+    policy = warmed(HedgingPolicy(hedging=True, max_hedge_rate=0.01, node_timeouts={"n": 2}), "n", 0.001)
+
+    async def fn():
+        await asyncio.sleep(0.01)
+        return "ok"
+
+    async def many():
+        for _ in range(5):
+            await policy.call(fn, node="n", reserve=lambda: True)
+
+    asyncio.run(many())
+    assert policy.hedged == int(0.01 * WINDOW)
@@ -0,0 +1,103 @@
+"""Idempotency store: run once, join, replay, conflicts and failures"""
+
+import asyncio
+
+import pytest
+
+from app.server.idempotency import IdempotencyConflict, IdempotencyStore, request_fingerprint
+
+
+def counting(result="ok", delay=0.01, error=None):
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        return result
+
+    return fn, calls
+
+
+def test_fingerprint_ignores_key_order():
+    assert request_fingerprint({"a": 1, "b": [1, 2]}) == request_fingerprint({"b": [1, 2], "a": 1})
+    assert request_fingerprint({"a": 1}) != request_fingerprint({"a": 2})
+
+
+def test_concurrent_duplicates_join_and_later_ones_replay():
+    store = IdempotencyStore(ttl=60, max_keys=10)
+    fn, calls = counting()
+
+    async def scenario():
+        first = await asyncio.gather(*(store.run("k", "fp", fn) for _ in range(3)))
+        later = await store.run("k", "fp", fn)
+        return first, later
+
+    first, later = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert sorted(replayed for _, replayed in first) == [False, True, True]
+    assert later == ("ok", True)
+    assert store.stats()["executed"] == 1 and store.stats()["joined"] == 2 and store.stats()["replayed"] == 1
+
+
+def test_reused_key_with_a_different_body_conflicts():
+    store = IdempotencyStore(ttl=60, max_keys=10)
+    fn, _ = counting(delay=0.05)
+
+    async def scenario():
+        running = asyncio.ensure_future(store.run("k", "fp-a", fn))
+        await asyncio.sleep(0)
+        with pytest.raises(IdempotencyConflict) as while_running:
+            await store.run("k", "fp-b", fn)
+        await running
+        with pytest.raises(IdempotencyConflict) as after:
+            await store.run("k", "fp-b", fn)
+        return while_running.value.status, after.value.status
+
+    assert asyncio.run(scenario()) == (409, 422)
+
+
+def test_failures_are_not_stored():
+    store = IdempotencyStore(ttl=60, max_keys=10)
+    failing, _ = counting(error=RuntimeError("graph failed"))
+    fn, calls = counting(result="second")
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await store.run("k", "fp", failing)
+        return await store.run("k", "fp", fn)
+
+    assert asyncio.run(scenario()) == ("second", False)
+    assert len(calls) == 1 and store.stats()["failed"] == 1
+
+
+def test_call_survives_the_first_caller_disconnecting():
+    store = IdempotencyStore(ttl=60, max_keys=10)
+    fn, calls = counting(result="finished", delay=0.05)
+
+    async def scenario():
+        first = asyncio.ensure_future(store.run("k", "fp", fn))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        await asyncio.sleep(0.1)
+        return await store.run("k", "fp", fn)
+
+    assert asyncio.run(scenario()) == ("finished", True)
+    assert len(calls) == 1
+
+
+def test_expired_and_excess_results_are_dropped():
+    store = IdempotencyStore(ttl=60, max_keys=2)
+
+    async def scenario():
+        for key in ("a", "b", "c"):
+            await store.run(key, "fp", counting(result=key, delay=0)[0])
+
+    asyncio.run(scenario())
+    assert list(store._results) == ["b", "c"]
+
+    store.ttl = 0
+    asyncio.run(store.run("d", "fp", counting(delay=0)[0]))
+    asyncio.run(store.run("e", "fp", counting(delay=0)[0]))
+    assert "d" not in store._results
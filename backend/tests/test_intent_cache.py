@@ -0,0 +1,35 @@
+"""Intent cache: normalization, context keys, LRU bound and TTL"""
+
+from app.intent.cache import IntentCache, normalize_text
+
+
+def test_normalization_folds_case_punctuation_and_typos():
+    assert normalize_text("  Create an OFER!!  ") == "create an offer"
+    assert normalize_text("show   analitics, please") == "show analytics please"
+    assert normalize_text(None) == ""
+
+
+def test_hits_are_shared_across_phrasings_but_not_pages():
+    cache = IntentCache()
+    cache.put("Create an offer", {"currentPage": "/offers"}, "offer_management")
+    assert cache.get("create an ofer!", {"currentPage": "/offers"}) == "offer_management"
+    assert cache.get("create an offer", {"currentPage": "/analytics"}) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = IntentCache(max_size=2)
+    cache.put("a", None, "x")
+    cache.put("b", None, "y")
+    cache.get("a")
+    cache.put("c", None, "z")
+    assert cache.get("b") is None
+    assert cache.get("a") == "x" and cache.get("c") == "z"
+    assert cache.evictions == 1
+
+
+def test_expired_entries_miss():
+    cache = IntentCache(ttl_seconds=0)
+    cache.put("hello", None, "general")
+    assert cache.get("hello") is None
+    assert cache.expirations == 1 and cache.stats()["size"] == 0
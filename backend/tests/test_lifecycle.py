@@ -0,0 +1,108 @@
+"""App lifecycle: startup order, readiness, drain deadline and the drain middleware"""
+
+import asyncio
+
+import pytest
+
+from app.server.lifecycle import AppLifecycle, DrainMiddleware, ServerDrainingError
+
+
+def test_steps_run_in_order_and_shutdown_in_reverse():
+    lifecycle = AppLifecycle("test", drain_timeout=1)
+    events = []
+    for name in ("graph", "pools"):
+        lifecycle.on_startup(name)(lambda name=name: asyncio.sleep(0, result=events.append(f"start {name}")))
+        lifecycle.on_shutdown(name)(lambda name=name: asyncio.sleep(0, result=events.append(f"stop {name}")))
+
+    async def failing():
+        raise RuntimeError("pool already closed")
+
+    lifecycle.on_shutdown("broken")(failing)
+
+    async def scenario():
+        assert lifecycle.state == "starting"
+        async with lifecycle.lifespan(None):
+            assert lifecycle.ready
+        return lifecycle.state
+
+    assert asyncio.run(scenario()) == "stopped"
+    assert events == ["start graph", "start pools", "stop pools", "stop graph"]
+    assert set(lifecycle.stats()["startup_ms"]) == {"graph", "pools"}
+
+
+def test_drain_waits_for_in_flight_turns_and_rejects_new_ones():
+    lifecycle = AppLifecycle("test", drain_timeout=1)
+
+    async def scenario():
+        finished = []
+
+        async def turn():
+            async with lifecycle.turn():
+                await asyncio.sleep(0.05)
+                finished.append(True)
+
+        running = asyncio.ensure_future(turn())
+        await asyncio.sleep(0.01)
+        drained = asyncio.ensure_future(lifecycle.drain())
+        await asyncio.sleep(0)
+        with pytest.raises(ServerDrainingError):
+            lifecycle.admit()
+        result = await drained
+        await running
+        return result, finished
+
+    assert asyncio.run(scenario()) == (True, [True])
+    assert lifecycle.stats()["rejected_while_draining"] == 1 and lifecycle.in_flight == 0
+
+
+def test_drain_gives_up_at_the_deadline():
+    lifecycle = AppLifecycle("test", drain_timeout=0.02)
+
+    async def scenario():
+        async def stuck():
+            async with lifecycle.turn():
+                await asyncio.sleep(10)
+
+        task = asyncio.ensure_future(stuck())
+        await asyncio.sleep(0.01)
+        drained = await lifecycle.drain()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return drained
+
+    assert asyncio.run(scenario()) is False
+    assert lifecycle.in_flight == 0
+
+
+def test_drain_middleware_tracks_turns_and_sheds_while_draining():
+    lifecycle = AppLifecycle("test")
+    seen_in_flight = []
+
+    async def app(scope, receive, send):
+        seen_in_flight.append(lifecycle.in_flight)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    middleware = DrainMiddleware(app, lifecycle, paths=["/copilotkit"])
+
+    async def request(path, method="POST"):
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        await middleware({"type": "http", "method": method, "path": path}, None, send)
+        return sent[0]["status"], dict(sent[0]["headers"])
+
+    async def scenario():
+        before = await request("/copilotkit")
+        lifecycle.start_draining()
+        during = await request("/copilotkit")
+        health = await request("/health", method="GET")
+        return before, during, health
+
+    before, during, health = asyncio.run(scenario())
+    assert before[0] == 200 and seen_in_flight[0] == 1
+    assert during[0] == 503
+    assert during[1][b"retry-after"] == b"1" and during[1][b"connection"] == b"close"
+    assert health[0] == 200 and seen_in_flight[1] == 0
@@ -0,0 +1,146 @@
+"""Background run queue: outcomes, cancellation, back-pressure, drain and retention"""
+
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from app.server.runs import RunManager, RunQueueFull
+
+
+def executor_returning(output=None, delay=0.0, error=None):
+    async def execute(run):
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        return output if output is not None else {"echo": run.input}
+
+    return execute
+
+
+def test_run_succeeds_with_output_and_timings():
+    async def scenario():
+        runs = RunManager(executor_returning(), workers=2)
+        run = await runs.submit("supervisor", {"q": 1})
+        assert run.status == "pending"
+        await runs.wait(run, timeout=1)
+        await runs.stop()
+        return runs, run
+
+    runs, run = asyncio.run(scenario())
+    data = run.to_dict()
+    assert data["status"] == "success" and data["output"] == {"echo": {"q": 1}}
+    assert data["started_at"] and data["finished_at"] and data["run_ms"] is not None
+    assert runs.stats()["completed"]["success"] == 1
+
+
+@pytest.mark.parametrize("error, status", [(ValueError("bad input"), "error"), (None, "timeout")])
+def test_failures_and_timeouts_are_recorded(error, status):
+    async def scenario():
+        runs = RunManager(executor_returning(delay=0 if error else 1, error=error), timeout=0.05)
+        run = await runs.submit("supervisor", {})
+        await runs.wait(run, timeout=1)
+        await runs.stop()
+        return run
+
+    run = asyncio.run(scenario())
+    assert run.status == status and run.error
+
+
+def test_pending_and_running_runs_can_be_cancelled():
+    async def scenario():
+        runs = RunManager(executor_returning(delay=10), workers=1)
+        running = await runs.submit("supervisor", {})
+        queued = await runs.submit("supervisor", {})
+        await asyncio.sleep(0.01)
+        assert running.status == "running" and queued.status == "pending"
+        await runs.cancel(queued.run_id)
+        await runs.cancel(running.run_id)
+        await runs.wait(running, timeout=1)
+        await runs.stop()
+        return runs, running, queued
+
+    runs, running, queued = asyncio.run(scenario())
+    assert running.status == "cancelled" and queued.status == "cancelled"
+    assert runs.stats()["completed"]["cancelled"] == 2
+
+
+def test_full_queue_rejects_new_runs():
+    async def scenario():
+        runs = RunManager(executor_returning(delay=10), workers=1, max_queue=1)
+        await runs.submit("supervisor", {})
+        await asyncio.sleep(0.01)  # the first run leaves the queue for its worker
+        await runs.submit("supervisor", {})
+        with pytest.raises(RunQueueFull):
+            await runs.submit("supervisor", {})
+        await runs.stop()
+        return runs
+
+    assert asyncio.run(scenario()).rejected == 1
+
+
+def test_watch_yields_each_transition_then_stops():
+    async def scenario():
+        runs = RunManager(executor_returning(delay=0.02))
+        run = await runs.submit("supervisor", {})
+        seen = [current.status async for current in runs.watch(run)]
+        await runs.stop()
+        return seen
+
+    assert asyncio.run(scenario()) == ["pending", "running", "success"]
+
+
+def test_drain_waits_for_active_runs_up_to_the_deadline():
+    async def scenario():
+        runs = RunManager(executor_returning(delay=0.02))
+        await runs.submit("supervisor", {})
+        finished = await runs.drain(timeout=1)
+        slow = RunManager(executor_returning(delay=10))
+        await slow.submit("supervisor", {})
+        expired = await slow.drain(timeout=0.02)
+        await runs.stop()
+        await slow.stop()
+        return finished, expired
+
+    assert asyncio.run(scenario()) == (True, False)
+
+
+def test_finished_runs_are_pruned_past_max_records():
+    async def scenario():
+        runs = RunManager(executor_returning(), max_records=1)
+        first = await runs.submit("supervisor", {})
+        await runs.wait(first, timeout=1)
+        second = await runs.submit("supervisor", {})
+        await runs.wait(second, timeout=1)
+        await runs.submit("supervisor", {})
+        await runs.stop()
+        return runs, first, second
+
+    runs, first, second = asyncio.run(scenario())
+    assert runs.get(first.run_id) is None and runs.get(second.run_id) is second
+
+
+def test_post_runs_keeps_the_synchronous_contract_unless_async_is_preferred(monkeypatch):
+    for module in ("fastapi", "uvicorn", "langchain_core"):
+        pytest.importorskip(module)
+    httpx = pytest.importorskip("httpx")
+    monkeypatch.syspath_prepend(str(Path(__file__).resolve().parents[2]))
+    import langgraph_server
+
+    monkeypatch.setattr(langgraph_server.runs, "executor", executor_returning({"messages": []}))
+    body = {"assistant_id": "supervisor", "input": {"messages": [{"type": "human", "content": "hi"}]}}
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=langgraph_server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://langgraph") as client:
+            sync = await client.post("/runs", json=body)
+            queued = await client.post("/runs", json=body, headers={"Prefer": "respond-async"})
+            waited = await client.get(f"/runs/{queued.json()['run_id']}/wait", params={"timeout": 1})
+        await langgraph_server.runs.stop()
+        return sync, queued, waited
+
+    sync, queued, waited = asyncio.run(scenario())
+    assert sync.status_code == 200
+    assert sync.json()["status"] == "completed" and sync.json()["output"] == {"messages": []}
+    assert queued.status_code == 202 and queued.json()["status"] == "pending"
+    assert waited.json()["status"] == "success"
@@ -0,0 +1,103 @@
+"""LLM scheduler: slot limits, priority order, load shedding and cancellation"""
+
+import asyncio
+
+import pytest
+
+from app.llm.scheduler import (
+    PRIORITY_APPROVAL,
+    PRIORITY_CHAT,
+    PRIORITY_INTENT,
+    LLMOverloadedError,
+    LLMScheduler,
+    llm_request_class,
+    priority_for,
+)
+
+
+def test_priority_classes():
+    assert priority_for("detect_intent") == PRIORITY_INTENT
+    assert priority_for("general_agent") == PRIORITY_CHAT
+    with llm_request_class("approval"):
+        assert priority_for("general_agent") == PRIORITY_APPROVAL
+        assert priority_for("detect_intent") == PRIORITY_INTENT
+    assert priority_for("general_agent") == PRIORITY_CHAT
+
+
+def test_waiters_are_served_by_priority_then_arrival():
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrency=1, max_queue=10, queue_timeout=1)
+        await scheduler.acquire()
+        order = []
+
+        async def call(name, priority):
+            await scheduler.run(lambda: asyncio.sleep(0, result=order.append(name)), priority=priority)
+
+        tasks = [
+            asyncio.ensure_future(call("chat-1", PRIORITY_CHAT)),
+            asyncio.ensure_future(call("approval", PRIORITY_APPROVAL)),
+            asyncio.ensure_future(call("chat-2", PRIORITY_CHAT)),
+            asyncio.ensure_future(call("intent", PRIORITY_INTENT)),
+        ]
+        await asyncio.sleep(0)
+        assert scheduler.queue_depth == 4
+        scheduler.release()
+        await asyncio.gather(*tasks)
+        return order, scheduler
+
+    order, scheduler = asyncio.run(scenario())
+    assert order == ["intent", "approval", "chat-1", "chat-2"]
+    assert scheduler.stats()["active"] == 0
+
+
+def test_full_queue_and_queue_timeout_shed_load():
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrency=1, max_queue=1, queue_timeout=0.05)
+        await scheduler.acquire()
+        waiting = asyncio.ensure_future(scheduler.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(LLMOverloadedError, match="full"):
+            await scheduler.acquire()
+        with pytest.raises(LLMOverloadedError, match="Timed out"):
+            await waiting
+        return scheduler.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["rejected"] == {"chat": 1} and stats["timed_out"] == {"chat": 1}
+
+
+@pytest.mark.parametrize("handed_over", [False, True])
+def test_cancelled_waiter_does_not_leak_a_slot(handed_over):
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrency=1, max_queue=10, queue_timeout=1)
+        await scheduler.acquire()
+        waiter = asyncio.ensure_future(scheduler.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        if handed_over:
+            # The slot reaches the waiter while its cancellation is in flight
+            scheduler.release()
+        await asyncio.gather(waiter, return_exceptions=True)
+        if not handed_over:
+            scheduler.release()
+        assert scheduler.try_acquire()
+        scheduler.release()
+        return scheduler.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["active"] == 0 and stats["queue_depth"] == 0
+
+
+def test_try_acquire_never_jumps_the_queue():
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrency=2, max_queue=10, queue_timeout=1)
+        await scheduler.acquire()
+        await scheduler.acquire()
+        waiter = asyncio.ensure_future(scheduler.acquire())
+        await asyncio.sleep(0)
+        scheduler.release()  # handed to the waiter, not freed
+        jumped = scheduler.try_acquire()
+        await waiter
+        return jumped
+
+    assert asyncio.run(scenario()) is False
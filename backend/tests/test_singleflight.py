@@ -0,0 +1,119 @@
+"""Single-flight coalescing, error sharing and cancellation of abandoned calls"""
+
+import asyncio
+
+import pytest
+
+from app.llm.singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    async def scenario():
+        flight = SingleFlight()
+        executions = 0
+
+        async def fn():
+            nonlocal executions
+            executions += 1
+            await asyncio.sleep(0.01)
+            return "answer"
+
+        results = await asyncio.gather(*(flight.do("k", fn, node="general_agent") for _ in range(5)))
+        return flight, executions, results
+
+    flight, executions, results = asyncio.run(scenario())
+    assert executions == 1
+    assert results == ["answer"] * 5
+    stats = flight.stats()
+    assert stats["executed"] == 1 and stats["coalesced"] == 4
+    assert stats["coalesced_by_node"] == {"general_agent": 4}
+    assert stats["in_flight"] == 0
+
+
+def test_exception_reaches_every_caller_and_key_is_forgotten():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def boom():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("provider down")
+
+        results = await asyncio.gather(flight.do("k", boom), flight.do("k", boom), return_exceptions=True)
+        later = await flight.do("k", lambda: asyncio.sleep(0, result="fresh"))
+        return results, later
+
+    results, later = asyncio.run(scenario())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert later == "fresh"
+
+
+def test_cancelled_follower_does_not_cancel_the_shared_call():
+    async def scenario():
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def fn():
+            await release.wait()
+            return "done"
+
+        leader = asyncio.ensure_future(flight.do("k", fn))
+        follower = asyncio.ensure_future(flight.do("k", fn))
+        await asyncio.sleep(0)
+        follower.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        return flight, await leader, follower
+
+    flight, result, follower = asyncio.run(scenario())
+    assert result == "done"
+    assert follower.cancelled()
+    assert flight.stats()["abandoned"] == 0
+
+
+def test_shared_call_is_cancelled_when_the_last_waiter_leaves():
+    async def scenario():
+        flight = SingleFlight()
+        started = asyncio.Event()
+        cancelled = asyncio.Event()
+
+        async def fn():
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        waiters = [asyncio.ensure_future(flight.do("k", fn)) for _ in range(2)]
+        await started.wait()
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.wait_for(cancelled.wait(), timeout=1)
+        await asyncio.sleep(0)
+        return flight
+
+    flight = asyncio.run(scenario())
+    assert flight.stats()["abandoned"] == 1
+    assert flight.in_flight == 0
+
+
+def test_streamed_calls_bypass_single_flight():
+    pytest.importorskip("langchain_core")
+    from langchain_core.runnables.config import var_child_runnable_config
+    from langchain_core.tracers._streaming import _StreamingCallbackHandler
+
+    from app.llm.invoke import streams_tokens
+
+    class Forwarder(_StreamingCallbackHandler):
+        def tap_output_aiter(self, run_id, output):
+            return output
+
+        def tap_output_iter(self, run_id, output):
+            return output
+
+    assert not streams_tokens()
+    token = var_child_runnable_config.set({"callbacks": [Forwarder()]})
+    try:
+        assert streams_tokens()
+    finally:
+        var_child_runnable_config.reset(token)
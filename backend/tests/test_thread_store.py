@@ -0,0 +1,80 @@
+"""Thread store bounds: LRU bytes, idle TTL, eviction veto and disk spill"""
+
+import time
+
+from app.persistence.thread_store import ThreadStore
+
+
+def add(store, thread_id, nbytes):
+    record = store.get(thread_id, create=True)
+    record.latest[""] = f"{thread_id}-cp"
+    store.charge(record, nbytes)
+    return record
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def test_least_recently_used_threads_go_first():
+    store = ThreadStore(max_bytes=250)
+    add(store, "a", 100)
+    add(store, "b", 100)
+    store.get("a")
+    add(store, "c", 100)
+    assert not store.is_resident("b")
+    assert store.is_resident("a") and store.is_resident("c")
+    assert store.resident_bytes == 200
+
+
+def test_max_threads_and_eviction_veto():
+    pinned = {"a"}
+    store = ThreadStore(max_threads=1, can_evict=lambda thread_id: thread_id not in pinned)
+    add(store, "a", 10)
+    add(store, "b", 10)
+    assert store.is_resident("a") and store.is_resident("b")
+    pinned.clear()
+    store.sweep()
+    assert not store.is_resident("a") and store.is_resident("b")
+
+
+def test_spilled_thread_is_rehydrated(tmp_path):
+    store = ThreadStore(max_bytes=150, spill_dir=str(tmp_path))
+    add(store, "a", 100)
+    add(store, "b", 100)
+    store.flush()
+    assert store.is_spilled("a")
+    assert list(tmp_path.glob("*.thread"))
+
+    store.load("a")
+    record = store.get("a")
+    assert record.latest == {"": "a-cp"} and record.nbytes == 100
+    assert store.rehydrations == 1
+    store.close()
+
+
+def test_idle_threads_expire_without_being_touched():
+    store = ThreadStore(idle_ttl=0.05, sweep_interval=0.02)
+    try:
+        add(store, "idle", 10)
+        assert wait_until(lambda: not store.is_resident("idle"))
+        assert store.expirations == 1 and store.sweeps >= 1
+    finally:
+        store.close()
+
+
+def test_remove_forgets_resident_and_spilled_state(tmp_path):
+    store = ThreadStore(max_bytes=150, spill_dir=str(tmp_path))
+    add(store, "a", 100)
+    add(store, "b", 100)
+    store.remove("a")
+    store.remove("b")
+    store.close()
+    assert store.resident_bytes == 0
+    assert store.get("a") is None and store.get("b") is None
+    assert not list(tmp_path.glob("*.thread"))
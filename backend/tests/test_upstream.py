@@ -0,0 +1,107 @@
+"""Agent proxy: the /runs/wait default, the queued /runs path and upstream failures"""
+
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("fastapi")
+httpx = pytest.importorskip("httpx")
+
+import copilotkit_endpoint
+from app.server.upstream import UpstreamClient
+
+OUTPUT = {"messages": [{"type": "ai", "content": "hello"}]}
+
+
+class BrokenBody(httpx.AsyncByteStream):
+    async def __aiter__(self):
+        yield b'{"run_id": "r1", "out'
+        raise httpx.ReadError("connection reset")
+
+
+def execute(monkeypatch, handler, run_path="/runs/wait", retries=0):
+    upstream = UpstreamClient(base_url="http://langgraph", retries=retries, backoff=0)
+    upstream._client = httpx.AsyncClient(base_url=upstream.base_url, transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(copilotkit_endpoint, "get_upstream_client", lambda: upstream)
+    monkeypatch.setattr(copilotkit_endpoint, "UPSTREAM_RUN_PATH", run_path)
+    request = copilotkit_endpoint.AgentExecuteRequest(agent_name="supervisor", input={"messages": []})
+
+    async def scenario():
+        try:
+            return await copilotkit_endpoint.execute_agent(request)
+        finally:
+            await upstream.shutdown()
+
+    response = asyncio.run(scenario())
+    return json.loads(response.body) if hasattr(response, "body") else response
+
+
+def test_default_path_waits_for_the_run_output(monkeypatch):
+    seen = []
+
+    def handler(request):
+        seen.append((request.method, request.url.path))
+        return httpx.Response(200, json={"run_id": "r1", "status": "completed", "output": OUTPUT})
+
+    reply = execute(monkeypatch, handler)
+    assert seen == [("POST", "/runs/wait")]
+    assert reply == {"result": {"run_id": "r1", "status": "completed", "output": OUTPUT}, "status": "completed"}
+
+
+def test_queued_runs_are_followed_until_finished(monkeypatch):
+    polls = []
+
+    def handler(request):
+        if request.method == "POST":
+            assert request.url.path == "/runs"
+            assert request.headers["prefer"] == "respond-async"
+            return httpx.Response(202, json={"run_id": "r1", "status": "pending"})
+        polls.append(request.url.path)
+        status = "running" if len(polls) == 1 else "success"
+        return httpx.Response(200, json={"run_id": "r1", "status": status, "output": OUTPUT})
+
+    reply = execute(monkeypatch, handler, run_path="/runs")
+    assert polls == ["/runs/r1/wait", "/runs/r1/wait"]
+    assert reply == {"result": {"run_id": "r1", "status": "completed", "output": OUTPUT}, "status": "completed"}
+
+
+def test_failed_queued_run_is_reported(monkeypatch):
+    def handler(request):
+        if request.method == "POST":
+            return httpx.Response(202, json={"run_id": "r1", "status": "pending"})
+        return httpx.Response(200, json={"run_id": "r1", "status": "error", "error": "boom"})
+
+    reply = execute(monkeypatch, handler, run_path="/runs")
+    assert reply == {"result": {"error": "boom"}, "status": "failed"}
+
+
+def test_upstream_error_status_is_reported(monkeypatch):
+    reply = execute(monkeypatch, lambda request: httpx.Response(500, text="graph failed"))
+    assert reply == {"result": {"error": "LangGraph error: 500"}, "status": "failed"}
+
+
+def test_body_interrupted_mid_stream_is_a_failed_reply_not_truncated_json(monkeypatch):
+    reply = execute(monkeypatch, lambda request: httpx.Response(200, stream=BrokenBody()))
+    assert reply["status"] == "failed"
+    assert "connection reset" in reply["result"]["error"]
+
+
+def test_post_is_not_retried_once_sent_but_get_is():
+    calls = []
+
+    def handler(request):
+        calls.append(request.method)
+        return httpx.Response(503 if len(calls) < 2 else 200)
+
+    async def scenario(method):
+        calls.clear()
+        upstream = UpstreamClient(base_url="http://langgraph", retries=2, backoff=0)
+        upstream._client = httpx.AsyncClient(base_url=upstream.base_url, transport=httpx.MockTransport(handler))
+        response = await upstream.stream(method, "/runs/wait")
+        await response.aclose()
+        await upstream.shutdown()
+        return response.status_code, list(calls)
+
+    assert asyncio.run(scenario("POST")) == (503, ["POST"])
+    assert asyncio.run(scenario("GET")) == (200, ["GET", "GET"])
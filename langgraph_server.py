@@ -2,12 +2,25 @@
 """
 Simple LangGraph Server
 Runs the supervisor workflow directly via FastAPI
+
+Runs are queued and executed in the background (backend/app/server/runs.py).
+POST /runs and POST /runs/wait keep the old contract - 200 with the run's
+output once it finishes. POST /runs with `Prefer: respond-async` returns the
+pending run at once (202); GET /runs/{run_id}/wait then long-polls,
+GET /runs/{run_id}/stream follows status over Server-Sent Events, and
+POST /runs/{run_id}/cancel stops it.
+
+Startup and shutdown go through an AppLifecycle (backend/app/server/lifecycle.py):
+GET /ready answers 200 once the graph is compiled. On SIGTERM new runs get
+503, and queued and running ones are given KIGO_DRAIN_TIMEOUT seconds to
+finish before the rest are cancelled.
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import TYPE_CHECKING, List, Dict, Any, Optional
 import asyncio
 import os
 import sys
@@ -17,10 +30,18 @@ import uvicorn
 backend_path = os.path.join(os.path.dirname(__file__), 'backend')
 sys.path.insert(0, backend_path)
 
-from app.agents.supervisor import create_supervisor_workflow, KigoProAgentState
-from langchain_core.messages import HumanMessage
+from app.server.lifecycle import AppLifecycle, ServerDrainingError
+from app.server.logs import get_logger, shutdown_logging
+from app.server.responses import FastJSONResponse, dumps
+from app.server.runs import Run, RunQueueFull, run_manager_from_env
+
+if TYPE_CHECKING:  # the agent modules are imported by the "graph" startup step
+    from app.agents.supervisor import KigoProAgentState
+
+lifecycle = AppLifecycle("LangGraph Server")
+logger = get_logger("langgraph_server")
 
-app = FastAPI(title="LangGraph Server", version="1.0.0")
+app = FastAPI(title="LangGraph Server", version="1.0.0", lifespan=lifecycle.lifespan)
 
 # CORS for frontend access
 app.add_middleware(
@@ -38,6 +59,8 @@ def get_workflow():
     """Get or create the workflow instance"""
     global workflow
     if workflow is None:
+        from app.agents.supervisor import create_supervisor_workflow
+
         workflow = create_supervisor_workflow()
     return workflow
 
@@ -45,85 +68,168 @@ class RunRequest(BaseModel):
     assistant_id: str
     input: Dict[str, Any]
 
-class RunResponse(BaseModel):
-    run_id: str
-    status: str
-    output: Dict[str, Any] = None
+# Longest a single long-poll request may hold the connection
+RUN_WAIT_MAX_SECONDS = float(os.getenv("KIGO_RUN_WAIT_MAX", "60"))
+
+async def execute_run(run: Run) -> Dict[str, Any]:
+    """Run executor: the supervisor graph, asynchronously"""
+    logger.info("run started", extra={"fields": {"run_id": run.run_id, "assistant_id": run.assistant_id}})
+    result = await get_workflow().ainvoke(run.input, config=run.config or None)
+    logger.info("run finished", extra={"fields": {"run_id": run.run_id, "agent": result.get("agent_decision", "unknown")}})
+    return result
+
+runs = run_manager_from_env(execute_run)
+
+@app.exception_handler(RunQueueFull)
+async def run_queue_full_handler(request, exc: RunQueueFull):
+    """Reject new runs fast when the queue is full"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": f"Run queue is full: {exc.reason}. Please retry shortly."},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize the workflow on startup"""
-    print("🚀 Starting LangGraph Server...")
+@app.exception_handler(ServerDrainingError)
+async def server_draining_handler(request, exc: ServerDrainingError):
+    """Refuse new runs once shutdown has started; running ones still finish"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": f"Server is draining: {exc.reason}. Please retry shortly."},
+        headers={"Retry-After": str(exc.retry_after), "Connection": "close"},
+    )
+
+@lifecycle.on_startup("graph")
+async def compile_graph():
+    """Compile the workflow before reporting ready"""
     get_workflow()
-    print("✅ LangGraph Server ready!")
+
+@lifecycle.on_startup("run_workers")
+async def start_run_workers():
+    runs.start()
+
+# Shutdown steps run in reverse: runs drain first, logs flush last
+@lifecycle.on_shutdown("logging")
+async def flush_logs():
+    shutdown_logging()
+
+@lifecycle.on_shutdown("run_workers")
+async def drain_runs():
+    """Give queued and running runs until the drain deadline, then cancel the rest"""
+    if not await runs.drain(lifecycle.drain_timeout):
+        stats = runs.stats()
+        logger.warning("drain deadline passed, cancelling runs", extra={"fields": {"running": stats["running"], "pending": stats["pending"]}})
+    await runs.stop()
 
 @app.get("/")
 async def root():
     return {"message": "LangGraph Server running", "version": "1.0.0"}
 
-@app.post("/runs", response_model=RunResponse)
-async def create_run(request: RunRequest):
-    """Create and execute a run"""
-    try:
-        workflow = get_workflow()
-        
-        # Extract messages from request
-        messages = request.input.get("messages", [])
-        if not messages:
-            raise HTTPException(status_code=400, detail="No messages provided")
-        
-        # Convert to HumanMessage objects
-        human_messages = []
-        for msg in messages:
-            if msg.get("type") == "human":
-                human_messages.append(HumanMessage(content=msg["content"]))
-        
-        if not human_messages:
-            raise HTTPException(status_code=400, detail="No human messages found")
-        
-        # Create initial state
-        initial_state: KigoProAgentState = {
-            "messages": human_messages,
-            "user_intent": "",
-            "context": {"currentPage": "/", "userRole": "admin"},
-            "agent_decision": "",  
-            "workflow_data": {},
-            "error": None,
-            "pending_action": None,
-            "approval_status": None,
-            "requires_approval": None
-        }
-        
-        # Run the workflow
-        print(f"[LangGraph Server] 🎯 Processing: {human_messages[0].content}")
-        
-        # Use invoke to run the workflow synchronously
-        result = workflow.invoke(initial_state)
-        
-        print(f"[LangGraph Server] ✅ Result: {result.get('agent_decision', 'unknown')}")
-        
-        # Generate run ID
-        import uuid
-        run_id = str(uuid.uuid4())
-        
-        return RunResponse(
-            run_id=run_id,
-            status="completed", 
-            output=result
-        )
-        
-    except Exception as e:
-        print(f"[LangGraph Server] ❌ Error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+@app.get("/ready")
+async def ready():
+    """200 once the graph is compiled and run workers are up; 503 while starting or draining"""
+    if lifecycle.ready:
+        return {"status": "ready"}
+    return JSONResponse(status_code=503, content={"status": lifecycle.state, **runs.stats()})
+
+def build_initial_state(request: RunRequest) -> "KigoProAgentState":
+    """Validate the run input and build the graph's initial state"""
+    from langchain_core.messages import HumanMessage
+
+    # Extract messages from request
+    messages = request.input.get("messages", [])
+    if not messages:
+        raise HTTPException(status_code=400, detail="No messages provided")
+
+    # Convert to HumanMessage objects
+    human_messages = []
+    for msg in messages:
+        if msg.get("type") == "human":
+            human_messages.append(HumanMessage(content=msg["content"]))
+
+    if not human_messages:
+        raise HTTPException(status_code=400, detail="No human messages found")
 
-@app.get("/runs/{run_id}")
-async def get_run(run_id: str):
-    """Get run status (simplified for now)"""
     return {
-        "run_id": run_id,
-        "status": "completed",
-        "created_at": "2024-01-01T00:00:00Z"
+        "messages": human_messages,
+        "user_intent": "",
+        "context": {"currentPage": "/", "userRole": "admin"},
+        "agent_decision": "",
+        "workflow_data": {},
+        "error": None,
+        "pending_action": None,
+        "approval_status": None,
+        "requires_approval": None
     }
 
+def get_run_or_404(run_id: str) -> Run:
+    run = runs.get(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail=f"Run {run_id} not found")
+    return run
+
+async def run_output(run: Run) -> FastJSONResponse:
+    """Wait for a run and answer with its output, the synchronous `/runs` contract"""
+    await run.done.wait()
+    if run.status != "success":
+        raise HTTPException(status_code=500, detail=run.error or f"Run {run.status}")
+    return FastJSONResponse({"run_id": run.run_id, "status": "completed", "output": run.output})
+
+@app.post("/runs")
+async def create_run(request: RunRequest, prefer: Optional[str] = Header(None)):
+    """Queue a run; return it at once (202) with `Prefer: respond-async`, else wait for its output"""
+    lifecycle.admit()
+    run = await runs.submit(request.assistant_id, build_initial_state(request))
+    if prefer and "respond-async" in prefer.lower():
+        return FastJSONResponse(run.to_dict(), status_code=202)
+    return await run_output(run)
+
+@app.post("/runs/wait")
+async def create_run_and_wait(request: RunRequest):
+    """Queue a run and wait for its output"""
+    lifecycle.admit()
+    run = await runs.submit(request.assistant_id, build_initial_state(request))
+    return await run_output(run)
+
+@app.get("/runs/stats")
+async def run_stats():
+    """Queue depth, active runs and outcome counts"""
+    return runs.stats()
+
+@app.get("/runs/{run_id}")
+async def get_run(run_id: str):
+    """Run status, timings and (once finished) output"""
+    return FastJSONResponse(get_run_or_404(run_id).to_dict())
+
+@app.get("/runs/{run_id}/wait")
+async def wait_run(run_id: str, timeout: float = 30.0):
+    """Long-poll until the run finishes or `timeout` seconds pass, then return its state"""
+    run = get_run_or_404(run_id)
+    await runs.wait(run, min(max(timeout, 0.0), RUN_WAIT_MAX_SECONDS))
+    return FastJSONResponse(run.to_dict())
+
+@app.get("/runs/{run_id}/stream")
+async def stream_run(run_id: str):
+    """Server-Sent Events: a `status` frame per transition, then `final` with the output"""
+    run = get_run_or_404(run_id)
+
+    async def events():
+        async for current in runs.watch(run):
+            event = "final" if current.finished else "status"
+            payload = dumps(current.to_dict(include_output=current.finished)).decode("utf-8")
+            yield f"event: {event}\ndata: {payload}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/runs/{run_id}/cancel")
+async def cancel_run(run_id: str):
+    """Cancel a pending or running run (no-op once it has finished)"""
+    get_run_or_404(run_id)
+    run = await runs.cancel(run_id)
+    return FastJSONResponse(run.to_dict(include_output=False))
+
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000)